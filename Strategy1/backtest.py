@@ -0,0 +1,238 @@
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import screener
+
+archive_dir = './raw_stock_data/daily'
+
+DEFAULT_PARAMS = {
+    'window': 5,              # 計算成交量穩定度 / 平均量的天數
+    'cv_threshold': 0.5,      # 變異係數上限
+    'volume_multiplier': 2.0, # 當天成交量 >= 平均量 × 倍數
+    'min_change': 0.0,        # 當天漲幅 > min_change (0.01 = 1%)
+}
+
+
+def _archive_signature(markets, archive_dir, fields):
+    """收盤資料檔案清單 (名稱、大小、修改時間)，用來判斷快取是否有效"""
+    signature = [','.join(fields)]
+    for market in markets:
+        market_dir = os.path.join(archive_dir, market)
+        for date in screener.list_dates(market_dir):
+            stat = os.stat(os.path.join(market_dir, f"{date}.json"))
+            signature.append(f"{market}/{date}:{stat.st_size}:{int(stat.st_mtime)}")
+    return '\n'.join(signature)
+
+
+def load_market_panel(markets=('twse', 'tpex'), archive_dir=archive_dir, fields=screener.PANEL_FIELDS,
+                      cache_path='./cache/strategy1_panel.npz'):
+    """
+    讀取多個市場的每日收盤資料，合併成同一組 (日期 × 股票) 陣列
+
+    解析 JSON 很慢，合併後的陣列存成 npz 快取，收盤資料沒有變動時直接讀取快取
+
+    Args:
+        markets (tuple): raw_stock_data/daily 底下的市場資料夾
+        archive_dir (str): 每日收盤資料根目錄
+        fields (tuple): 要讀取的數值欄位
+        cache_path (str): 快取檔路徑，None 表示不使用快取
+
+    Returns:
+        dict: 與 screener.load_panel 相同格式 (不含 rows)，另加 'market' (依 codes 順序的市場名稱)
+    """
+    signature = _archive_signature(markets, archive_dir, fields)
+    if cache_path is not None and os.path.exists(cache_path):
+        try:
+            with np.load(cache_path, allow_pickle=False) as cache:
+                if str(cache['signature']) == signature:
+                    codes = cache['codes'].tolist()
+                    return {
+                        'dates': cache['dates'].tolist(),
+                        'codes': codes,
+                        'names': dict(zip(codes, cache['names'].tolist())),
+                        'market': cache['market'].tolist(),
+                        **{name: cache[name] for name in fields}
+                    }
+        except (OSError, KeyError, ValueError) as e:
+            print(f"讀取收盤資料快取 {cache_path} 失敗：{e}")
+
+    panel = _load_market_panel(markets, archive_dir, fields)
+
+    if cache_path is not None:
+        try:
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            np.savez(cache_path, signature=np.array(signature), dates=np.array(panel['dates']),
+                     codes=np.array(panel['codes']), names=np.array([panel['names'][code] for code in panel['codes']]),
+                     market=np.array(panel['market']), **{name: panel[name] for name in fields})
+        except OSError as e:
+            print(f"寫入收盤資料快取 {cache_path} 失敗：{e}")
+    return panel
+
+
+def _load_market_panel(markets, archive_dir, fields):
+    panels = [screener.load_panel(os.path.join(archive_dir, market), fields=fields) for market in markets]
+
+    dates = sorted(set().union(*(panel['dates'] for panel in panels)))
+    date_pos = {date: i for i, date in enumerate(dates)}
+
+    codes, market_of, names = [], [], {}
+    for market, panel in zip(markets, panels):
+        new_codes = [code for code in panel['codes'] if code not in names]
+        codes.extend(new_codes)
+        market_of.extend([market] * len(new_codes))
+        names.update({code: panel['names'][code] for code in new_codes})
+    code_pos = {code: i for i, code in enumerate(codes)}
+
+    merged = {name: np.full((len(dates), len(codes)), np.nan) for name in fields}
+    for panel in reversed(panels):  # 相同代號以先列出的市場為準
+        rows = np.array([date_pos[date] for date in panel['dates']], dtype=np.intp)
+        cols = np.array([code_pos[code] for code in panel['codes']], dtype=np.intp)
+        for name in fields:
+            merged[name][np.ix_(rows, cols)] = panel[name]
+
+    return {'dates': dates, 'codes': codes, 'names': names, 'market': market_of, **merged}
+
+
+def volume_spike_signals(panel, window=5, cv_threshold=0.5, volume_multiplier=2.0, min_change=0.0, stats=None):
+    """
+    Strategy1 爆量訊號 (所有日期一次計算)
+
+    第 t 天的訊號: 前一天收盤後篩選的觀察名單 (往前 window 天成交量 CV < cv_threshold)，
+    當天成交量 >= 前 window 天平均量 × volume_multiplier，且收盤價相對前一天收盤漲幅 > min_change
+
+    Args:
+        panel (dict): load_market_panel / screener.load_panel 的輸出
+        stats (tuple): 已計算好的 screener.rolling_volume_stats(volume, window) 結果 (參數掃描時重複使用)
+
+    Returns:
+        np.ndarray: (日期, 股票) 的 bool 陣列，第一天一定為 False
+    """
+    volume = panel['TradeVolume']
+    close = panel['ClosingPrice']
+    mean, _, cv = stats if stats is not None else screener.rolling_volume_stats(volume, window)
+
+    signals = np.zeros(volume.shape, dtype=bool)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        watch = np.isfinite(volume[:-1]) & (cv[:-1] < cv_threshold)
+        spike = volume[1:] >= mean[:-1] * volume_multiplier
+        change = close[1:] / close[:-1] - 1
+        signals[1:] = watch & spike & (change > min_change)
+    return signals
+
+
+def forward_returns(close, horizon):
+    """
+    以第 t 天收盤買進、第 t+horizon 個交易日收盤賣出的報酬
+
+    Returns:
+        np.ndarray: 與 close 相同形狀，最後 horizon 天或缺少價格時為 NaN
+    """
+    result = np.full(close.shape, np.nan)
+    if horizon < close.shape[0]:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result[:-horizon] = close[horizon:] / close[:-horizon] - 1
+    return result
+
+
+def max_drawdown(returns):
+    """
+    依序複利的最大回撤
+
+    Args:
+        returns (np.ndarray): 每期報酬
+
+    Returns:
+        float: 最大回撤 (負值，例如 -0.12 表示 -12%)，沒有資料時為 0
+    """
+    if len(returns) == 0:
+        return 0.0
+    equity = np.cumprod(1 + returns)
+    peak = np.maximum.accumulate(np.concatenate(([1.0], equity)))[1:]
+    return float(np.min(equity / peak - 1))
+
+
+def evaluate_signals(signals, close, horizons=(1, 3, 5), forward=None):
+    """
+    統計訊號的往後報酬
+
+    回撤以「每個訊號日等權買進當天所有訊號，持有 horizon 天」的報酬依訊號日順序複利計算
+    (不考慮持有期間重疊與交易成本)
+
+    Args:
+        signals (np.ndarray): (日期, 股票) bool 訊號
+        close (np.ndarray): (日期, 股票) 收盤價
+        horizons (tuple): 持有天數
+        forward (dict): 已計算好的 {horizon: forward_returns(close, horizon)} (參數掃描時重複使用)
+
+    Returns:
+        dict: {horizon: {'trades', 'mean_return', 'median_return', 'hit_rate', 'max_drawdown'}}
+    """
+    result = {}
+    for horizon in horizons:
+        returns = forward[horizon] if forward is not None else forward_returns(close, horizon)
+        valid = signals & np.isfinite(returns)
+        trade_returns = returns[valid]
+
+        # 每個訊號日的等權報酬
+        per_day_count = valid.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            per_day = np.where(valid, returns, 0.0).sum(axis=1) / per_day_count
+        per_day = per_day[per_day_count > 0]
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            result[horizon] = {
+                'trades': int(trade_returns.size),
+                'mean_return': float(np.mean(trade_returns)) if trade_returns.size else np.nan,
+                'median_return': float(np.median(trade_returns)) if trade_returns.size else np.nan,
+                'hit_rate': float(np.mean(trade_returns > 0)) if trade_returns.size else np.nan,
+                'max_drawdown': max_drawdown(per_day)
+            }
+    return result
+
+
+def signal_list(panel, signals):
+    """
+    訊號明細
+
+    Returns:
+        list: [(日期, 股票代號, 名稱), ...] 依日期排序
+    """
+    date_idx, code_idx = np.nonzero(signals)
+    return [(panel['dates'][d], panel['codes'][c], panel['names'].get(panel['codes'][c], ''))
+            for d, c in zip(date_idx, code_idx)]
+
+
+def run_backtest(panel, params=None, horizons=(1, 3, 5)):
+    """
+    以一組參數回測整個資料期間
+
+    Args:
+        panel (dict): load_market_panel 的輸出
+        params (dict): 參數，未指定的使用 DEFAULT_PARAMS
+        horizons (tuple): 持有天數
+
+    Returns:
+        tuple: (signals, 統計結果)
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    signals = volume_spike_signals(panel, **params)
+    return signals, evaluate_signals(signals, panel['ClosingPrice'], horizons)
+
+
+if __name__ == "__main__":
+    start = time.time()
+    panel = load_market_panel()
+    print(f"載入 {len(panel['dates'])} 天 × {len(panel['codes'])} 檔，耗時 {time.time() - start:.2f} 秒")
+
+    start = time.time()
+    signals, summary = run_backtest(panel)
+    print(f"回測耗時 {time.time() - start:.3f} 秒，共 {int(signals.sum())} 個訊號")
+    for horizon, stats in summary.items():
+        print(f"持有 {horizon} 天: 交易 {stats['trades']} 筆，平均報酬 {stats['mean_return']:.2%}，"
+              f"勝率 {stats['hit_rate']:.2%}，最大回撤 {stats['max_drawdown']:.2%}")
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+
+from price_limits import has_price_limit, is_etf_code, limit_prices
+
+baseline_dir = './Strategy1/baseline'
+
+# 盤前基準表: 每檔股票一列，盤中掃描器直接以 memory-map 讀取
+BASELINE_DTYPE = np.dtype([
+    ('code', 'U8'),
+    ('name', 'U16'),
+    ('five_ma_volume', 'f8'), # 5 日均量 (張)
+    ('prev_volume', 'f8'),    # 昨量 (張)
+    ('prev_close', 'f8'),     # 昨收
+    ('cv', 'f8'),             # 成交量變異係數
+    ('limit_up', 'f8'),       # 今日漲停價 (沒有漲跌幅限制為 NaN)
+    ('limit_down', 'f8'),     # 今日跌停價 (沒有漲跌幅限制為 NaN)
+])
+
+
+def _to_float(value):
+    try:
+        return float(str(value).replace(',', ''))
+    except ValueError:
+        return np.nan
+
+
+def build_baseline(watch_list):
+    """
+    盤前篩選結果轉成基準表 (單位換算、漲跌停價都在這裡先算好)
+
+    Args:
+        watch_list (dict): 股票代號 -> 盤前篩選資料 (screener.screen_date / test.json 格式)
+
+    Returns:
+        np.ndarray: BASELINE_DTYPE 陣列，依 watch_list 順序
+    """
+    codes = list(watch_list)
+    table = np.zeros(len(codes), dtype=BASELINE_DTYPE)
+    table['code'] = codes
+    table['name'] = [watch_list[code].get('Name', '') for code in codes]
+    table['five_ma_volume'] = [_to_float(watch_list[code]['5ma_TradeVolume']) / 1000 for code in codes]
+    table['prev_volume'] = [_to_float(watch_list[code]['TradeVolume']) / 1000 for code in codes]
+    table['prev_close'] = [_to_float(watch_list[code]['ClosingPrice']) for code in codes]
+    table['cv'] = [_to_float(watch_list[code].get('cv', np.nan)) for code in codes]
+    table['limit_up'], table['limit_down'] = limit_prices(table['prev_close'], is_etf_code(codes))
+    # 沒有漲跌幅限制的商品不標示漲停 (與 NaN 比較一律為 False)
+    no_limit = np.array([not has_price_limit(code) for code in codes], dtype=bool)
+    table['limit_up'][no_limit] = np.nan
+    table['limit_down'][no_limit] = np.nan
+    return table
+
+
+def baseline_path(date, baseline_dir=baseline_dir):
+    """
+    Args:
+        date (str): 盤前篩選使用的最後一天 (民國日期)
+    """
+    return os.path.join(baseline_dir, f"baseline_{date}.npy")
+
+
+def save_baseline(table, path):
+    """以 .npy 格式寫入基準表 (先寫暫存檔再改名，避免掃描器讀到寫一半的檔案)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, table, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+def load_baseline(path, dtype=BASELINE_DTYPE):
+    """
+    以 memory-map 讀取基準表 (唯讀)
+
+    Args:
+        path (str): .npy 檔路徑
+        dtype (np.dtype): 預期的欄位格式
+
+    Returns:
+        np.memmap: dtype 格式的陣列
+    """
+    table = np.load(path, mmap_mode='r', allow_pickle=False)
+    if table.dtype != dtype:
+        raise ValueError(f"基準表 {path} 欄位格式不符: {table.dtype}")
+    return table
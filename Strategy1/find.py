@@ -1,58 +1,27 @@
 
-import pandas as pd
 import sys
 import os
 import json
 
-data_dir = './raw_stock_data/daily/twse'
-
-def find_Target(date:str):
-    files = [f for f in os.listdir(data_dir) if f.endswith('.json') and f != 'today.json']
-    files = sorted(files, reverse=True)
-    files_idx = files.index(f'{date}.json')
-    files = files[files_idx:files_idx+5]
-    print(files)
-
-    db = pd.DataFrame()
-
-    for file in files:
-        with open(os.path.join(data_dir, file), 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if 'data' in data:
-                df = pd.DataFrame(data['data']).T
-                df.columns = data['fields']
-                df['Date'] = data['date']
-                db = pd.concat([db, df], ignore_index=True)
-                #刪除OpeningPrice
-                db = db.drop(columns=['OpeningPrice', 'HighestPrice', 'LowestPrice', 'TradeValue'])
-
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import screener
+from baseline import baseline_path, build_baseline, save_baseline
 
+data_dir = './raw_stock_data/daily/twse'
 
-    #計算所有股票的五日平均成交量
-    db['TradeVolume'] = db['TradeVolume'].astype(float)
-    # print(db.groupby('Code').get_group('0050'))
-    # print(db.groupby('Code')['TradeVolume'].get_group('0050').mean())
-    db['5ma_TradeVolume'] = pd.NA
-    mean_volumes = db.groupby('Code')['TradeVolume'].mean()
-
-    for code, group in db.groupby('Code'):
-        latest_date_index = group['Date'].idxmax()
-        db.loc[latest_date_index, '5ma_TradeVolume'] = mean_volumes[code]
-
-    # 新增計算每個股票的樣本標準差
-    db['FiveDaySampleStdDev'] = db.groupby('Code')['TradeVolume'].transform('std')
-    db['cv'] = db['FiveDaySampleStdDev'] / db['5ma_TradeVolume']
-
-    # 保留最後一天的資訊
-    db = db.groupby('Date').get_group(date)
-
-    db = db[db['cv'] < 0.5]
-    print(len(db))
+def find_Target(date:str, window:int = 5, cv_threshold:float = 0.5):
+    """
+    盤前篩選成交量穩定的股票 (變異係數 < cv_threshold)，結果寫入 ./test.json，
+    盤中掃描使用的基準表 (baseline.BASELINE_DTYPE) 寫入 baseline.baseline_path(date)
 
-    db = db.set_index('Code')
+    計算方式見 screener.screen_date，只讀取 date 往前 window 天的資料
+    """
+    target = screener.screen_date(date, window, cv_threshold, data_dir)
+    print(len(target))
 
     with open('./test.json', 'w', encoding='utf-8') as f:
-        json.dump(db.to_dict(orient='index'), f, ensure_ascii=False, indent=1)
+        json.dump(target, f, ensure_ascii=False, indent=1)
+    save_baseline(build_baseline(target), baseline_path(date))
 
 if __name__ == "__main__":
     find_Target('1140804')
@@ -0,0 +1,299 @@
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'stock_realtime_heatmap')))
+import screener
+import timenormalyize as tn
+from baseline import baseline_dir, load_baseline, save_baseline
+from price_limits import ex_rights_reference, has_price_limit, is_etf_code, limit_prices, tick_sizes
+from quote_source import create_quote_source
+from realtime import CYCLE_SECONDS, QuoteFetcher, effective_cycle_seconds
+from utility_function import load_ex_rights_from_event_file
+
+archive_dir = './raw_stock_data/daily'
+event_path = './raw_stock_data/suspend_trading.json'
+
+# 漲跌停價表 (所有上市櫃股票)，盤前計算好，盤中以 memory-map 讀取
+LIMIT_DTYPE = np.dtype([
+    ('code', 'U8'),
+    ('name', 'U16'),
+    ('prev_close', 'f8'),  # 昨收 (除權息當天為參考價)，漲跌停價與漲跌幅都以此計算
+    ('limit_up', 'f8'),
+    ('limit_down', 'f8'),
+    ('near_up', 'f8'),   # 價格 >= near_up 視為接近漲停
+    ('near_down', 'f8'), # 價格 <= near_down 視為接近跌停
+])
+
+# 狀態 (正值為漲停方向、負值為跌停方向)
+LOCKED_DOWN, AT_DOWN, NEAR_DOWN, NORMAL, NEAR_UP, AT_UP, LOCKED_UP = range(-3, 4)
+STATE_NAMES = {
+    LOCKED_UP: '漲停鎖住', AT_UP: '觸及漲停', NEAR_UP: '接近漲停', NORMAL: '',
+    NEAR_DOWN: '接近跌停', AT_DOWN: '觸及跌停', LOCKED_DOWN: '跌停鎖住',
+}
+
+
+def build_limit_table(date, markets=('twse', 'tpex'), archive_dir=archive_dir, event_path=event_path,
+                      approach_pct=0.01, lookback=5):
+    """
+    以每日收盤資料計算所有股票今天的漲跌停價
+
+    交易所以參考價計算漲跌停價，一般為昨收，除權息當天為除權息參考價 (依事件檔的現金 / 股票股利調整)
+
+    Args:
+        date (str): 交易日 (民國日期)，使用此日之前最近一天的收盤價
+        markets (tuple): raw_stock_data/daily 底下的市場資料夾
+        archive_dir (str): 每日收盤資料根目錄
+        event_path (str): genSuspendtrading 產生的事件檔 (除權息資料)
+        approach_pct (float): 距離漲跌停價 (以昨收計) 多少比例內視為接近，至少一個升降單位
+        lookback (int): 昨天沒有成交的股票往前找最近的收盤價
+
+    Returns:
+        np.ndarray: LIMIT_DTYPE 陣列
+    """
+    codes, names, prev_close = [], [], []
+    seen = set()
+    for market in markets:
+        market_dir = os.path.join(archive_dir, market)
+        dates = [d for d in screener.list_dates(market_dir) if d < date]
+        if not dates:
+            print(f"⚠️ {market_dir} 沒有 {date} 之前的收盤資料")
+            continue
+        panel = screener.load_panel(market_dir, end_date=dates[-1], last_n=lookback, fields=('ClosingPrice',))
+
+        # 每檔股票最近一天有收盤價的資料
+        close = panel['ClosingPrice']
+        valid = np.isfinite(close)
+        last_row = close.shape[0] - 1 - np.argmax(valid[::-1], axis=0)
+        last_close = close[last_row, np.arange(close.shape[1])]
+
+        for code, value in zip(panel['codes'], last_close):
+            if code in seen or not np.isfinite(value) or not has_price_limit(code):
+                continue
+            seen.add(code)
+            codes.append(code)
+            names.append(panel['names'].get(code, ''))
+            prev_close.append(value)
+
+    table = np.zeros(len(codes), dtype=LIMIT_DTYPE)
+    table['code'] = codes
+    table['name'] = names
+    table['prev_close'] = prev_close
+
+    ex_date = tn.normalize_date(date, "CE", "-")
+    ex_rights = load_ex_rights_from_event_file(event_path, ex_date)
+    if ex_rights is None:
+        print(f"⚠️ {event_path} 沒有 {ex_date} 的除權息資料，漲跌停價以昨收計算")
+    else:
+        cash = np.array([ex_rights.get(code, (0.0, 0.0))[0] for code in codes])
+        stock = np.array([ex_rights.get(code, (0.0, 0.0))[1] for code in codes])
+        adjusted = (cash > 0) | (stock > 0)
+        table['prev_close'][adjusted] = ex_rights_reference(table['prev_close'][adjusted], cash[adjusted], stock[adjusted])
+        print(f"{ex_date} 除權息 {int(adjusted.sum())} 檔，以參考價計算漲跌停價")
+
+    is_etf = is_etf_code(codes)
+    table['limit_up'], table['limit_down'] = limit_prices(table['prev_close'], is_etf)
+    margin = table['prev_close'] * approach_pct
+    table['near_up'] = table['limit_up'] - np.maximum(margin, tick_sizes(table['limit_up'], is_etf))
+    table['near_down'] = table['limit_down'] + np.maximum(margin, tick_sizes(table['limit_down'], is_etf))
+    return table
+
+
+def limit_table_path(date, baseline_dir=baseline_dir):
+    """
+    Args:
+        date (str): 交易日 (民國日期)
+    """
+    return os.path.join(baseline_dir, f"limits_{date}.npy")
+
+
+def _first_price(prices):
+    """五檔報價的第一檔，沒有掛單 ('-' 或空 list) 時為 NaN"""
+    try:
+        return float(prices[0])
+    except (IndexError, TypeError, ValueError):
+        return np.nan
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_book(quotes, code_pos):
+    """
+    twstock 格式的報價轉成陣列
+
+    Returns:
+        tuple: (positions, price, bid, ask)，沒有資料時為 NaN
+    """
+    codes = [code for code in quotes if code != "success" and code in code_pos]
+    positions = np.fromiter((code_pos[code] for code in codes), dtype=np.intp, count=len(codes))
+    realtime = [quotes[code]["realtime"] for code in codes]
+    price = np.array([_to_float(data.get("latest_trade_price")) for data in realtime])
+    bid = np.array([_first_price(data.get("best_bid_price")) for data in realtime])
+    ask = np.array([_first_price(data.get("best_ask_price")) for data in realtime])
+    return positions, price, bid, ask
+
+
+def classify(price, bid, ask, limit_up, limit_down, near_up, near_down):
+    """
+    依漲跌停價判斷狀態 (向量化)
+
+    - 鎖住: 委買第一檔掛在漲停價 (委賣第一檔掛在跌停價)
+    - 觸及: 成交價等於漲停價 / 跌停價
+    - 接近: 成交價 >= near_up / <= near_down
+
+    Returns:
+        np.ndarray: int8 狀態陣列 (LOCKED_DOWN ~ LOCKED_UP)
+    """
+    # 價格比較容許浮點誤差
+    eps = 1e-6
+
+    state = np.zeros(price.shape, dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        state[price >= near_up - eps] = NEAR_UP
+        state[price >= limit_up - eps] = AT_UP
+        state[bid >= limit_up - eps] = LOCKED_UP
+        state[price <= near_down + eps] = NEAR_DOWN
+        state[price <= limit_down + eps] = AT_DOWN
+        state[ask <= limit_down + eps] = LOCKED_DOWN
+    return state
+
+
+class LimitScanner:
+    """
+    盤中漲跌停掃描
+
+    - 所有股票的漲跌停價與「接近」門檻在盤前算好 (build_limit_table)，盤中每批報價只有陣列比較
+    - step(quotes) 回傳狀態有變化的股票 (例如 接近漲停 -> 漲停鎖住、打開漲停)
+    """
+
+    def __init__(self, table, quote_source=None):
+        """
+        Args:
+            table (np.ndarray): LIMIT_DTYPE 漲跌停價表
+            quote_source (QuoteSource): 報價來源，None 表示依環境變數 QUOTE_SOURCE 建立 (只有 run / scan_once 需要)
+        """
+        self.table = table
+        self.codes = table['code'].tolist()
+        self.code_pos = {code: i for i, code in enumerate(self.codes)}
+        self.state = np.zeros(len(self.codes), dtype=np.int8)
+        self.latest_price = np.full(len(self.codes), np.nan)
+        self._quote_source = quote_source
+        self._fetcher = None
+
+    @classmethod
+    def from_archive(cls, date=None, archive_dir=archive_dir, table_dir=baseline_dir, **kwargs):
+        """
+        讀取 (或計算後寫入) 交易日的漲跌停價表並建立掃描器
+
+        Args:
+            date (str): 交易日 (任意格式)，None 表示今天
+            archive_dir (str): 每日收盤資料根目錄
+            table_dir (str): 漲跌停價表資料夾
+
+        Returns:
+            LimitScanner
+        """
+        date = tn.normalize_date(date or tn.get_current_date(), "ROC", "")
+        path = limit_table_path(date, table_dir)
+        if not os.path.exists(path):
+            save_baseline(build_limit_table(date, archive_dir=archive_dir), path)
+        return cls(load_baseline(path, LIMIT_DTYPE), **kwargs)
+
+    @property
+    def quote_source(self):
+        if self._quote_source is None:
+            self._quote_source = create_quote_source()
+        return self._quote_source
+
+    @property
+    def fetcher(self):
+        if self._fetcher is None:
+            self._fetcher = QuoteFetcher(self.quote_source)
+        return self._fetcher
+
+    def step(self, quotes):
+        """
+        評估一批報價
+
+        Args:
+            quotes (dict): twstock.realtime.get 格式的報價 (可以只有部分股票)
+
+        Returns:
+            dict: 狀態有變化的股票代號 -> {'state', 'prev_state', 'price', 'change', 'limit_up', 'limit_down'}
+        """
+        positions, price, bid, ask = parse_book(quotes, self.code_pos)
+        if positions.size == 0:
+            return {}
+
+        # twstock 在沒有新成交時成交價為 '-'，此時以委買 / 委賣價代替
+        price = np.where(np.isfinite(price), price, np.where(np.isfinite(bid), bid, ask))
+        self.latest_price[positions] = np.where(np.isfinite(price), price, self.latest_price[positions])
+
+        table = self.table
+        state = classify(price, bid, ask, table['limit_up'][positions], table['limit_down'][positions],
+                         table['near_up'][positions], table['near_down'][positions])
+        # 沒有成交也沒有掛單的股票維持原本的狀態
+        state = np.where(np.isfinite(price), state, self.state[positions])
+
+        changed = np.flatnonzero(state != self.state[positions])
+        events = {}
+        for i in changed:
+            pos = positions[i]
+            latest = self.latest_price[pos]
+            events[self.codes[pos]] = {
+                'state': STATE_NAMES[int(state[i])] or '恢復正常',
+                'prev_state': STATE_NAMES[int(self.state[pos])],
+                'price': float(latest),
+                'change': round(float(latest / table['prev_close'][pos] - 1), 4),
+                'limit_up': float(table['limit_up'][pos]),
+                'limit_down': float(table['limit_down'][pos]),
+            }
+        self.state[positions] = state
+        return events
+
+    def flagged(self):
+        """
+        Returns:
+            dict: 目前接近 / 觸及 / 鎖住漲跌停的股票代號 -> 狀態名稱
+        """
+        return {self.codes[pos]: STATE_NAMES[int(self.state[pos])] for pos in np.flatnonzero(self.state)}
+
+    def scan_once(self):
+        """掃描一輪，印出狀態有變化的股票，回報這一輪的延遲"""
+        start = time.monotonic()
+        ret, ok_chunks, total_chunks = self.fetcher.fetch(self.codes)
+        events = self.step(ret)
+        for code, event in events.items():
+            print(f"{datetime.datetime.now():%H:%M:%S} {code} {self.table['name'][self.code_pos[code]]} "
+                  f"{event['prev_state'] or '正常'} -> {event['state']}，價格 {event['price']} ({event['change']:+.2%})")
+
+        cycle_seconds = time.monotonic() - start
+        print(f"漲跌停掃描 {len(ret) - 1}/{len(self.codes)} 檔 ({ok_chunks}/{total_chunks} 批)，"
+              f"{len(self.flagged())} 檔接近或觸及漲跌停，整輪 {cycle_seconds:.2f} 秒")
+        return cycle_seconds
+
+    def run(self, cycle_seconds=CYCLE_SECONDS):
+        """每 cycle_seconds 秒掃描一輪，掃描時間超過週期時立即開始下一輪"""
+        cycle_seconds = effective_cycle_seconds(self.fetcher, self.codes, cycle_seconds)
+        try:
+            while True:
+                elapsed = self.scan_once()
+                time.sleep(max(0.0, cycle_seconds - elapsed))
+        finally:
+            if self._fetcher is not None:
+                self._fetcher.shutdown()
+
+
+if __name__ == "__main__":
+    scanner = LimitScanner.from_archive()
+    scanner.run()
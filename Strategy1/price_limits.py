@@ -0,0 +1,104 @@
+import os
+import sys
+
+import numpy as np
+
+# 升降單位與模擬報價共用 quote_source 的實作
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from quote_source import tick_sizes
+
+PRICE_LIMIT = 0.10 # 漲跌幅限制 ±10%
+
+# 國外成分股 ETF (含槓桿 / 反向) 沒有漲跌幅限制。證交所代號與商品分類欄位都無法分辨，只能列出代號，新掛牌時需補上
+FOREIGN_ETF_CODES = frozenset({
+    '0061', '006205', '006206', '006207', '00625K', '00636', '00643', '00645', '00646', '00652',
+    '00657', '00661', '00662', '00668', '00709', '00714', '00717', '00757', '00762', '00830',
+    '00882', '00885', '00893', '00895',
+    '00633L', '00634R', '00637L', '00638R', '00640L', '00641R', '00647L', '00648R', '00655L', '00656R',
+    '00670L', '00671R',
+})
+
+
+def is_etf_code(codes):
+    """
+    ETF / 受益憑證代號 (00 開頭) 使用不同的升降單位
+
+    Returns:
+        np.ndarray: bool 陣列
+    """
+    return np.array([str(code).startswith('00') for code in codes], dtype=bool)
+
+
+def has_price_limit(code):
+    """
+    是否適用 ±10% 漲跌幅: 一般股票、特別股 (4 碼數字開頭、最多 5 碼) 與國內成分股 ETF (00 開頭)
+
+    債券 ETF (B 結尾)、國外期貨 ETF (U 結尾) 與國外成分股 ETF 沒有漲跌幅限制，
+    權證等其他商品的漲跌幅另有計算方式，都不適用
+    """
+    if code.startswith('00'):
+        return code not in FOREIGN_ETF_CODES and not code.endswith(('B', 'U'))
+    return len(code) <= 5 and code[:4].isdigit()
+
+
+def ex_rights_reference(prev_close, cash, stock, par_value=10.0):
+    """
+    除權息參考價 = (昨收 - 現金股利) / (1 + 股票股利 / 面額)，除權息當天的漲跌幅以此計算
+
+    Args:
+        prev_close (np.ndarray): 昨收價
+        cash (np.ndarray): 每股現金股利 (元)，沒有配發為 0
+        stock (np.ndarray): 每股股票股利 (元)，沒有配發為 0
+        par_value (float): 面額
+
+    Returns:
+        np.ndarray: 參考價 (四捨五入到 0.01)
+
+    >>> [float(x) for x in ex_rights_reference(np.array([100.0, 50.0]), np.array([2.0, 1.0]), np.array([0.0, 1.0]))]
+    [98.0, 44.55]
+    """
+    prev_close = np.asarray(prev_close, dtype=float)
+    return np.round((prev_close - cash) / (1 + np.asarray(stock, dtype=float) / par_value), 2)
+
+
+def limit_prices(prev_close, is_etf, limit=PRICE_LIMIT):
+    """
+    漲停價 / 跌停價
+
+    漲停價 = 昨收 × (1 + limit) 依該價位的升降單位無條件捨去，
+    跌停價 = 昨收 × (1 - limit) 依該價位的升降單位無條件進位
+
+    Args:
+        prev_close (np.ndarray): 昨收價 (NaN 表示沒有資料)
+        is_etf (np.ndarray): 是否為 ETF
+        limit (float): 漲跌幅限制
+
+    Returns:
+        tuple: (limit_up, limit_down)，昨收為 NaN 時為 NaN
+
+    升降單位交界的例子 (股票 9.5 -> 10.45、45.5 -> 50.05 捨去到 50.0、ETF 以 0.01 為單位):
+
+    >>> up, down = limit_prices(np.array([9.5, 45.5, 1000.0, 10.45, 48.0, 98.0]),
+    ...                         np.array([False, False, False, True, True, False]))
+    >>> [float(x) for x in up]
+    [10.45, 50.0, 1100.0, 11.49, 52.8, 107.5]
+    >>> [float(x) for x in down]
+    [8.55, 40.95, 900.0, 9.41, 43.2, 88.2]
+    """
+    prev_close = np.asarray(prev_close, dtype=float)
+    up = prev_close * (1 + limit)
+    down = prev_close * (1 - limit)
+
+    with np.errstate(invalid='ignore'):
+        # 先四捨五入到 1e-6 再取整，避免 10.45 / 0.05 = 208.99999... 之類的浮點誤差
+        up_tick = tick_sizes(up, is_etf)
+        limit_up = np.floor(np.round(up / up_tick, 6)) * up_tick
+        down_tick = tick_sizes(down, is_etf)
+        limit_down = np.ceil(np.round(down / down_tick, 6)) * down_tick
+    return np.round(limit_up, 2), np.round(limit_down, 2)
+
+
+if __name__ == "__main__":
+    # 檢查漲跌停價的升降單位交界: python Strategy1/price_limits.py
+    import doctest
+    doctest.testmod(verbose=False)
@@ -1,241 +1,354 @@
 import datetime
 import os
-import json
 import find
-import twstock
 import time
-import requests
-import schedule
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # 加入上層目錄到 sys.path 以便匯入 timenormalize
 import sys
-import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# 暫停交易事件檔與熱力圖共用同一個讀取函式
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'stock_realtime_heatmap')))
 import timenormalyize as tn
+from utility_function import load_suspended_from_event_file
+import numpy as np
+from volume_buffer import VolumeBucketBuffer, session_fraction
+from volume_profile import VolumeProfile
+from quote_source import create_quote_source
+from signal_journal import SignalJournal, SignalAlertDispatcher
+from baseline import baseline_path, load_baseline
 
 base_dir = './Strategy1'
-update_trigger_l = {}
-date = tn.get_current_date()
-date = tn.normalize_date(date, "ROC", "")
-find.find_Target(tn.cal_date(date, -1))
-data_dir = "./raw_stock_data/daily/twse"
-with open("./test.json", "r", encoding="utf-8") as f:
-    yesterday = json.load(f)
-with open("raw_stock_data/suspend_trading.json", "r", encoding="utf-8") as f:
-    suspend_trading = json.load(f)
-
-code_list = [item for item in yesterday]
-
-stop_track = [code.split('.')[0] for code in suspend_trading[tn.normalize_date(date, "CE", "-")].keys()]
-code_list = [item for item in yesterday if item not in stop_track]
-
-notify_list = {}
-
-idx = 0
-count = 0
-
-def creat_temp_record_data():
-    return{
-        'last_record_time':'-',
-        'last_api_trigger_time':'-',
-        'normalized_trade_volume':'-',
-        'his_per3_min_time':[],
-        'his_per3_min_acc_trade':[],
-        'his_per3_min_trade':[]
-    }
-
-def save_update_trigger_l():
-    print("Saving update_trigger_l to file...")
-    global update_trigger_l
-    with open(f'{base_dir}/update_trigger.json', "w", encoding="utf-8") as f:
-        json.dump(update_trigger_l, f, ensure_ascii=False, indent=1)
-
-
-def notify_discord():
-    """Send a notification to Discord with the stock data."""
-    webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
-    if not webhook_url:
-        print("⚠️ DISCORD_WEBHOOK_URL is not set.")
-        return
-
-    headers = {"Content-Type": "application/json"}
-
-    # 建立 Discord 訊息
-    embed = {
-        "title": f"Stock Alert Notification",
-        # "color": 0x00FF00,  # 綠色
-        "fields": [],
-    }
-
-    for code, data in notify_list.items():
-        embed["fields"].append(
-            {
-                "name": f"Stock Code: {code}",
-                "value": (
-                    f"Yesterday Volume: {data['yesvol']}K\n"
-                    f"Today Volume: {data['nowvol']}K\n"
-                    f"5MA Volume: {data['5maprice']}K\n"
-                    f"Current Price: {data['nowprice']}\n"
-                    f"Link: [View on Yahoo Finance](https://tw.stock.yahoo.com/quote/{code}/technical-analysis)"
-                ),
-                "inline": False,
-            }
-        )
+raw_dir = './raw_stock_data'
+
+# 每輪掃描整個觀察名單的週期 (玉山 / 模擬來源)。twstock 受證交所 mis 限流 (約每 5 秒 3 次請求)，
+# 週期會自動放大到 批數 × TwstockQuoteSource.min_request_interval
+CYCLE_SECONDS = 3
+CHUNK_SIZE = 100 # 每次查詢的股票數
+CHUNK_TIMEOUT_SECONDS = 2.5 # 每輪最多等待秒數，沒完成的批次留到下一輪
+MAX_CONCURRENT_CHUNKS = 16 # 同時查詢的批數
 
-    payload = {"embeds": [embed]}
 
+def _to_float(value):
     try:
-        response = requests.post(webhook_url, headers=headers, json=payload)
-        response.raise_for_status()
-        print("✅ Notification sent successfully.")
-    except requests.RequestException as e:
-        print(f"❌ Failed to send notification: {e}")
-    notify_list.clear()  # 清空通知列表
-
-
-def update_trigger(code: str, yesvol, nowvol, _5maprice, nowprice):
-
-    if code not in update_trigger_l:
-        update_trigger_l[code] = {
-            "yesvol": yesvol,
-            "nowvol": nowvol,
-            "5maprice": _5maprice,
-            "nowprice": nowprice,
-        }
-        print(
-            f"code = {code}, yesval = {yesvol}, todayval = {nowvol}, 5maval = {_5maprice}, nowprice = {nowprice}"
-        )
-
-        notify_list[code] = update_trigger_l[code]
-
-
-def trigger_code_NEW(rdatas: dict):
-    now = datetime.datetime.now()
-    start_t = datetime.datetime.combine(now.date(), datetime.time(9, 0, 0))
-    end_t = datetime.datetime.combine(now.date(), datetime.time(13, 30, 0))
-    for data in rdatas:
-        if data == "success":
-            continue
-        if data not in update_trigger_l:
-            update_trigger_l[data] = creat_temp_record_data()
-            print(f"Create new record for {data}")
-        _5ma_trade_vol = yesterday[data]["5ma_TradeVolume"] / 1000  # 轉換為千股(張)
-        now_acc_trade_vol = float(rdatas[data]["realtime"]["accumulate_trade_volume"])  #本來就是張
-        # now_time = rdatas[data]['info']['time'].split(" ")[1]
-        # now_time = datetime.datetime.strptime(now_time, "%H:%M:%S")
-        # print(f'now_time = {now_time.strftime("%H:%M:%S")}')
-
-        now_time = now
-        # now_time = now_time.strftime("%H:%M:%S")
-        
-        time_percentage = (now_time - start_t) / (end_t - start_t)
-        # print(f'time_percentage = {time_percentage}')
-
-        normalized_trade_volume = now_acc_trade_vol * (1 / time_percentage)  # 正規化的成交量
-
-        update_trigger_l[data]['last_record_time'] = now_time.strftime("%H:%M:%S")
-        update_trigger_l[data]['last_api_trigger_time'] = rdatas[data]['info']['time'].split(" ")[1]
-        update_trigger_l[data]['normalized_trade_volume'] = normalized_trade_volume
-
-        # 每 3 分鐘記錄一次：若分鐘為 3 的倍數，且 (尚無紀錄 或 與上一筆紀錄的 HH:MM 不同) 才新增
-        per3_time_list = update_trigger_l[data]['his_per3_min_time']
-        current_min_key = now_time.strftime("%H:%M")
-        last_min_key = per3_time_list[-1][:5] if per3_time_list else None
-        if (now_time.minute % 3 == 0) and (not per3_time_list or current_min_key != last_min_key):
-            per3_time_list.append(now_time.strftime("%H:%M:%S"))
-            acc_list = update_trigger_l[data]['his_per3_min_acc_trade']
-            acc_list.append(str(now_acc_trade_vol))
-            trade_list = update_trigger_l[data]['his_per3_min_trade']
-            if len(acc_list) == 1:
-                trade_list.append('-')  # 第一筆沒有差值
-            else:
-                try:
-                    diff = float(acc_list[-1]) - float(acc_list[-2])
-                except ValueError:
-                    diff = 0
-                trade_list.append(str(diff))
-        # if normalized_trade_volume >= _5ma_trade_vol * 2:
-        #     print(f'code = {data}, 5matrade = {_5ma_trade_vol}, nowtrade = {now_acc_trade_vol}, time_percentage = {time_percentage}, normalized trade volume = {normalized_trade_volume}')
-            # print(f"Code {data} meets the condition.")
-
-
-
-
-def trigger_code(rdatas: dict):
-    for data in rdatas:
-        if data == "success":
-            continue
-        # print(f'data = {data}')
-        yesday_acc_trade_vol = yesterday[data]["TradeVolume"] / 1000
-        yesday_5ma_trade_vol = yesterday[data]["5ma_TradeVolume"] / 1000
-        yesday_last_price = float(yesterday[data]["ClosingPrice"])
-        # print(yesday_acc_trade_vol)
-        today_acc_trade_vol = float(rdatas[data]["realtime"]["accumulate_trade_volume"])
-
-        if rdatas[data]["realtime"]["latest_trade_price"] != "-":
-            today_last_price = float(rdatas[data]["realtime"]["latest_trade_price"])
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def parse_quotes(quotes, code_pos):
+    """
+    twstock 格式的報價轉成陣列
+
+    Args:
+        quotes (dict): twstock.realtime.get 格式的報價
+        code_pos (dict): 股票代號 -> 位置，不在其中的股票略過
+
+    Returns:
+        tuple: (positions, acc_volume, price)，acc_volume 為累積成交量 (張)，沒有成交價時 price 為 NaN
+    """
+    # 暫停交易或代號錯誤時 twstock 可能回傳沒有 realtime 的資料，略過
+    codes = [code for code, data in quotes.items()
+             if code in code_pos and isinstance(data, dict) and data.get("success") and "realtime" in data]
+    positions = np.fromiter((code_pos[code] for code in codes), dtype=np.intp, count=len(codes))
+    acc_volume = np.array([_to_float(quotes[code]["realtime"]["accumulate_trade_volume"]) for code in codes])  # 本來就是張
+    price = np.array([_to_float(quotes[code]["realtime"]["latest_trade_price"]) for code in codes])  # '-' 為 NaN
+    return positions, acc_volume, price
+
+
+class QuoteFetcher:
+    """
+    同時查詢整個清單 (每批 chunk_size 檔)
+
+    - 每批最多等待 chunk_timeout 秒，逾時的批次不會被中斷 (執行中的 future 無法取消)，
+      而是記在 in-flight 中: 還沒完成前不重複送出，完成後的結果在下一輪合併
+    - 來源有限流 (quote_source.min_request_interval，例如 twstock 約每 5 秒 3 次) 時，
+      min_cycle_seconds() 為查完一整輪至少需要的秒數
+    """
+
+    def __init__(self, quote_source, chunk_size=CHUNK_SIZE, chunk_timeout=CHUNK_TIMEOUT_SECONDS,
+                 max_workers=MAX_CONCURRENT_CHUNKS):
+        """
+        Args:
+            quote_source (QuoteSource): 報價來源
+            chunk_size (int): 每次查詢的股票數 (twstock 一次查詢有上限)
+            chunk_timeout (float): 每輪最多等待秒數，沒完成的批次留到下一輪
+            max_workers (int): 同時查詢的批數
+        """
+        self.quote_source = quote_source
+        self.chunk_size = chunk_size
+        self.chunk_timeout = chunk_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._in_flight = {} # 批次 (股票代號 tuple) -> future
+
+    def chunks(self, codes):
+        return [tuple(codes[i:i + self.chunk_size]) for i in range(0, len(codes), self.chunk_size)]
+
+    def min_cycle_seconds(self, codes):
+        return len(self.chunks(codes)) * self.quote_source.min_request_interval
+
+    def fetch(self, codes):
+        """
+        Returns:
+            tuple: (ret, ok_chunks, total_chunks)，ret 為合併後 twstock 格式的報價
+                   (包含上一輪逾時、這一輪才完成的批次)
+        """
+        chunks = self.chunks(codes)
+        for chunk in chunks:
+            if chunk not in self._in_flight:
+                self._in_flight[chunk] = self._executor.submit(self.quote_source.get, list(chunk))
+        wait(self._in_flight.values(), timeout=self.chunk_timeout)
+
+        ret = {'success': True}
+        ok_chunks = 0
+        for chunk, future in list(self._in_flight.items()):
+            if not future.done():
+                print(f"⚠️ 查詢超過 {self.chunk_timeout} 秒，等待下一輪: {chunk[0]} 等 {len(chunk)} 檔")
+                continue
+            del self._in_flight[chunk]
+            try:
+                data = future.result()
+            except Exception as e:
+                print(f"An error occurred while fetching data: {e}")
+                print(f"Failed to retrieve data for list: {list(chunk)}")
+                continue
+            if not data or not data.get('success'):
+                print(f"Failed to retrieve data for list: {list(chunk)}")
+                continue
+            ret.update(data)
+            ok_chunks += 1
+        return ret, ok_chunks, len(chunks)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def effective_cycle_seconds(fetcher, codes, cycle_seconds):
+    """掃描週期不小於來源限流下查完一輪的時間"""
+    min_cycle = fetcher.min_cycle_seconds(codes)
+    if cycle_seconds < min_cycle:
+        print(f"⚠️ {fetcher.quote_source.name} 限流下查完 {len(codes)} 檔至少需要 {min_cycle:.1f} 秒，"
+              f"掃描週期由 {cycle_seconds} 秒改為 {min_cycle:.1f} 秒")
+        return min_cycle
+    return cycle_seconds
+
+
+class VolumeSpikeScanner:
+    """
+    Strategy1 盤中爆量掃描
+
+    - 觀察名單與基準資料 (baseline.BASELINE_DTYPE 基準表) 與暫停交易清單皆由建構時明確傳入，不依賴目前工作目錄
+    - 基準表已換算好單位，盤中評估只有陣列運算 (不查 dict、不換算單位)
+    - step(quotes) 以陣列一次評估一批報價，可直接以錄製的報價批次重播或測量效能
+    - run() 為即時掃描迴圈 (查詢報價 -> step -> 寫入成交量 log)
+
+    觸發條件: 正規化的成交量 (預估全天量) >= 5 日均量 × volume_multiplier，且現價相對昨收漲幅 > min_change
+    """
+
+    def __init__(self, baseline, suspended=(), quote_source=None, log_dir=f'{base_dir}/volume_log', date=None,
+                 volume_multiplier=2.0, min_change=0.0, volume_profile=None, journal=None, dispatcher=None):
+        """
+        Args:
+            baseline (np.ndarray): 基準表 (baseline.load_baseline / build_baseline 的輸出)
+            suspended (iterable): 暫停交易的股票代號，不列入掃描
+            quote_source (QuoteSource): 報價來源，None 表示依環境變數 QUOTE_SOURCE 建立 (只有 run / scan_once 需要)
+            log_dir (str): 成交量 log 資料夾，None 表示不寫入磁碟也不學習成交量曲線
+            date (str): 交易日 'YYYYMMDD'，None 表示今天
+            volume_multiplier (float): 成交量倍數
+            min_change (float): 漲幅下限 (0.01 = 1%)
+            volume_profile (VolumeProfile): 盤中累積成交量曲線，None 表示從 log_dir 的歷史 log 學習
+            journal (SignalJournal): 訊號記錄，重新啟動時已觸發的股票不再重複觸發，None 表示只記在記憶體
+            dispatcher (SignalAlertDispatcher): 訊號通知，None 表示不發送通知
+        """
+        suspended = set(suspended)
+        keep = np.array([code not in suspended for code in baseline['code']], dtype=bool)
+        if not keep.all():
+            baseline = baseline[keep]
+        self.baseline = baseline
+        self.codes = baseline['code'].tolist()
+        self.code_pos = {code: i for i, code in enumerate(self.codes)}
+        self.volume_multiplier = volume_multiplier
+        self.min_change = min_change
+        self._quote_source = quote_source
+
+        # 基準資料 (張)
+        self.yesterday_volume = baseline['prev_volume']
+        self.five_ma_volume = baseline['five_ma_volume']
+        self.yesterday_close = baseline['prev_close']
+        # 漲停時成交量放大屬於正常現象，觸發資料中標示出來
+        self.limit_up = baseline['limit_up']
+        self.latest_price = np.full(len(self.codes), np.nan)
+
+        # 每 3 分鐘累積成交量 (append-only log)
+        self.volume_buffer = VolumeBucketBuffer(self.codes, date=date, log_dir=log_dir)
+        # 以過去幾天的 log 學習盤中累積成交量曲線，取代以經過時間線性換算
+        if volume_profile is None:
+            volume_profile = (VolumeProfile.from_logs(self.codes, log_dir, before_date=self.volume_buffer.date)
+                              if log_dir is not None else VolumeProfile(self.codes))
+        self.volume_profile = volume_profile
+
+        self.journal = journal
+        self.dispatcher = dispatcher
+        # 今天已觸發的股票 (每檔只觸發一次)
+        self.triggered = dict(journal.signals) if journal is not None else {}
+        self._fetcher = None
+
+    @classmethod
+    def from_files(cls, date=None, raw_dir=raw_dir, signal_log_dir=f'{base_dir}/signal_log', **kwargs):
+        """
+        以前一交易日的盤前篩選 (find_Target 寫出的基準表) 與暫停交易清單建立掃描器
+
+        Args:
+            date (str): 交易日 (任意格式)，None 表示今天
+            raw_dir (str): raw_stock_data 資料夾 (suspend_trading.json)
+            signal_log_dir (str): 訊號記錄資料夾 (通知送到環境變數 DISCORD_WEBHOOK_URL)
+            **kwargs: 傳給建構子的其他參數
+
+        Returns:
+            VolumeSpikeScanner
+        """
+        date = tn.normalize_date(date or tn.get_current_date(), "ROC", "")
+        screen_date = tn.cal_date(date, -1)
+        find.find_Target(screen_date)
+        baseline = load_baseline(baseline_path(screen_date))
+        # 只採用今天產生的事件檔中的暫停交易事件 (前一天的事件檔也有今天的 key，但只有除權息事件)
+        suspend_date = tn.normalize_date(date, "CE", "-")
+        suspended = load_suspended_from_event_file(f"{raw_dir}/suspend_trading.json", suspend_date)
+        if suspended is None:
+            print(f"⚠️ suspend_trading.json 不是 {suspend_date} 產生的，不排除暫停交易股票")
+            suspended = set()
+        date = tn.normalize_date(date, "CE", "")
+
+        journal = SignalJournal(date, signal_log_dir)
+        dispatcher = None
+        webhook_url = os.getenv("DISCORD_WEBHOOK_URL")
+        if webhook_url:
+            dispatcher = SignalAlertDispatcher(webhook_url, on_sent=journal.record_alerted)
         else:
-            today_last_price = 0
-        # print(f'{today_last_price}, ')
-
-        # print(today_acc_trade_vol)
-        if (
-            today_acc_trade_vol >= yesday_5ma_trade_vol * 2
-            and today_last_price > yesday_last_price
-        ):
-            update_trigger(
-                data,
-                yesday_acc_trade_vol,
-                today_acc_trade_vol,
-                yesday_5ma_trade_vol,
-                today_last_price,
+            print("⚠️ DISCORD_WEBHOOK_URL is not set.")
+        return cls(baseline, suspended, date=date, journal=journal, dispatcher=dispatcher, **kwargs)
+
+    @property
+    def quote_source(self):
+        # 報價來源 (環境變數 QUOTE_SOURCE=twstock / esun / sim，sim 可離線重播或壓力測試)
+        if self._quote_source is None:
+            self._quote_source = create_quote_source()
+        return self._quote_source
+
+    def step(self, quotes, now=None):
+        """
+        評估一批報價
+
+        Args:
+            quotes (dict): twstock.realtime.get 格式的報價 (可以只有部分股票)
+            now (datetime.datetime): 報價時間，None 表示現在
+
+        Returns:
+            dict: 這一批新觸發的股票代號 -> 觸發資料 (yesvol, nowvol, normvol, 5maprice, nowprice, limit_up)
+        """
+        now = now or datetime.datetime.now()
+        positions, acc_volume, price = parse_quotes(quotes, self.code_pos)
+        if positions.size == 0:
+            return {}
+        # twstock 在沒有新成交時成交價為 '-' (NaN)，沿用上一次的成交價 (觸發判斷與 nowprice 都使用)
+        self.latest_price[positions] = np.where(np.isfinite(price), price, self.latest_price[positions])
+        price = self.latest_price[positions]
+
+        # 每 3 分鐘一格，記錄每格第一筆觀察到的累積量
+        self.volume_buffer.record(positions, acc_volume, now)
+
+        # 盤前沒有成交量可比較
+        if session_fraction(now) <= 0:
+            return {}
+
+        # 正規化的成交量: 以該時間點通常已完成的全天量比例換算成全天量 (早盤、尾盤量大，不能線性換算)
+        normalized = self.volume_profile.normalize(positions, acc_volume, now)
+        self.volume_buffer.normalized_volume[positions] = normalized
+
+        with np.errstate(invalid='ignore'):
+            hit = ((normalized >= self.five_ma_volume[positions] * self.volume_multiplier) &
+                   (price > self.yesterday_close[positions] * (1 + self.min_change)))
+
+        new_triggers = {}
+        for i in np.flatnonzero(hit):
+            pos = positions[i]
+            code = self.codes[pos]
+            if code in self.triggered:
+                continue
+            metrics = {
+                "yesvol": float(self.yesterday_volume[pos]),
+                "nowvol": float(acc_volume[i]),
+                "normvol": round(float(normalized[i]), 1),
+                "5maprice": float(self.five_ma_volume[pos]),
+                "nowprice": float(price[i]),
+                "limit_up": bool(price[i] >= self.limit_up[pos]),
+            }
+            if self.journal is not None and not self.journal.record_signal(code, metrics):
+                continue
+            new_triggers[code] = metrics
+            print(
+                f"code = {code}, yesval = {self.yesterday_volume[pos]}, todayval = {acc_volume[i]}, "
+                f"normalized = {normalized[i]:.1f}, 5maval = {self.five_ma_volume[pos]}, nowprice = {price[i]}"
             )
-            # print(f'code = {data}, yes = {yesday_acc_trade_vol}, today = {today_acc_trade_vol}')
-
-
-def get_ontime_data():
-    print(".", end='')
-    global idx
-    if idx + 100 < len(code_list):
-        this_list = code_list[idx : idx + 100]
-        idx += 100
-    else:
-        this_list = code_list[idx:]
-        idx = 0
-        print("")
-    # print(this_list)
-    try:
-        ret = twstock.realtime.get(this_list)
-    except Exception as e:
-        print(f"An error occurred while fetching data: {e}")
-        print(f"Failed to retrieve data for list: {this_list}")
-        return
-    if ret:  # Check if success is True
-        # print("Successfully retrieved data.")
-        trigger_code_NEW(ret)
-        # trigger_code(ret)
-    else:
-        print("Failed to ret data.")
-        with open("./error.json", "a", encoding="utf-8") as f:
-            json.dump(ret, f, ensure_ascii=False, indent=1)
-        return
-    # with open("./error.json", "a", encoding="utf-8") as f:
-    #     json.dump(ret, f, ensure_ascii=False, indent=1)
-    if idx == 0:
-        save_update_trigger_l()
-
-    # if(len(notify_list) != 0):
-    # notify_discord()
-
-schedule.every(2).seconds.do(get_ontime_data)
-# schedule.every(1).minutes.do(save_update_trigger_l)
+
+        self.triggered.update(new_triggers)
+        if self.dispatcher is not None:
+            self.dispatcher.enqueue(new_triggers)
+        return new_triggers
+
+    @property
+    def fetcher(self):
+        if self._fetcher is None:
+            self._fetcher = QuoteFetcher(self.quote_source)
+        return self._fetcher
+
+    def fetch(self):
+        """同時查詢整個觀察名單，見 QuoteFetcher"""
+        return self.fetcher.fetch(self.codes)
+
+    def scan_once(self):
+        """掃描一輪: 查詢整個觀察名單並重新評估每一檔，回報這一輪的延遲"""
+        start = time.monotonic()
+        ret, ok_chunks, total_chunks = self.fetch()
+        fetch_seconds = time.monotonic() - start
+
+        if len(ret) > 1:
+            self.step(ret)
+            self.volume_buffer.flush()
+        else:
+            print("Failed to ret data.")
+
+        cycle_seconds = time.monotonic() - start
+        print(f"掃描 {len(ret) - 1}/{len(self.codes)} 檔 ({ok_chunks}/{total_chunks} 批)，"
+              f"查詢 {fetch_seconds:.2f} 秒，整輪 {cycle_seconds:.2f} 秒")
+        return cycle_seconds
+
+    def run(self, cycle_seconds=CYCLE_SECONDS):
+        """每 cycle_seconds 秒掃描一輪，掃描時間超過週期時立即開始下一輪"""
+        # 上次執行時已觸發但尚未送出的通知
+        if self.journal is not None and self.dispatcher is not None:
+            self.dispatcher.enqueue(self.journal.pending_alerts())
+        cycle_seconds = effective_cycle_seconds(self.fetcher, self.codes, cycle_seconds)
+        try:
+            while True:
+                start = time.monotonic()
+                try:
+                    elapsed = self.scan_once()
+                except Exception as e:
+                    # 單次查詢或解析失敗不中斷盤中掃描，下一輪重試
+                    print(f"❌ 掃描失敗：{e}")
+                    elapsed = time.monotonic() - start
+                if elapsed > cycle_seconds:
+                    print(f"⚠️ 掃描一輪 {elapsed:.2f} 秒，超過週期 {cycle_seconds} 秒")
+                time.sleep(max(0.0, cycle_seconds - elapsed))
+        finally:
+            self.volume_buffer.flush()
+            if self._fetcher is not None:
+                self._fetcher.shutdown()
+            if self.dispatcher is not None:
+                self.dispatcher.stop(timeout=5)
+
 
 if __name__ == "__main__":
-    
-    test_count = 0
-
-    # while test_count < 125:
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
-        test_count += 1
+    scanner = VolumeSpikeScanner.from_files()
+    scanner.run()
@@ -0,0 +1,164 @@
+import json
+import os
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+data_dir = './raw_stock_data/daily/twse'
+
+PANEL_FIELDS = ('ClosingPrice', 'Change', 'OpeningPrice', 'HighestPrice', 'LowestPrice', 'TradeVolume')
+
+
+def list_dates(data_dir=data_dir):
+    """收盤資料的日期 (民國日期字串，由舊到新)"""
+    return sorted(f[:-5] for f in os.listdir(data_dir) if f.endswith('.json') and f[:-5].isdigit())
+
+
+def load_panel(data_dir=data_dir, end_date=None, last_n=None, fields=PANEL_FIELDS):
+    """
+    讀取每日收盤資料成 (日期 × 股票) 陣列
+
+    Args:
+        data_dir (str): 收盤資料資料夾
+        end_date (str): 最後一天 (民國日期)，None 表示最新一天
+        last_n (int): 只讀取 end_date 往前 last_n 天 (含)，None 表示全部
+        fields (tuple): 要讀取的數值欄位
+
+    Returns:
+        dict:
+            'dates' (list): 日期，由舊到新
+            'codes' (list): 股票代號 (所有日期出現過的股票)
+            'names' (dict): 股票代號 -> 名稱
+            'rows' (dict): 股票代號 -> end_date 當天的原始資料列 (欄位 -> 字串)
+            欄位名稱 (np.ndarray): (日期, 股票) 的 float 陣列，沒有資料或無法轉換時為 NaN
+    """
+    dates = list_dates(data_dir)
+    if end_date is not None:
+        dates = dates[:dates.index(end_date) + 1]
+    if last_n is not None:
+        dates = dates[-last_n:]
+
+    daily = []
+    for date in dates:
+        with open(os.path.join(data_dir, f"{date}.json"), 'r', encoding='utf-8') as f:
+            daily.append(json.load(f))
+
+    codes = list(dict.fromkeys(code for data in daily for code in data.get('data', {})))
+    code_pos = {code: i for i, code in enumerate(codes)}
+    panel = {name: np.full((len(dates), len(codes)), np.nan) for name in fields}
+    names = {}
+
+    for row_idx, data in enumerate(daily):
+        rows = data.get('data', {})
+        if not rows:
+            continue
+        col = [data['fields'].index(name) for name in fields]
+        positions = np.fromiter((code_pos[code] for code in rows), dtype=np.intp, count=len(rows))
+        values = np.array([[row[c] for c in col] for row in rows.values()], dtype=object)
+        for j, name in enumerate(fields):
+            panel[name][row_idx, positions] = _to_float(values[:, j])
+        name_col = data['fields'].index('Name')
+        names.update((code, row[name_col]) for code, row in rows.items())
+
+    last_rows = {}
+    if daily and 'data' in daily[-1]:
+        last_fields = daily[-1]['fields']
+        last_rows = {code: dict(zip(last_fields, row)) for code, row in daily[-1]['data'].items()}
+
+    return {'dates': dates, 'codes': codes, 'names': names, 'rows': last_rows, **panel}
+
+
+def _to_float(values):
+    """字串陣列轉 float，'--' 等無法轉換的值為 NaN"""
+    result = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        try:
+            result[i] = float(str(value).replace(',', ''))
+        except ValueError:
+            pass
+    return result
+
+
+def rolling_volume_stats(volume, window=5, min_periods=2):
+    """
+    每天、每檔股票往前 window 天 (含當天) 的成交量平均、樣本標準差與變異係數
+
+    缺少資料的日期 (NaN) 不計入，與 groupby('Code') 只統計有資料的天數相同
+
+    Args:
+        volume (np.ndarray): (日期, 股票) 成交量
+        window (int): 天數
+        min_periods (int): 至少需要幾天有資料，不足時結果為 NaN (標準差至少需要 2 天)
+
+    Returns:
+        tuple: (mean, std, cv)，皆為與 volume 相同形狀的陣列，前 window-1 天只以現有天數計算
+    """
+    n_dates, n_stocks = volume.shape
+    padded = np.vstack([np.full((window - 1, n_stocks), np.nan), volume])
+    windows = sliding_window_view(padded, window, axis=0)  # (日期, 股票, window)，不複製資料
+
+    count = np.sum(np.isfinite(windows), axis=2)
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(windows, axis=2)
+        std = np.nanstd(windows, axis=2, ddof=1)
+        cv = std / mean
+
+    insufficient = count < max(min_periods, 2)
+    std[insufficient] = np.nan
+    cv[insufficient] = np.nan
+    mean[count < min_periods] = np.nan
+    return mean, std, cv
+
+
+def screen_stable_volume(panel, window=5, cv_threshold=0.5):
+    """
+    所有日期的盤前篩選: 成交量變異係數小於 cv_threshold (且當天有成交量) 的股票
+
+    Args:
+        panel (dict): load_panel 的輸出
+        window (int): 計算成交量穩定度的天數
+        cv_threshold (float): 變異係數上限
+
+    Returns:
+        tuple: (selected, mean, std, cv)，selected 為 (日期, 股票) 的 bool 陣列
+    """
+    volume = panel['TradeVolume']
+    mean, std, cv = rolling_volume_stats(volume, window)
+    with np.errstate(invalid='ignore'):
+        selected = np.isfinite(volume) & (cv < cv_threshold)
+    return selected, mean, std, cv
+
+
+def screen_date(date, window=5, cv_threshold=0.5, data_dir=data_dir):
+    """
+    單日盤前篩選，只讀取需要的 window 天資料
+
+    Args:
+        date (str): 篩選使用的最後一天 (民國日期)
+        window (int): 計算成交量穩定度的天數
+        cv_threshold (float): 變異係數上限
+
+    Returns:
+        dict: 股票代號 -> 當天原始資料 + 平均成交量、標準差、變異係數 (與 find_Target 輸出的 test.json 相同格式)
+    """
+    panel = load_panel(data_dir, end_date=date, last_n=window)
+    selected, mean, std, cv = screen_stable_volume(panel, window, cv_threshold)
+
+    result = {}
+    for pos in np.flatnonzero(selected[-1]):
+        code = panel['codes'][pos]
+        row = panel['rows'][code]
+        result[code] = {
+            'Name': row['Name'],
+            'ClosingPrice': row['ClosingPrice'],
+            'Change': row['Change'],
+            'TradeVolume': float(panel['TradeVolume'][-1, pos]),
+            'Range': row['Range'],
+            'Date': date,
+            '5ma_TradeVolume': float(mean[-1, pos]),
+            'FiveDaySampleStdDev': float(std[-1, pos]),
+            'cv': float(cv[-1, pos])
+        }
+    return result
@@ -0,0 +1,196 @@
+import datetime
+import json
+import os
+import sys
+import threading
+
+# Discord webhook 的發送核心與熱力圖共用
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'stock_realtime_heatmap')))
+from notification_dispatcher import DiscordWebhookDispatcher
+
+
+class SignalJournal:
+    """
+    盤中訊號的 append-only 記錄 (每天一個 JSONL 檔)
+
+    每行一筆事件:
+        {"event": "signal", "time": ..., "code": ..., "metrics": {...}}  觸發訊號
+        {"event": "alerted", "time": ..., "codes": [...]}               已送出通知
+
+    重新啟動時讀回當天的記錄: 已觸發的股票不再重複觸發，已觸發但尚未通知的股票可重新送出
+    """
+
+    def __init__(self, date=None, log_dir='./Strategy1/signal_log'):
+        """
+        Args:
+            date (str): 交易日 'YYYYMMDD'，None 表示今天
+            log_dir (str): 記錄檔資料夾
+        """
+        self.date = date or datetime.datetime.now().strftime('%Y%m%d')
+        self.path = os.path.join(log_dir, f"signals_{self.date}.jsonl")
+        self.signals = {}    # 股票代號 -> 觸發資料 (當天第一次觸發)
+        self.alerted = set() # 已送出通知的股票代號
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+        # 寫到一半中斷的最後一行截掉，以免下一筆接在後面
+        complete = raw.rfind(b'\n') + 1
+        if complete != len(raw):
+            os.truncate(self.path, complete)
+
+        n_events = 0
+        for line in raw[:complete].decode('utf-8').splitlines():
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            n_events += 1
+            if event.get('event') == 'signal':
+                self.signals.setdefault(event['code'], event['metrics'])
+            elif event.get('event') == 'alerted':
+                self.alerted.update(event['codes'])
+        print(f"從 {self.path} 載入 {n_events} 筆訊號記錄 ({len(self.signals)} 檔已觸發，{len(self.alerted)} 檔已通知)")
+
+    def _append(self, event):
+        event = {'time': datetime.datetime.now().isoformat(timespec='seconds'), **event}
+        line = json.dumps(event, ensure_ascii=False) + '\n'
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError as e:
+            print(f"寫入訊號記錄 {self.path} 失敗：{e}")
+
+    def record_signal(self, code, metrics):
+        """
+        記錄一筆觸發訊號
+
+        Returns:
+            bool: 是否為當天第一次觸發 (已記錄過的股票不會重複寫入)
+        """
+        with self._lock:
+            if code in self.signals:
+                return False
+            self.signals[code] = metrics
+            self._append({'event': 'signal', 'code': code, 'metrics': metrics})
+            return True
+
+    def record_alerted(self, codes):
+        """記錄已送出通知的股票"""
+        with self._lock:
+            codes = [code for code in codes if code not in self.alerted]
+            if not codes:
+                return
+            self.alerted.update(codes)
+            self._append({'event': 'alerted', 'codes': codes})
+
+    def pending_alerts(self):
+        """
+        Returns:
+            dict: 已觸發但尚未送出通知的股票代號 -> 觸發資料
+        """
+        with self._lock:
+            return {code: metrics for code, metrics in self.signals.items() if code not in self.alerted}
+
+
+class SignalAlertDispatcher(DiscordWebhookDispatcher):
+    """
+    背景發送 Strategy1 訊號通知到 Discord (佇列、合併、切割與重試沿用熱力圖的 DiscordWebhookDispatcher)
+
+    - 收到第一筆訊號後等待 window_seconds，同一段時間內的訊號合併成一次通知
+      (開盤後短時間內大量股票觸發時不會每檔各送一則)
+    - 觸發檔數多時改用每檔一行的精簡格式，超過 Discord 上限時分成多則訊息依序送出
+    - 送出成功後呼叫 on_sent(codes) (例如 SignalJournal.record_alerted)，
+      停止時尚未送出的訊號留在 journal 中，下次啟動時再送
+    """
+
+    DETAILED_LIMIT = 20 # 超過此檔數改用精簡格式
+
+    thread_name = 'strategy1-alert'
+
+    def __init__(self, webhook_url, window_seconds=30.0, request_timeout=10, max_retries=5, on_sent=None):
+        """
+        Args:
+            webhook_url (str): Discord webhook URL
+            window_seconds (float): 合併通知的時間窗
+            request_timeout (float): 每個 HTTP 請求的 timeout 秒數
+            max_retries (int): 每個請求最多重試次數
+            on_sent (callable): on_sent(codes)，通知送出成功後呼叫
+        """
+        super().__init__(window_seconds, request_timeout, max_retries)
+        self.webhook_url = webhook_url
+        self.on_sent = on_sent
+
+    def enqueue(self, signals):
+        """
+        放入一批訊號 (不阻塞)
+
+        Args:
+            signals (dict): 股票代號 -> 觸發資料 (yesvol, nowvol, 5maprice, nowprice)
+        """
+        if not signals:
+            return
+        self._put(dict(signals))
+
+    def _send_batch(self, batch):
+        signals = {}
+        for item in batch:
+            signals.update(item)
+        self._send(signals)
+
+    def _field(self, code, data):
+        return {
+            "name": f"Stock Code: {code}",
+            "value": (
+                f"Yesterday Volume: {data['yesvol']}K\n"
+                f"Today Volume: {data['nowvol']}K\n"
+                f"5MA Volume: {data['5maprice']}K\n"
+                f"Current Price: {data['nowprice']}\n"
+                f"Link: [View on Yahoo Finance](https://tw.stock.yahoo.com/quote/{code}/technical-analysis)"
+            ),
+            "inline": False,
+        }
+
+    def _line(self, code, data):
+        return (f"[{code}](https://tw.stock.yahoo.com/quote/{code}/technical-analysis) "
+                f"{data['nowprice']} | {data['nowvol']}K / 5MA {data['5maprice']}K\n")
+
+    def _embeds(self, signals, title):
+        """
+        把訊號轉成 embed
+
+        訊號不多時每檔一個 field (詳細)，一次觸發很多檔時改成每檔一行 (精簡)，依 description 上限分成多個 embed
+
+        Returns:
+            list: [(codes, embed), ...]
+        """
+        if len(signals) <= self.DETAILED_LIMIT:
+            embed = {"title": title, "fields": [self._field(code, data) for code, data in signals.items()]}
+            return [(list(signals), embed)]
+
+        codes = list(signals)
+        embeds = []
+        start = 0
+        for chunk in self._split_lines([self._line(code, signals[code]) for code in codes]):
+            embeds.append((codes[start:start + len(chunk)], {"title": title, "description": "".join(chunk)}))
+            start += len(chunk)
+        return embeds
+
+    def _send(self, signals):
+        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        title = f"Stock Alert Notification - {current_time} ({len(signals)} 檔)"
+
+        embeds = self._embeds(signals, title)
+        sent = self._post_embeds(self.webhook_url, [embed for _, embed in embeds])
+        sent_codes = [code for codes, _ in embeds[:sent] for code in codes]
+        if not sent_codes:
+            return
+        print(f"✅ Notification sent successfully. ({len(sent_codes)} 檔)")
+        if self.on_sent is not None:
+            self.on_sent(sent_codes)
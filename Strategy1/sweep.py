@@ -0,0 +1,137 @@
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import backtest
+import screener
+
+# 預設掃描的參數 (5 × 5 × 5 × 3 組)
+DEFAULT_GRID = {
+    'window': [3, 5, 10, 15, 20],
+    'cv_threshold': [0.3, 0.4, 0.5, 0.6, 0.8],
+    'volume_multiplier': [1.5, 2.0, 2.5, 3.0, 4.0],
+    'min_change': [0.0, 0.01, 0.03],
+}
+
+SHARED_FIELDS = ('TradeVolume', 'ClosingPrice')
+
+# worker 程序內的共享陣列 (initializer 設定)
+g_worker_arrays = {}
+g_worker_forward = {}
+g_worker_shm = []
+
+
+def _share_arrays(panel):
+    """
+    把回測需要的陣列放進共享記憶體
+
+    Returns:
+        tuple: (shared memory 物件 list, 給 worker 的描述 {欄位: (名稱, shape)})
+    """
+    shms, specs = [], {}
+    for field in SHARED_FIELDS:
+        array = np.ascontiguousarray(panel[field], dtype=np.float64)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=np.float64, buffer=shm.buf)[:] = array
+        shms.append(shm)
+        specs[field] = (shm.name, array.shape)
+    return shms, specs
+
+
+def _init_worker(specs, horizons):
+    """
+    worker 連接共享記憶體 (不複製資料)，並預先計算各持有天數的往後報酬
+
+    worker 與主程序共用同一個 resource_tracker，共享記憶體由主程序在掃描結束後刪除
+    """
+    for field, (name, shape) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        g_worker_shm.append(shm)
+        g_worker_arrays[field] = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+    for horizon in horizons:
+        g_worker_forward[horizon] = backtest.forward_returns(g_worker_arrays['ClosingPrice'], horizon)
+
+
+def _evaluate_window(window, combos, horizons):
+    """
+    同一個 window 的所有參數組合 (成交量統計只計算一次)
+
+    Returns:
+        list: 每組參數一筆結果 dict
+    """
+    panel = g_worker_arrays
+    stats = screener.rolling_volume_stats(panel['TradeVolume'], window)
+
+    rows = []
+    for cv_threshold, volume_multiplier, min_change in combos:
+        params = {'window': window, 'cv_threshold': cv_threshold,
+                  'volume_multiplier': volume_multiplier, 'min_change': min_change}
+        signals = backtest.volume_spike_signals(panel, stats=stats, **params)
+        summary = backtest.evaluate_signals(signals, panel['ClosingPrice'], horizons, forward=g_worker_forward)
+
+        row = {**params, 'signals': int(signals.sum())}
+        for horizon, result in summary.items():
+            for key, value in result.items():
+                row[f"{key}_{horizon}d"] = value
+        rows.append(row)
+    return rows
+
+
+def run_sweep(panel, grid=DEFAULT_GRID, horizons=(1, 3, 5), rank_horizon=5, min_trades=30, max_workers=None):
+    """
+    以 process pool 平行掃描參數，所有 worker 共用同一份共享記憶體中的市場資料
+
+    Args:
+        panel (dict): backtest.load_market_panel 的輸出
+        grid (dict): 參數 -> 候選值 list (window, cv_threshold, volume_multiplier, min_change)
+        horizons (tuple): 持有天數
+        rank_horizon (int): 依此持有天數的平均報酬排序
+        min_trades (int): 交易筆數少於此數的參數組排在最後 (樣本太少)
+        max_workers (int): worker 數，None 表示 CPU 數
+
+    Returns:
+        pd.DataFrame: 依排名排序的結果 (rank 欄位從 1 開始)
+    """
+    combos = list(itertools.product(grid['cv_threshold'], grid['volume_multiplier'], grid['min_change']))
+    shms, specs = _share_arrays(panel)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(specs, horizons)) as executor:
+            futures = [executor.submit(_evaluate_window, window, combos, horizons) for window in grid['window']]
+            rows = [row for future in futures for row in future.result()]
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame(rows)
+    results['enough_trades'] = results[f"trades_{rank_horizon}d"] >= min_trades
+    results = results.sort_values(['enough_trades', f"mean_return_{rank_horizon}d", f"hit_rate_{rank_horizon}d"],
+                                  ascending=False, na_position='last').reset_index(drop=True)
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    return results
+
+
+if __name__ == "__main__":
+    start = time.time()
+    panel = backtest.load_market_panel()
+    print(f"載入 {len(panel['dates'])} 天 × {len(panel['codes'])} 檔，耗時 {time.time() - start:.2f} 秒")
+
+    start = time.time()
+    results = run_sweep(panel)
+    print(f"掃描 {len(results)} 組參數，耗時 {time.time() - start:.2f} 秒")
+
+    # 輸出放在不進版控的 ./cache/
+    output_path = './cache/sweep_results.csv'
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    results.to_csv(output_path, index=False, encoding='utf-8-sig')
+    print(f"結果已寫入 {output_path}")
+    print(results.head(10).to_string(index=False))
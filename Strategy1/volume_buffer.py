@@ -0,0 +1,207 @@
+import datetime
+import hashlib
+import json
+import os
+
+import numpy as np
+
+SESSION_START = datetime.time(9, 0, 0)
+SESSION_END = datetime.time(13, 30, 0)
+BUCKET_SECONDS = 180 # 每 3 分鐘一格
+
+LOG_RECORD_DTYPE = np.dtype([('slot', np.int32), ('stock', np.int32), ('acc_volume', np.float64)])
+
+
+def session_fraction(now):
+    """
+    盤中經過的比例 (09:00 為 0，13:30 為 1)
+
+    Args:
+        now (datetime.datetime): 時間
+
+    Returns:
+        float: 經過比例，盤前為 0、收盤後為 1
+    """
+    start = datetime.datetime.combine(now.date(), SESSION_START)
+    end = datetime.datetime.combine(now.date(), SESSION_END)
+    return min(max((now - start) / (end - start), 0.0), 1.0)
+
+
+class VolumeBucketBuffer:
+    """
+    盤中每 3 分鐘的累積成交量 (時間格 × 股票)
+
+    - 09:00 ~ 13:30 每 3 分鐘一格 (最後一格為 13:30 收盤)，每檔股票在每一格只記錄第一筆觀察到的累積量，
+      收盤格則保留最大的累積量 (13:30 剛過時收盤集合競價可能還沒揭示)
+    - 記憶體固定，不隨時間增加；每格成交量由相鄰兩格的累積量相減
+    - 新記錄的格子以 append-only 方式寫入當天的 binary log，重新啟動時讀回
+
+    log 檔格式: 第一行為 JSON header (日期、股票清單)，之後每筆為 (slot int32, stock int32, acc_volume float64)
+    """
+
+    def __init__(self, codes, date=None, log_dir='./Strategy1/volume_log', bucket_seconds=BUCKET_SECONDS):
+        """
+        Args:
+            codes (list): 股票代號 (欄位順序)
+            date (str): 交易日 'YYYYMMDD'，None 表示今天
+            log_dir (str): log 檔資料夾，None 表示不寫入磁碟
+            bucket_seconds (int): 每格秒數
+        """
+        self.codes = list(codes)
+        self.code_pos = {code: i for i, code in enumerate(self.codes)}
+        self.date = date or datetime.datetime.now().strftime('%Y%m%d')
+        self.bucket_seconds = bucket_seconds
+
+        session_seconds = (datetime.datetime.combine(datetime.date.min, SESSION_END) -
+                           datetime.datetime.combine(datetime.date.min, SESSION_START)).total_seconds()
+        self.n_buckets = int(session_seconds // bucket_seconds) + 1
+
+        n_stocks = len(self.codes)
+        self.acc_volume = np.full((self.n_buckets, n_stocks), np.nan)
+        self.latest_acc_volume = np.full(n_stocks, np.nan)
+        self.last_record_time = np.full(n_stocks, np.nan) # time.time()
+        self.normalized_volume = np.full(n_stocks, np.nan)
+        self._pending = []
+
+        self.log_path = None
+        if log_dir is not None:
+            # 股票清單改變時使用不同的 log 檔，避免欄位錯位
+            universe_hash = hashlib.md5(','.join(self.codes).encode('utf-8')).hexdigest()[:8]
+            self.log_path = os.path.join(log_dir, f"volume_{self.date}_{universe_hash}.bin")
+            self._load_log()
+
+    def slot_of(self, now):
+        """
+        Returns:
+            int: 時間所在的格子，盤前或收盤後回傳 None
+        """
+        start = datetime.datetime.combine(now.date(), SESSION_START)
+        slot = int((now - start).total_seconds() // self.bucket_seconds)
+        if slot < 0 or slot >= self.n_buckets:
+            return None
+        return slot
+
+    def record(self, positions, acc_volume, now):
+        """
+        記錄一批股票的累積成交量
+
+        Args:
+            positions (np.ndarray): 股票在 codes 中的位置
+            acc_volume (np.ndarray): 累積成交量 (張)，NaN 表示沒有資料
+            now (datetime.datetime): 觀察時間
+
+        Returns:
+            int: 這次新填入 (或更新收盤格) 的股票數
+        """
+        positions = np.asarray(positions, dtype=np.intp)
+        acc_volume = np.asarray(acc_volume, dtype=float)
+        valid = np.isfinite(acc_volume)
+        positions, acc_volume = positions[valid], acc_volume[valid]
+
+        self.latest_acc_volume[positions] = acc_volume
+        self.last_record_time[positions] = now.timestamp()
+
+        slot = self.slot_of(now)
+        if slot is None:
+            return 0
+        if slot == self.n_buckets - 1:
+            # 收盤格: 累積量增加時更新
+            current = self.acc_volume[slot, positions]
+            new = np.isnan(current) | (acc_volume > current)
+        else:
+            new = np.isnan(self.acc_volume[slot, positions])
+        new_positions = positions[new]
+        self.acc_volume[slot, new_positions] = acc_volume[new]
+
+        if self.log_path is not None and new_positions.size:
+            records = np.empty(new_positions.size, dtype=LOG_RECORD_DTYPE)
+            records['slot'] = slot
+            records['stock'] = new_positions
+            records['acc_volume'] = acc_volume[new]
+            self._pending.append(records)
+        return int(new_positions.size)
+
+    def bucket_volume(self):
+        """
+        每格的成交量 (與前一格累積量的差)
+
+        Returns:
+            np.ndarray: (格子, 股票)，第一格或前一格沒有資料時為 NaN
+        """
+        volume = np.full(self.acc_volume.shape, np.nan)
+        volume[1:] = self.acc_volume[1:] - self.acc_volume[:-1]
+        return volume
+
+    def bucket_times(self):
+        """每格的開始時間 ('HH:MM')"""
+        start = datetime.datetime.combine(datetime.date.min, SESSION_START)
+        return [(start + datetime.timedelta(seconds=slot * self.bucket_seconds)).strftime('%H:%M')
+                for slot in range(self.n_buckets)]
+
+    def flush(self):
+        """把新記錄的格子 append 到 log 檔 (只寫入增加的部分)"""
+        if self.log_path is None or not self._pending:
+            return
+
+        records = np.concatenate(self._pending)
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+            is_new = not os.path.exists(self.log_path)
+            with open(self.log_path, 'ab') as f:
+                if is_new:
+                    f.write(self._header_bytes())
+                f.write(records.tobytes())
+            self._pending = []
+        except OSError as e:
+            print(f"寫入成交量 log {self.log_path} 失敗：{e}")
+
+    def _header_bytes(self):
+        header = {'date': self.date, 'codes': self.codes, 'bucket_seconds': self.bucket_seconds}
+        return (json.dumps(header, ensure_ascii=False) + '\n').encode('utf-8')
+
+    def _load_log(self):
+        """從當天 log 檔讀回已記錄的格子"""
+        if not os.path.exists(self.log_path):
+            return
+
+        try:
+            header, records = read_volume_log(self.log_path, truncate_partial=True)
+        except (OSError, ValueError) as e:
+            print(f"讀取成交量 log {self.log_path} 失敗：{e}")
+            return
+        if header.get('codes') != self.codes or header.get('bucket_seconds') != self.bucket_seconds:
+            print(f"成交量 log {self.log_path} 股票清單不符，略過")
+            return
+
+        # 收盤格可能有多筆記錄，取最大值
+        np.fmax.at(self.acc_volume, (records['slot'], records['stock']), records['acc_volume'])
+
+        # 最新累積量 = 每檔股票最後一個有資料的格子
+        filled = np.isfinite(self.acc_volume)
+        last_slot = np.where(filled.any(axis=0), self.n_buckets - 1 - np.argmax(filled[::-1], axis=0), -1)
+        has_data = last_slot >= 0
+        self.latest_acc_volume[has_data] = self.acc_volume[last_slot[has_data], np.flatnonzero(has_data)]
+        print(f"從 {self.log_path} 載入 {len(records)} 筆成交量記錄")
+
+
+def read_volume_log(path, truncate_partial=False):
+    """
+    讀取成交量 log 檔
+
+    Args:
+        path (str): log 檔路徑
+        truncate_partial (bool): 最後一筆不完整時截掉 (繼續 append 前必須截掉，以免資料錯位)
+
+    Returns:
+        tuple: (header, records)，records 為 LOG_RECORD_DTYPE 陣列
+    """
+    with open(path, 'rb') as f:
+        header_line = f.readline()
+        header = json.loads(header_line.decode('utf-8'))
+        raw = f.read()
+
+    n_records = len(raw) // LOG_RECORD_DTYPE.itemsize
+    valid_size = len(header_line) + n_records * LOG_RECORD_DTYPE.itemsize
+    if truncate_partial and valid_size != len(header_line) + len(raw):
+        os.truncate(path, valid_size)
+    return header, np.frombuffer(raw, dtype=LOG_RECORD_DTYPE, count=n_records)
@@ -0,0 +1,178 @@
+import datetime
+import glob
+import os
+import warnings
+
+import numpy as np
+
+from volume_buffer import BUCKET_SECONDS, SESSION_START, read_volume_log
+
+
+def default_curve(n_buckets, open_share=0.05):
+    """
+    沒有歷史資料時使用的累積成交量曲線 (開盤集合競價 + 早盤、尾盤成交量較多)
+
+    09:00 開盤集合競價約佔全天量 open_share，其餘每格成交量權重為 1 + 3(2f-1)^2，
+    累積比例 = open_share + (1 - open_share) × (f + ((2f-1)^3 + 1) / 2) / 2
+
+    Args:
+        n_buckets (int): 格子數
+        open_share (float): 開盤集合競價佔全天量的比例
+    """
+    f = np.linspace(0.0, 1.0, n_buckets)
+    return open_share + (1 - open_share) * (f + ((2 * f - 1) ** 3 + 1) / 2) / 2
+
+
+class VolumeProfile:
+    """
+    盤中累積成交量曲線: 某個時間點通常已完成全天成交量的多少比例
+
+    - 以過去幾天的每 3 分鐘累積量 (VolumeBucketBuffer 的 log) 學習，每格取各天比例的中位數
+    - 歷史天數不足的股票使用所有股票的整體曲線，完全沒有歷史資料時使用 default_curve
+    - 曲線預先算成 (格子, 股票) 的表格，查詢某時間的預期比例只需查表與格內線性內插 (O(1))
+    - 第一格 (09:00 ~ 09:03) 結束前只有開盤集合競價的量，比例誤差太大，不做正規化 (回傳 NaN)
+    """
+
+    def __init__(self, codes, bucket_seconds=BUCKET_SECONDS, n_buckets=91, min_days=3, min_fraction=0.02):
+        """
+        Args:
+            codes (list): 股票代號 (欄位順序)
+            bucket_seconds (int): 每格秒數
+            n_buckets (int): 格子數 (09:00 ~ 13:30)
+            min_days (int): 個股至少需要幾天歷史資料才使用自己的曲線
+            min_fraction (float): 預期比例下限，避免開盤瞬間比例接近 0 造成正規化量爆增
+        """
+        self.codes = list(codes)
+        self.code_pos = {code: i for i, code in enumerate(self.codes)}
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = n_buckets
+        self.min_days = min_days
+        self.min_fraction = min_fraction
+
+        self.market_curve = default_curve(n_buckets)
+        self.curve = np.repeat(self.market_curve[:, None], len(self.codes), axis=1)
+        self.history_days = np.zeros(len(self.codes), dtype=int)
+
+    def fit(self, days):
+        """
+        以歷史資料學習曲線
+
+        Args:
+            days (list): 每天一筆 (codes, acc_volume)，acc_volume 為 (格子, 股票) 累積量 (NaN 表示沒有資料)
+        """
+        n_stocks = len(self.codes)
+        fractions = []
+        for day_codes, acc_volume in days:
+            # 對齊到 self.codes
+            aligned = np.full((self.n_buckets, n_stocks), np.nan)
+            src = [i for i, code in enumerate(day_codes) if code in self.code_pos]
+            dst = [self.code_pos[day_codes[i]] for i in src]
+            aligned[:, dst] = acc_volume[:self.n_buckets, src]
+
+            # 全天量 = 13:30 收盤格的累積量，沒有記錄到收盤的股票無法得知全天量 (整欄為 NaN)
+            final = aligned[-1]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                fraction = np.where(final > 0, aligned / final, np.nan)
+            fractions.append(np.clip(fraction, 0.0, 1.0))
+
+        if not fractions:
+            return
+
+        stacked = np.stack(fractions)  # (天, 格子, 股票)
+        self.history_days = np.isfinite(stacked[:, -1, :]).sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            stock_curve = np.nanmedian(stacked, axis=0)
+            market_curve = np.nanmedian(stacked.transpose(1, 0, 2).reshape(self.n_buckets, -1), axis=1)
+
+        # 整體曲線缺少的格子以預設曲線補上
+        market_curve = np.where(np.isfinite(market_curve), market_curve, default_curve(self.n_buckets))
+        self.market_curve = np.maximum.accumulate(market_curve)
+
+        curve = np.where(np.isfinite(stock_curve), stock_curve, self.market_curve[:, None])
+        curve[:, self.history_days < self.min_days] = self.market_curve[:, None]
+        curve = np.maximum.accumulate(curve, axis=0)
+        curve[-1] = 1.0
+        self.curve = curve
+
+    @classmethod
+    def from_logs(cls, codes, log_dir, before_date=None, max_days=20, **kwargs):
+        """
+        從 VolumeBucketBuffer 的 log 檔學習曲線
+
+        Args:
+            codes (list): 股票代號
+            log_dir (str): log 檔資料夾
+            before_date (str): 只使用這一天 ('YYYYMMDD') 以前的 log，None 表示全部
+            max_days (int): 最多使用最近幾天
+
+        Returns:
+            VolumeProfile
+        """
+        profile = cls(codes, **kwargs)
+
+        # 同一天可能因股票清單不同有多個 log 檔，全部使用
+        paths = sorted(glob.glob(os.path.join(log_dir, 'volume_*.bin')))
+        by_date = {}
+        for path in paths:
+            date = os.path.basename(path).split('_')[1]
+            if before_date is None or date < before_date:
+                by_date.setdefault(date, []).append(path)
+
+        dates = sorted(by_date)[-max_days:]
+        days = []
+        for date in dates:
+            for path in by_date[date]:
+                try:
+                    header, records = read_volume_log(path)
+                except (OSError, ValueError) as e:
+                    print(f"讀取成交量 log {path} 失敗：{e}")
+                    continue
+                if header.get('bucket_seconds') != profile.bucket_seconds:
+                    continue
+                acc_volume = np.full((profile.n_buckets, len(header['codes'])), np.nan)
+                valid = records['slot'] < profile.n_buckets
+                np.fmax.at(acc_volume, (records['slot'][valid], records['stock'][valid]), records['acc_volume'][valid])
+                days.append((header['codes'], acc_volume))
+
+        profile.fit(days)
+        print(f"成交量曲線: 使用 {len(dates)} 天歷史資料，"
+              f"{int((profile.history_days >= profile.min_days).sum())}/{len(profile.codes)} 檔使用個股曲線")
+        return profile
+
+    def expected_fraction(self, positions, now):
+        """
+        某時間點預期已完成的全天成交量比例
+
+        Args:
+            positions (np.ndarray): 股票在 codes 中的位置
+            now (datetime.datetime): 時間
+
+        Returns:
+            np.ndarray: 預期比例 (min_fraction ~ 1)，第一格結束前為 NaN
+        """
+        start = datetime.datetime.combine(now.date(), SESSION_START)
+        elapsed = (now - start).total_seconds() / self.bucket_seconds
+        elapsed = min(max(elapsed, 0.0), self.n_buckets - 1)
+        slot = min(int(elapsed), self.n_buckets - 2)
+        weight = elapsed - slot
+
+        if elapsed < 1:
+            # 第一格還沒結束
+            return np.full(len(positions), np.nan)
+
+        fraction = self.curve[slot, positions] * (1 - weight) + self.curve[slot + 1, positions] * weight
+        return np.maximum(fraction, self.min_fraction)
+
+    def expected_volume(self, positions, daily_volume, now):
+        """
+        某時間點預期的累積成交量
+
+        Args:
+            daily_volume (np.ndarray): 基準全天成交量 (例如 5 日均量)
+        """
+        return daily_volume * self.expected_fraction(positions, now)
+
+    def normalize(self, positions, acc_volume, now):
+        """把目前累積量換算成預估全天量 (第一格結束前為 NaN，不會觸發爆量條件)"""
+        return acc_volume / self.expected_fraction(positions, now)
@@ -56,7 +56,9 @@ def get_event(date: str):
     except requests.RequestException as e:
         print(f"❌ Failed to fetch event data for {date}: {e}")
         return
+    # query_date: 查詢日期，sdate 為當天的暫停交易事件，edate (下一個交易日) 只有除權息事件
     out = {
+        "query_date": sdate,
         sdate:{},
         edate:{}
         
@@ -0,0 +1,523 @@
+"""
+即時報價來源
+
+統一以 twstock.realtime.get 的格式回傳報價:
+    {
+        '2330': {
+            'success': True,
+            'timestamp': 1752800000.0,
+            'info': {'code': '2330', 'name': '台積電', 'time': '2025-07-18 10:00:00'},
+            'realtime': {
+                'latest_trade_price': '1100.0000', 'trade_volume': '3', 'accumulate_trade_volume': '12345',
+                'best_bid_price': ['1095.0000', ...], 'best_bid_volume': [...],
+                'best_ask_price': ['1100.0000', ...], 'best_ask_volume': [...],
+                'open': '1090.0000', 'high': '1105.0000', 'low': '1085.0000'
+            }
+        },
+        ...,
+        'success': True
+    }
+
+- TwstockQuoteSource: twstock (證交所基本市況報導)
+- EsunQuoteSource: 玉山證券行情 API (market_sdk.rest_client.stock)
+- SimulatedQuoteSource: 離線模擬，重播每日收盤資料或產生隨機漫步，可調整速度與股票數量
+
+create_quote_source() 依環境變數 QUOTE_SOURCE 選擇來源 ('twstock' / 'esun' / 'sim')
+"""
+import datetime
+import glob
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SESSION_START = datetime.time(9, 0, 0)
+SESSION_END = datetime.time(13, 30, 0)
+SESSION_SECONDS = 4.5 * 60 * 60
+
+DEFAULT_ARCHIVE_DIRS = (
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_stock_data', 'daily', 'twse'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'raw_stock_data', 'daily', 'tpex'),
+)
+
+
+def _format_price(price):
+    return f"{price:.4f}"
+
+
+def tick_sizes(prices, is_etf):
+    """
+    台股升降單位 (向量化)
+
+    股票: <10 0.01、<50 0.05、<100 0.1、<500 0.5、<1000 1、其餘 5
+    ETF: <50 0.01、其餘 0.05
+
+    Args:
+        prices (np.ndarray): 價格
+        is_etf (np.ndarray): 是否為 ETF
+
+    Returns:
+        np.ndarray: 升降單位
+    """
+    prices = np.asarray(prices, dtype=float)
+    stock_ticks = np.select(
+        [prices < 10, prices < 50, prices < 100, prices < 500, prices < 1000],
+        [0.01, 0.05, 0.1, 0.5, 1.0],
+        default=5.0
+    )
+    return np.where(is_etf, np.where(prices < 50, 0.01, 0.05), stock_ticks)
+
+
+def _round_to_tick(prices, is_etf):
+    ticks = tick_sizes(prices, is_etf)
+    return np.round(np.round(prices / ticks) * ticks, 2)
+
+
+class QuoteSource(ABC):
+    """報價來源介面"""
+
+    name = 'base'
+    min_request_interval = 0.0 # 來源端限流要求的請求間隔秒數 (0 表示沒有限制)
+
+    @abstractmethod
+    def get(self, codes):
+        """
+        取得多檔股票的即時報價
+
+        Args:
+            codes (list): 股票代號
+
+        Returns:
+            dict: twstock.realtime.get 格式的報價 (取不到的股票不會出現在結果中)
+        """
+
+
+class TwstockQuoteSource(QuoteSource):
+    """
+    twstock 即時報價 (證交所 mis 基本市況報導，一次查詢的股票數有上限，分批查詢)
+
+    - twstock.realtime.get 的 HTTP 請求沒有 timeout (伺服器不回應時會一直卡住)，
+      這裡沿用 twstock 的網址與格式轉換，自己送出有 timeout 的請求
+    - mis 端點限制約每 5 秒 3 次請求，超過會被暫時封鎖；同一個 process 內所有實例共用
+      同一個節流器，每次請求至少間隔 min_request_interval 秒 (並行查詢時多出的請求會排隊等待)
+    """
+
+    name = 'twstock'
+
+    REQUESTS_PER_WINDOW = 3 # 證交所 mis 限制: 每 WINDOW_SECONDS 秒最多幾次請求
+    WINDOW_SECONDS = 5.0
+    min_request_interval = WINDOW_SECONDS / REQUESTS_PER_WINDOW
+
+    _throttle_lock = threading.Lock()
+    _next_request_at = 0.0 # time.monotonic()，下一次請求最早可送出的時間
+
+    def __init__(self, chunk_size=100, request_timeout=5.0):
+        """
+        Args:
+            chunk_size (int): 每次查詢的股票數
+            request_timeout (float): 每個 HTTP 請求的 timeout 秒數
+        """
+        self.chunk_size = chunk_size
+        self.request_timeout = request_timeout
+        self._local = threading.local()
+
+    @classmethod
+    def _throttle(cls):
+        """等到可以送出下一次請求 (所有 thread 共用)"""
+        with cls._throttle_lock:
+            now = time.monotonic()
+            send_at = max(now, cls._next_request_at)
+            cls._next_request_at = send_at + cls.min_request_interval
+        time.sleep(send_at - now)
+
+    def _session(self):
+        """每個 thread 一個 session，建立時先取得 mis 的 session cookie (只需要一次)"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            from twstock.proxy import get_proxies, get_session
+            from twstock.realtime import SESSION_URL
+
+            session = get_session()
+            self._throttle()
+            session.get(SESSION_URL, proxies=get_proxies(), timeout=self.request_timeout)
+            self._local.session = session
+        return session
+
+    def _get_chunk(self, codes):
+        from twstock.realtime import STOCKINFO_URL, _format_stock_info, _join_stock_id
+
+        session = self._session()
+        self._throttle()
+        try:
+            resp = session.get(
+                STOCKINFO_URL.format(stock_id=_join_stock_id(codes), time=int(time.time()) * 1000),
+                timeout=self.request_timeout
+            )
+        except Exception:
+            # 連線有問題時下次重新建立 session
+            self._local.session = None
+            raise
+        data = resp.json()
+
+        # 與 twstock.realtime.get 相同的檢查
+        if not data.get('msgArray'):
+            raise ValueError(data.get('rtmessage') or 'Empty Query.')
+        if 'tlong' not in data['msgArray'][0]:
+            raise ValueError('Invalid Stock ID.')
+        return {info['info']['code']: info for info in map(_format_stock_info, data['msgArray'])}
+
+    def get(self, codes):
+        result = {}
+        success = True
+        codes = list(codes)
+        for start in range(0, len(codes), self.chunk_size):
+            try:
+                result.update(self._get_chunk(codes[start:start + self.chunk_size]))
+            except Exception as e:
+                # 一批失敗 (逾時、被限流) 不影響其他批次的結果
+                print(f"取得即時資料失敗: {e}")
+                success = False
+        result['success'] = success
+        return result
+
+
+class EsunQuoteSource(QuoteSource):
+    """
+    玉山證券行情 API，轉換成 twstock 格式 (行情 API 一次查一檔，以 thread pool 並行查詢)
+    """
+
+    name = 'esun'
+
+    def __init__(self, rest_stock, max_workers=8):
+        """
+        Args:
+            rest_stock: 已登入的 market_sdk.rest_client.stock
+            max_workers (int): 同時查詢的數量
+        """
+        self.rest_stock = rest_stock
+        self.max_workers = max_workers
+
+    def _get_one(self, code):
+        try:
+            return code, self.rest_stock.intraday.quote(symbol=code)
+        except Exception as e:
+            print(f"Failed to get {code} price: {e}")
+            return code, None
+
+    @staticmethod
+    def _to_twstock_format(code, quote):
+        def price_list(levels):
+            return [_format_price(level['price']) for level in levels or []] or ['-']
+
+        def volume_list(levels):
+            return [str(level.get('size', 0)) for level in levels or []] or ['-']
+
+        last_price = quote.get('lastPrice') or quote.get('closePrice')
+        total = quote.get('total') or {}
+        last_updated = quote.get('lastUpdated')
+        timestamp = last_updated / 1e6 if last_updated else time.time()  # 行情 API 時間為微秒
+
+        return {
+            'success': True,
+            'timestamp': timestamp,
+            'info': {
+                'code': code,
+                'name': quote.get('name', ''),
+                'time': datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+            },
+            'realtime': {
+                'latest_trade_price': _format_price(last_price) if last_price else '-',
+                'trade_volume': str(quote.get('lastSize', '-')),
+                'accumulate_trade_volume': str(total.get('tradeVolume', 0)),
+                'best_bid_price': price_list(quote.get('bids')),
+                'best_bid_volume': volume_list(quote.get('bids')),
+                'best_ask_price': price_list(quote.get('asks')),
+                'best_ask_volume': volume_list(quote.get('asks')),
+                'open': _format_price(quote['openPrice']) if quote.get('openPrice') else '-',
+                'high': _format_price(quote['highPrice']) if quote.get('highPrice') else '-',
+                'low': _format_price(quote['lowPrice']) if quote.get('lowPrice') else '-'
+            }
+        }
+
+    def get(self, codes):
+        result = {'success': True}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for code, quote in executor.map(self._get_one, list(codes)):
+                if quote is None:
+                    result['success'] = False
+                    continue
+                result[code] = self._to_twstock_format(code, quote)
+        return result
+
+
+def load_archive_day(archive_dirs=DEFAULT_ARCHIVE_DIRS, date=None):
+    """
+    讀取每日收盤資料 (raw_stock_data/daily/*/民國日期.json)
+
+    Args:
+        archive_dirs (tuple): 資料夾 (依序讀取，相同代號以先讀到的為準)
+        date (str): 民國日期 '1140718'，None 表示各資料夾最新的一天
+
+    Returns:
+        dict: {代號: (名稱, 昨收, 開盤, 最高, 最低, 收盤, 成交股數)}
+    """
+    day = {}
+    for archive_dir in archive_dirs:
+        if date is None:
+            files = sorted(glob.glob(os.path.join(archive_dir, '[0-9]' * 7 + '.json')))
+            if not files:
+                continue
+            file_path = files[-1]
+        else:
+            file_path = os.path.join(archive_dir, f"{date}.json")
+            if not os.path.exists(file_path):
+                continue
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            archive = json.load(f)
+        fields = archive['fields']
+        col = {name: fields.index(name) for name in
+               ('Name', 'ClosingPrice', 'Change', 'OpeningPrice', 'HighestPrice', 'LowestPrice', 'TradeVolume')}
+
+        for code, row in archive['data'].items():
+            if code in day:
+                continue
+            try:
+                close = float(row[col['ClosingPrice']])
+                change = float(row[col['Change']])
+                open_price = float(row[col['OpeningPrice']])
+                high = float(row[col['HighestPrice']])
+                low = float(row[col['LowestPrice']])
+                volume = float(row[col['TradeVolume']])
+            except (ValueError, TypeError):
+                continue  # 當天無成交
+            if min(close, open_price, high, low) <= 0 or close - change <= 0:
+                continue
+            day[code] = (row[col['Name']], close - change, open_price, high, low, close, volume)
+    return day
+
+
+class SimulatedQuoteSource(QuoteSource):
+    """
+    離線模擬報價 (結果只由 seed 與模擬時間決定，可重現)
+
+    - mode='replay': 以每日收盤資料 (開/高/低/收/量) 產生盤中走勢，價格依序經過開盤 -> 高/低 -> 收盤，
+      成交量依早盤、尾盤較多的曲線累積
+    - mode='random': 以昨收為起點的隨機漫步 (沒有收盤資料時產生虛擬股票)
+
+    模擬時間 = 09:00 + 實際經過時間 × speed，也可以用 set_time() / advance() 手動控制
+    """
+
+    name = 'sim'
+
+    def __init__(self, mode='replay', date=None, speed=1.0, max_symbols=None, n_symbols=2000,
+                 tick_seconds=1.0, seed=0, archive_dirs=DEFAULT_ARCHIVE_DIRS, volatility=0.002):
+        """
+        Args:
+            mode (str): 'replay' 重播收盤資料 / 'random' 隨機漫步
+            date (str): 重播的民國日期，None 表示最新一天
+            speed (float): 模擬時間相對實際時間的倍數
+            max_symbols (int): 最多模擬的股票數，None 表示全部
+            n_symbols (int): random 模式沒有收盤資料時產生的虛擬股票數
+            tick_seconds (float): 模擬報價的最小時間間隔 (模擬時間秒數)
+            seed (int): 亂數種子
+            archive_dirs (tuple): 收盤資料資料夾
+            volatility (float): 每個 tick 的價格波動 (比例)
+        """
+        self.mode = mode
+        self.speed = speed
+        self.tick_seconds = tick_seconds
+        self.seed = seed
+        self.volatility = volatility
+
+        day = load_archive_day(archive_dirs, date) if archive_dirs else {}
+        if not day and mode == 'replay':
+            raise ValueError("找不到可重播的每日收盤資料")
+        if not day:
+            rng = np.random.default_rng(seed)
+            base = np.round(rng.uniform(10, 500, n_symbols), 2)
+            day = {
+                f"S{i:04d}": (f"模擬{i:04d}", base[i], base[i], base[i], base[i], base[i], 1e6)
+                for i in range(n_symbols)
+            }
+
+        codes = list(day.keys())
+        if max_symbols is not None:
+            codes = codes[:max_symbols]
+        self.codes = codes
+        self.pos = {code: i for i, code in enumerate(codes)}
+        columns = np.array([day[code][1:] for code in codes], dtype=float).reshape(len(codes), 6)
+        self.names = [day[code][0] for code in codes]
+        self.is_etf = np.array([code.startswith('00') for code in codes], dtype=bool)
+        self.prev_close, self.open, self.high, self.low, self.close, self.volume = columns.T
+        self.volume = self.volume / 1000  # 股 -> 張 (與 twstock 相同單位)
+
+        self.trade_date = datetime.date.today()
+        self._wall_start = time.monotonic()
+        self._sim_offset = 0.0
+        self._manual_elapsed = None
+
+        # random 模式的狀態 (依 tick 順序產生，與查詢頻率無關)
+        self._walk_step = 0
+        self._walk_log_return = np.zeros(len(codes))
+        self._walk_high = self.prev_close.copy()
+        self._walk_low = self.prev_close.copy()
+
+    # ---- 模擬時間 ----
+    def set_time(self, hhmmss):
+        """把模擬時間設為指定時刻 ('HH:MM:SS')，之後以 advance() 前進"""
+        t = datetime.datetime.strptime(hhmmss, '%H:%M:%S')
+        self._manual_elapsed = (t.hour - 9) * 3600 + t.minute * 60 + t.second
+
+    def advance(self, seconds):
+        """手動前進模擬時間 (秒)"""
+        if self._manual_elapsed is None:
+            self._manual_elapsed = self._elapsed()
+        self._manual_elapsed += seconds
+
+    def _elapsed(self):
+        if self._manual_elapsed is not None:
+            elapsed = self._manual_elapsed
+        else:
+            elapsed = (time.monotonic() - self._wall_start) * self.speed
+        return min(max(elapsed, 0.0), SESSION_SECONDS)
+
+    def now(self):
+        """目前模擬時間"""
+        start = datetime.datetime.combine(self.trade_date, SESSION_START)
+        step = int(self._elapsed() // self.tick_seconds)
+        return start + datetime.timedelta(seconds=step * self.tick_seconds)
+
+    # ---- 價格路徑 ----
+    def _tick_noise(self, step):
+        """每個 tick 的雜訊 (以 tick 編號為 counter，任何查詢順序都得到相同結果)"""
+        return np.random.Generator(np.random.Philox(key=self.seed, counter=step)).standard_normal(len(self.codes))
+
+    def _replay_state(self, step):
+        fraction = min(step * self.tick_seconds / SESSION_SECONDS, 1.0)
+
+        # 收紅: 開 -> 低 -> 高 -> 收；收黑: 開 -> 高 -> 低 -> 收 (四段各佔 1/4, 1/4, 1/3, 其餘)
+        up = self.close >= self.open
+        first = np.where(up, self.low, self.high)
+        second = np.where(up, self.high, self.low)
+        knots_x = np.array([0.0, 0.25, 0.5, 0.83, 1.0])
+        knots_y = np.stack([self.open, first, (first + second) / 2, second, self.close])
+        segment = min(np.searchsorted(knots_x, fraction, side='right') - 1, len(knots_x) - 2)
+        weight = (fraction - knots_x[segment]) / (knots_x[segment + 1] - knots_x[segment])
+        path = knots_y[segment] + (knots_y[segment + 1] - knots_y[segment]) * weight
+
+        # 到目前為止的最高 / 最低 (只看已經過的轉折點)
+        reached = knots_y[:segment + 1]
+        running_high = np.maximum(reached.max(axis=0), path)
+        running_low = np.minimum(reached.min(axis=0), path)
+
+        noise = self._tick_noise(step) * self.volatility * path if fraction < 1.0 else 0.0
+        # 對齊升降單位後再限制在已出現的高低點內 (收盤資料本身不一定符合升降單位)
+        price = np.clip(_round_to_tick(np.clip(path + noise, running_low, running_high), self.is_etf),
+                        running_low, running_high)
+        if fraction >= 1.0:
+            price = self.close.copy()  # 收盤後與收盤資料完全相同
+
+        # 早盤、尾盤成交量較多: 權重 1 + 3(2f-1)^2 的累積比例
+        volume_fraction = (fraction + ((2 * fraction - 1) ** 3 + 1) / 2) / 2
+        acc_volume = np.floor(self.volume * volume_fraction)
+        return np.round(price, 2), np.round(running_high, 2), np.round(running_low, 2), acc_volume
+
+    def _random_state(self, step):
+        # 依序產生到目前 tick 為止的每一步
+        while self._walk_step < step:
+            self._walk_step += 1
+            self._walk_log_return += self._tick_noise(self._walk_step) * self.volatility
+            # 漲跌幅限制 ±10%
+            np.clip(self._walk_log_return, np.log(0.9), np.log(1.1), out=self._walk_log_return)
+            price = self.prev_close * np.exp(self._walk_log_return)
+            np.maximum(self._walk_high, price, out=self._walk_high)
+            np.minimum(self._walk_low, price, out=self._walk_low)
+
+        price = _round_to_tick(self.prev_close * np.exp(self._walk_log_return), self.is_etf)
+        fraction = min(step * self.tick_seconds / SESSION_SECONDS, 1.0)
+        volume_fraction = (fraction + ((2 * fraction - 1) ** 3 + 1) / 2) / 2
+        acc_volume = np.floor(self.volume * volume_fraction)
+        return price, _round_to_tick(self._walk_high, self.is_etf), _round_to_tick(self._walk_low, self.is_etf), acc_volume
+
+    def snapshot(self):
+        """
+        目前模擬時間所有股票的報價 (陣列，依 self.codes 順序)
+
+        Returns:
+            tuple: (模擬時間, price, high, low, acc_volume)
+        """
+        step = int(self._elapsed() // self.tick_seconds)
+        if self.mode == 'replay':
+            price, high, low, acc_volume = self._replay_state(step)
+        else:
+            price, high, low, acc_volume = self._random_state(step)
+        return self.now(), price, high, low, acc_volume
+
+    def get(self, codes):
+        sim_time, price, high, low, acc_volume = self.snapshot()
+        timestamp = sim_time.timestamp()
+        time_str = sim_time.strftime('%Y-%m-%d %H:%M:%S')
+
+        ticks = tick_sizes(price, self.is_etf)
+        result = {'success': True}
+        for code in codes:
+            i = self.pos.get(code)
+            if i is None:
+                continue
+            tick = ticks[i]
+            result[code] = {
+                'success': True,
+                'timestamp': timestamp,
+                'info': {'code': code, 'name': self.names[i], 'time': time_str},
+                'realtime': {
+                    'latest_trade_price': _format_price(price[i]),
+                    'trade_volume': '1',
+                    'accumulate_trade_volume': str(int(acc_volume[i])),
+                    'best_bid_price': [_format_price(price[i] - tick * level) for level in range(5)],
+                    'best_bid_volume': ['10'] * 5,
+                    'best_ask_price': [_format_price(price[i] + tick * (level + 1)) for level in range(5)],
+                    'best_ask_volume': ['10'] * 5,
+                    'open': _format_price(self.open[i] if self.mode == 'replay' else self.prev_close[i]),
+                    'high': _format_price(high[i]),
+                    'low': _format_price(low[i])
+                }
+            }
+        return result
+
+
+def create_quote_source(name=None, **kwargs):
+    """
+    建立報價來源
+
+    Args:
+        name (str): 'twstock' / 'esun' / 'sim'，None 表示讀取環境變數 QUOTE_SOURCE (預設 twstock)
+        **kwargs: 傳給報價來源的參數；sim 未指定時讀取環境變數
+            QUOTE_SIM_MODE (replay / random)、QUOTE_SIM_DATE、QUOTE_SIM_SPEED、QUOTE_SIM_SYMBOLS、QUOTE_SIM_TICK
+
+    Returns:
+        QuoteSource: 報價來源
+    """
+    name = name or os.getenv('QUOTE_SOURCE', 'twstock')
+
+    if name == 'twstock':
+        return TwstockQuoteSource(**kwargs)
+    if name == 'esun':
+        return EsunQuoteSource(**kwargs)
+    if name == 'sim':
+        env_defaults = {
+            'mode': os.getenv('QUOTE_SIM_MODE'),
+            'date': os.getenv('QUOTE_SIM_DATE'),
+            'speed': float(os.getenv('QUOTE_SIM_SPEED')) if os.getenv('QUOTE_SIM_SPEED') else None,
+            'max_symbols': int(os.getenv('QUOTE_SIM_SYMBOLS')) if os.getenv('QUOTE_SIM_SYMBOLS') else None,
+            'tick_seconds': float(os.getenv('QUOTE_SIM_TICK')) if os.getenv('QUOTE_SIM_TICK') else None,
+        }
+        for key, value in env_defaults.items():
+            if value is not None:
+                kwargs.setdefault(key, value)
+        return SimulatedQuoteSource(**kwargs)
+    raise ValueError(f"未知的報價來源: {name}")
@@ -0,0 +1,124 @@
+// push 模式: 接收伺服器以 SSE 推送的報價差異，只更新 treemap 的顏色與文字，不重新下載整張圖
+(function () {
+    var source = null;
+
+    function toArray(values) {
+        return values ? Array.prototype.slice.call(values) : [];
+    }
+
+    // 建立 股票代號 -> treemap 葉節點、節點 -> 父節點 的索引 (每張新圖只建立一次)
+    function buildIndex(trace) {
+        var ids = toArray(trace.ids);
+        var parents = toArray(trace.parents);
+        var customdata = toArray(trace.customdata);
+        var position = {};
+        var hasChild = {};
+        var i;
+
+        for (i = 0; i < ids.length; i++) {
+            position[ids[i]] = i;
+        }
+        for (i = 0; i < parents.length; i++) {
+            if (parents[i] !== '') {
+                hasChild[parents[i]] = true;
+            }
+        }
+
+        var leavesByStock = {};
+        var leaves = [];
+        var groups = [];
+        var parentOf = [];
+        for (i = 0; i < ids.length; i++) {
+            parentOf.push(parents[i] === '' ? -1 : position[parents[i]]);
+            if (hasChild[ids[i]]) {
+                groups.push(i);
+            } else {
+                var stockId = String(customdata[i][1]);
+                (leavesByStock[stockId] = leavesByStock[stockId] || []).push(i);
+                leaves.push(i);
+            }
+        }
+        return {leavesByStock: leavesByStock, leaves: leaves, groups: groups, parentOf: parentOf};
+    }
+
+    function applyQuotes(message) {
+        var container = document.getElementById('live-chart');
+        var gd = container && container.querySelector('.js-plotly-plot');
+        if (!gd || !gd._fullData || !gd._fullData.length || gd._fullData[0].type !== 'treemap') {
+            return;
+        }
+
+        var trace = gd._fullData[0];
+        if (!gd._quotePushIndex || gd._quotePushIndex.trace !== gd.data[0]) {
+            gd._quotePushIndex = {trace: gd.data[0], index: buildIndex(trace)};
+        }
+        var index = gd._quotePushIndex.index;
+
+        var values = toArray(trace.values);
+        var colors = toArray(trace.marker.colors);
+        var customdata = toArray(trace.customdata).map(function (row) { return toArray(row); });
+
+        var changed = false;
+        message.stock_ids.forEach(function (stockId, i) {
+            (index.leavesByStock[stockId] || []).forEach(function (leaf) {
+                customdata[leaf][2] = message.price[i];
+                customdata[leaf][3] = message.change[i];
+                colors[leaf] = message.change[i];
+                changed = true;
+            });
+        });
+        if (!changed) {
+            return;
+        }
+
+        // 類別與根節點的顏色 = 底下股票以區塊大小加權的平均 (與 plotly express 相同)
+        var weightedSum = {};
+        var weightSum = {};
+        index.leaves.forEach(function (leaf) {
+            var color = colors[leaf];
+            if (color === null || color === undefined || isNaN(color)) {
+                return;
+            }
+            var weight = values[leaf] || 0;
+            for (var node = index.parentOf[leaf]; node >= 0; node = index.parentOf[node]) {
+                weightedSum[node] = (weightedSum[node] || 0) + weight * color;
+                weightSum[node] = (weightSum[node] || 0) + weight;
+            }
+        });
+        index.groups.forEach(function (node) {
+            colors[node] = weightSum[node] > 0 ? weightedSum[node] / weightSum[node] : null;
+            customdata[node][3] = colors[node];
+        });
+
+        Plotly.restyle(gd, {'marker.colors': [colors], customdata: [customdata]}, [0]);
+        gd._quotePushIndex.trace = gd.data[0];
+    }
+
+    function onQuoteEvent(event) {
+        applyQuotes(JSON.parse(event.data));
+        var timeLabel = document.getElementById('last-update-time');
+        if (timeLabel) {
+            timeLabel.textContent = new Date().toLocaleString('sv-SE');
+        }
+    }
+
+    function connect(url) {
+        source = new EventSource(url);
+        source.addEventListener('snapshot', onQuoteEvent);
+        source.addEventListener('delta', onQuoteEvent);
+        // 斷線時 EventSource 會自動重連，並帶上 Last-Event-ID 從上次的版本接續
+    }
+
+    // Dash 版面是非同步產生的，等設定元素出現後再連線
+    var waitForLayout = setInterval(function () {
+        var config = document.getElementById('quote-push-config');
+        if (!config) {
+            return;
+        }
+        clearInterval(waitForLayout);
+        var url = config.getAttribute('data-stream-url');
+        if (url && !source) {
+            connect(url);
+        }
+    }, 500);
+})();
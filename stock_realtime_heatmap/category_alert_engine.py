@@ -0,0 +1,252 @@
+import datetime
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# 類別狀態代碼
+STATUS_HIGH_NEGATIVE = -2
+STATUS_NEGATIVE = -1
+STATUS_NEUTRAL = 0
+STATUS_POSITIVE = 1
+STATUS_HIGH_POSITIVE = 2
+
+STATUS_EMOJI = {
+    STATUS_HIGH_POSITIVE: "🚀🚀",
+    STATUS_POSITIVE: "🚀",
+    STATUS_NEGATIVE: "💥",
+    STATUS_HIGH_NEGATIVE: "💥💥"
+}
+
+
+class CategoryAlertEngine:
+    """
+    類別漲跌幅通知狀態機 (以陣列一次計算所有類別)
+
+    每個類別的狀態、上次通知時的平均漲跌幅、上次通知時間都存成陣列，
+    每次報價更新只需要幾個 numpy 運算即可判斷哪些類別需要通知:
+    - 冷卻時間內 (cooldown_seconds) 不再通知
+    - 與上次通知的平均漲跌幅差距小於 buffer_threshold 不通知
+    - 平均漲跌幅在 ±alert_threshold 之間視為中性，不通知也不更新狀態
+    - 狀態 (±alert_threshold / ±high_alert_threshold) 改變時才通知
+    - set_universe / evaluate / save_state / load_state 以 lock 保護，可由多個 thread 同時呼叫
+    """
+
+    def __init__(self, cooldown_seconds=60, buffer_threshold=0.8, alert_threshold=3.5, high_alert_threshold=6.5):
+        """
+        Args:
+            cooldown_seconds (float): 同一類別兩次通知的最短間隔秒數
+            buffer_threshold (float): 平均漲跌幅需與上次通知相差多少 (%) 才重新判斷
+            alert_threshold (float): 通知門檻 (%)
+            high_alert_threshold (float): 強烈通知門檻 (%)
+        """
+        self.cooldown_seconds = cooldown_seconds
+        self.buffer_threshold = buffer_threshold
+        self.alert_threshold = alert_threshold
+        self.high_alert_threshold = high_alert_threshold
+        # 非推送模式下多個瀏覽器的 callback 會同時 evaluate，冷卻判斷與狀態更新需要互斥，避免同一類別重複通知
+        self._lock = threading.RLock()
+
+        self.categories = []
+        self.member_stock = np.empty(0, dtype=np.intp)
+        self.member_cat = np.empty(0, dtype=np.intp)
+        self.category_stock_pos = {}
+        self.stock_labels = np.empty(0, dtype=object)
+
+        self.status = np.empty(0, dtype=np.int8)
+        self.last_mean = np.empty(0, dtype=float)
+        self.last_fire_time = np.empty(0, dtype=float)
+
+    def set_universe(self, category_index, stock_names, stock_types):
+        """
+        設定 (或更新) 類別與股票清單，已存在類別的通知狀態會保留
+
+        Args:
+            category_index (dict): build_category_index 的輸出
+            stock_names (array-like): 依 category_index['stock_ids'] 順序排列的股票名稱
+            stock_types (array-like): 依 category_index['stock_ids'] 順序排列的市場別 ('TWSE' / 'TPEx')
+        """
+        with self._lock:
+            categories = list(category_index['categories'])
+
+            # 依類別名稱搬移舊狀態，新類別從中性開始
+            status = np.full(len(categories), STATUS_NEUTRAL, dtype=np.int8)
+            last_mean = np.zeros(len(categories), dtype=float)
+            last_fire_time = np.full(len(categories), -np.inf)
+            old_pos = {category: i for i, category in enumerate(self.categories)}
+            for new_i, category in enumerate(categories):
+                old_i = old_pos.get(category)
+                if old_i is not None:
+                    status[new_i] = self.status[old_i]
+                    last_mean[new_i] = self.last_mean[old_i]
+                    last_fire_time[new_i] = self.last_fire_time[old_i]
+
+            self.categories = categories
+            self.member_stock = category_index['member_stock']
+            self.member_cat = category_index['member_cat']
+            self.category_stock_pos = category_index['category_stock_pos']
+            self.status = status
+            self.last_mean = last_mean
+            self.last_fire_time = last_fire_time
+
+            # 預先產生每檔股票的 TradingView 連結文字 (Discord Markdown 超連結)
+            labels = []
+            for stock_id, stock_name, stock_type in zip(category_index['stock_ids'], stock_names, stock_types):
+                market_prefix = 'TWSE' if stock_type == 'TWSE' else 'TPEX'
+                tv_link = f"https://tw.tradingview.com/chart/?symbol={market_prefix}%3A{stock_id}"
+                labels.append(f"[{stock_name} ({stock_id})]({tv_link})")
+            self.stock_labels = np.asarray(labels, dtype=object)
+
+    def category_stats(self, realtime_change):
+        """
+        計算每個類別的平均漲跌幅 (四捨五入到小數兩位) 與有效股票數
+
+        Args:
+            realtime_change (np.ndarray): 依 stock_ids 順序排列的即時漲跌幅
+
+        Returns:
+            tuple: (mean, count)，依 categories 順序排列，無有效值的類別 mean 為 NaN
+        """
+        member_values = np.asarray(realtime_change, dtype=float)[self.member_stock]
+        valid = ~np.isnan(member_values)
+        n_categories = len(self.categories)
+
+        sums = np.bincount(self.member_cat, weights=np.where(valid, member_values, 0.0), minlength=n_categories)
+        counts = np.bincount(self.member_cat, weights=valid, minlength=n_categories).astype(np.int64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.round(np.where(counts > 0, sums / counts, np.nan), 2)
+        return mean, counts
+
+    def evaluate(self, realtime_change, now=None):
+        """
+        判斷哪些類別的狀態改變需要通知，並更新內部狀態
+
+        Args:
+            realtime_change (np.ndarray): 依 stock_ids 順序排列的即時漲跌幅
+            now (float): 目前時間 (time.time())，None 表示使用當下時間
+
+        Returns:
+            list: 需要通知的類別 (依平均漲跌幅由高到低)，格式為 [{
+                'category': '半導體', 'status': 1, 'mean': 3.85, 'count': 12, 'stock_pos': np.array([...])
+            }, ...]
+        """
+        with self._lock:
+            if not self.categories:
+                return []
+            now = time.time() if now is None else now
+
+            mean, counts = self.category_stats(realtime_change)
+
+            # 依平均漲跌幅判斷目前狀態 (NaN 比較結果為 False，維持中性)
+            current_status = np.select(
+                [mean >= self.high_alert_threshold, mean >= self.alert_threshold,
+                 mean <= -self.high_alert_threshold, mean <= -self.alert_threshold],
+                [STATUS_HIGH_POSITIVE, STATUS_POSITIVE, STATUS_HIGH_NEGATIVE, STATUS_NEGATIVE],
+                default=STATUS_NEUTRAL
+            ).astype(np.int8)
+
+            out_of_cooldown = (now - self.last_fire_time) >= self.cooldown_seconds
+            significant = np.abs(mean - self.last_mean) >= self.buffer_threshold
+            # 中性區間不通知也不更新狀態，避免緩衝區無法在界線即時通報
+            fire = out_of_cooldown & significant & (current_status != STATUS_NEUTRAL) & (current_status != self.status)
+
+            fired = np.flatnonzero(fire)
+            if fired.size == 0:
+                return []
+
+            self.status[fired] = current_status[fired]
+            self.last_mean[fired] = mean[fired]
+            self.last_fire_time[fired] = now
+
+            fired = fired[np.argsort(-mean[fired], kind='stable')]
+            return [
+                {
+                    'category': self.categories[cat_idx],
+                    'status': int(current_status[cat_idx]),
+                    'mean': float(mean[cat_idx]),
+                    'count': int(counts[cat_idx]),
+                    'stock_pos': self.category_stock_pos[self.categories[cat_idx]]
+                }
+                for cat_idx in fired
+            ]
+
+    def save_state(self, path):
+        """
+        把通知狀態寫入檔案 (多程序部署時 leader 換手，新的 leader 讀回後不會重複通知)
+
+        Args:
+            path (str): 狀態檔路徑
+        """
+        with self._lock:
+            state = {
+                'date': datetime.date.today().isoformat(),
+                'categories': {
+                    category: [int(self.status[i]), float(self.last_mean[i]),
+                               float(self.last_fire_time[i]) if np.isfinite(self.last_fire_time[i]) else None]
+                    for i, category in enumerate(self.categories)
+                }
+            }
+            try:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"寫入通知狀態 {path} 失敗：{e}")
+
+    def load_state(self, path):
+        """
+        從檔案讀回當天的通知狀態 (依類別名稱對應，需先呼叫 set_universe)
+
+        Returns:
+            bool: 是否有讀到當天的狀態
+        """
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except FileNotFoundError:
+                return False
+            except (OSError, ValueError) as e:
+                print(f"讀取通知狀態 {path} 失敗：{e}")
+                return False
+
+            # 前一天的狀態不沿用
+            if state.get('date') != datetime.date.today().isoformat():
+                return False
+
+            saved = state.get('categories', {})
+            for i, category in enumerate(self.categories):
+                if category in saved:
+                    status, last_mean, last_fire_time = saved[category]
+                    self.status[i] = status
+                    self.last_mean[i] = last_mean
+                    self.last_fire_time[i] = -np.inf if last_fire_time is None else last_fire_time
+            print(f"從 {path} 讀回 {len(saved)} 個類別的通知狀態")
+            return True
+
+    def format_alerts(self, alerts, realtime_change):
+        """
+        將 evaluate 的結果轉成 Discord 訊息內容
+
+        Args:
+            alerts (list): evaluate 的輸出
+            realtime_change (np.ndarray): 依 stock_ids 順序排列的即時漲跌幅
+
+        Returns:
+            str: 訊息內容，沒有通知時為空字串
+        """
+        text = ""
+        for alert in alerts:
+            stock_pos = alert['stock_pos']
+            stock_info_text = "\n".join(
+                f"{label} ({change:+.2f}%)"
+                for label, change in zip(self.stock_labels[stock_pos], np.asarray(realtime_change, dtype=float)[stock_pos])
+            )
+            emoji = STATUS_EMOJI[alert['status']]
+            text += f"{emoji} **{alert['category']}** ({alert['count']}檔): {alert['mean']:+.2f}%\n{stock_info_text}\n"
+        return text
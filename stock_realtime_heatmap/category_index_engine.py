@@ -0,0 +1,183 @@
+import threading
+import time
+
+import numpy as np
+
+
+class CategoryIndexEngine:
+    """
+    盤中類別指數 (市值加權與等權重)，每批報價只更新價格有變動的成分股
+
+    - 市值加權: (Σ 發行股數 × 即時價 / Σ 發行股數 × 昨收 - 1) × 100
+    - 等權重: 有報價成分股漲跌幅的平均 (與熱力圖 groupby().mean() 相同)
+    - 沒有新報價 (NaN) 的股票沿用上一次的價格，尚未有報價的股票以昨收計入市值加權
+    - 每次更新都記錄一筆類別指數，保留最近 capacity 筆作為時間序列
+    - 公開方法以 lock 保護，可由多個 thread 同時呼叫
+    """
+
+    def __init__(self, capacity=4096, recompute_every=1000):
+        """
+        Args:
+            capacity (int): 時間序列最多保留的筆數
+            recompute_every (int): 每更新幾次重新完整計算一次 (避免累加誤差)
+        """
+        self.capacity = capacity
+        self.recompute_every = recompute_every
+        # 非推送模式下多個瀏覽器的 callback 會同時更新，update 為讀取後修改累加值，需要互斥
+        self._lock = threading.RLock()
+        self.set_universe({'stock_ids': [], 'categories': [], 'member_stock': np.empty(0, dtype=np.intp),
+                           'member_cat': np.empty(0, dtype=np.intp)}, [], [])
+
+    def set_universe(self, category_index, issue_shares, last_day_price):
+        """
+        設定類別與成分股 (會清除目前的報價與時間序列)
+
+        Args:
+            category_index (dict): build_category_index 的輸出
+            issue_shares (array-like): 依 stock_ids 順序排列的發行股數
+            last_day_price (array-like): 依 stock_ids 順序排列的昨收價
+        """
+        with self._lock:
+            self.stock_ids = list(category_index['stock_ids'])
+            self.categories = list(category_index['categories'])
+            self.category_pos = {category: i for i, category in enumerate(self.categories)}
+            self.member_stock = np.asarray(category_index['member_stock'], dtype=np.intp)
+            self.member_cat = np.asarray(category_index['member_cat'], dtype=np.intp)
+
+            n_stocks = len(self.stock_ids)
+            self.issue_shares = np.nan_to_num(np.asarray(issue_shares, dtype=float))
+            self.base_price = np.asarray(last_day_price, dtype=float)
+            # 昨收無效的股票不計入指數
+            self.base_valid = np.isfinite(self.base_price) & (self.base_price > 0)
+            self.price = np.full(n_stocks, np.nan)
+
+            # 股票 -> 展開列 (CSR)，更新時只取出變動股票所屬的類別
+            order = np.argsort(self.member_stock, kind='stable')
+            self.stock_member_rows = order
+            self.stock_member_ptr = np.concatenate(([0], np.cumsum(np.bincount(self.member_stock, minlength=n_stocks))))
+
+            self.update_count = 0
+            self.history_time = np.full(self.capacity, np.nan)
+            self.history_cap = np.full((self.capacity, len(self.categories)), np.nan)
+            self.history_equal = np.full((self.capacity, len(self.categories)), np.nan)
+            self._recompute()
+
+    def _stock_caps(self, price, positions=None):
+        """
+        每檔股票的 (目前市值, 昨收市值, 漲跌幅, 是否有報價)
+
+        Args:
+            price (np.ndarray): 股票價格 (positions 不為 None 時只包含這些股票)
+            positions (np.ndarray): 只計算這些位置的股票，None 表示全部
+        """
+        if positions is None:
+            positions = slice(None)
+        shares = self.issue_shares[positions]
+        base_price = self.base_price[positions]
+        base_valid = self.base_valid[positions]
+
+        has_price = np.isfinite(price) & base_valid
+        base_cap = np.where(base_valid, shares * np.where(base_valid, base_price, 0.0), 0.0)
+        current_cap = np.where(has_price, shares * np.where(has_price, price, 0.0), base_cap)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            change = np.where(has_price, (price - base_price) / base_price * 100, 0.0)
+        return current_cap, base_cap, change, has_price
+
+    def _recompute(self):
+        """完整重新計算各類別的累加值"""
+        n_categories = len(self.categories)
+        current_cap, base_cap, change, has_price = self._stock_caps(self.price)
+        stock = self.member_stock
+        self.cap_current = np.bincount(self.member_cat, weights=current_cap[stock], minlength=n_categories)
+        self.cap_base = np.bincount(self.member_cat, weights=base_cap[stock], minlength=n_categories)
+        self.change_sum = np.bincount(self.member_cat, weights=change[stock], minlength=n_categories)
+        self.change_count = np.bincount(self.member_cat, weights=has_price[stock], minlength=n_categories)
+
+    def update(self, price, timestamp=None):
+        """
+        以一批即時價更新類別指數，只處理價格有變動的股票
+
+        Args:
+            price (np.ndarray): 依 stock_ids 順序排列的即時價 (NaN 表示這次沒有報價)
+            timestamp (float): 報價時間 (time.time())，None 表示使用當下時間
+
+        Returns:
+            int: 這次價格有變動的股票數
+        """
+        with self._lock:
+            price = np.asarray(price, dtype=float)
+            new_price = np.where(np.isfinite(price), price, self.price)
+            changed = np.flatnonzero((new_price != self.price) & ~(np.isnan(new_price) & np.isnan(self.price)))
+
+            if changed.size:
+                old_current, _, old_change, old_has = self._stock_caps(self.price[changed], changed)
+                self.price[changed] = new_price[changed]
+
+                if self.update_count % self.recompute_every == 0:
+                    self._recompute()
+                else:
+                    new_current, _, new_change, new_has = self._stock_caps(self.price[changed], changed)
+
+                    # 展開變動股票所屬的所有 (股票, 類別) 列
+                    starts = self.stock_member_ptr[changed]
+                    lengths = self.stock_member_ptr[changed + 1] - starts
+                    changed_row = np.repeat(np.arange(changed.size), lengths)
+                    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+                    cat = self.member_cat[self.stock_member_rows[np.repeat(starts, lengths) + offsets]]
+
+                    n_categories = len(self.categories)
+                    delta_cap = (new_current - old_current)[changed_row]
+                    delta_change = (new_change - old_change)[changed_row]
+                    delta_count = (new_has.astype(float) - old_has)[changed_row]
+                    self.cap_current += np.bincount(cat, weights=delta_cap, minlength=n_categories)
+                    self.change_sum += np.bincount(cat, weights=delta_change, minlength=n_categories)
+                    self.change_count += np.bincount(cat, weights=delta_count, minlength=n_categories)
+
+            self.update_count += 1
+            slot = (self.update_count - 1) % self.capacity
+            self.history_time[slot] = time.time() if timestamp is None else timestamp
+            self.history_cap[slot] = self.cap_weighted_change()
+            self.history_equal[slot] = self.equal_weighted_change()
+            return int(changed.size)
+
+    def cap_weighted_change(self):
+        """
+        Returns:
+            np.ndarray: 依 categories 順序排列的市值加權漲跌幅 (%)，沒有有效昨收市值的類別為 NaN
+        """
+        with self._lock:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(self.cap_base > 0, (self.cap_current / self.cap_base - 1) * 100, np.nan)
+
+    def equal_weighted_change(self):
+        """
+        Returns:
+            np.ndarray: 依 categories 順序排列的等權重漲跌幅 (%)，沒有報價的類別為 NaN
+        """
+        with self._lock:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(self.change_count > 0, self.change_sum / np.maximum(self.change_count, 1), np.nan)
+
+    def series(self, category, weighting='cap', last_n=None):
+        """
+        取得單一類別指數的時間序列
+
+        Args:
+            category (str): 類別名稱
+            weighting (str): 'cap' 市值加權 / 'equal' 等權重
+            last_n (int): 只取最後 n 筆，None 表示全部
+
+        Returns:
+            tuple: (timestamps, values)，類別不存在時回傳兩個空陣列
+        """
+        with self._lock:
+            cat_idx = self.category_pos.get(category)
+            if cat_idx is None:
+                return np.empty(0), np.empty(0)
+
+            n = min(self.update_count, self.capacity)
+            if last_n is not None:
+                n = min(n, last_n)
+            order = np.arange(self.update_count - n, self.update_count) % self.capacity
+            history = self.history_cap if weighting == 'cap' else self.history_equal
+            return self.history_time[order], history[order, cat_idx]
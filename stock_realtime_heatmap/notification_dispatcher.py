@@ -0,0 +1,281 @@
+import queue
+import threading
+import time
+from datetime import datetime
+
+import plotly.io as pio
+import requests
+
+
+class DiscordWebhookDispatcher:
+    """
+    背景發送 Discord webhook 的共用核心 (熱力圖類別通知、Strategy1 訊號通知共用)
+
+    - enqueue 的項目放進佇列，收到第一筆後再等待 coalesce_seconds，同一段時間內的項目合併成一批交給 _send_batch
+    - 內容依行切割成不超過 description 上限的 embed，再分成不超過 embed 數與總字數上限的多則訊息
+    - 每個 HTTP 請求都有 timeout，連線錯誤、5xx 與 429 (依 retry_after) 會重試，
+      回應標頭顯示額度用完時先等待 reset 再送下一則
+    """
+
+    EMBED_DESCRIPTION_LIMIT = 4000  # Discord description 上限 4096 字，保留一些空間
+    MESSAGE_EMBED_LIMIT = 10        # 單一訊息最多 10 個 embed
+    MESSAGE_TOTAL_LIMIT = 6000      # 單一訊息所有 embed 的 title + description 合計上限
+
+    thread_name = 'discord-webhook'
+
+    def __init__(self, coalesce_seconds=3.0, request_timeout=10, max_retries=3):
+        """
+        Args:
+            coalesce_seconds (float): 收到第一筆項目後，再等待多久收集後續項目一起發送
+            request_timeout (float): 每個 HTTP 請求的 timeout 秒數
+            max_retries (int): 每個請求最多重試次數
+        """
+        self.coalesce_seconds = coalesce_seconds
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._blocked_until = 0.0 # time.monotonic()，webhook 額度用完時等到此時間
+
+    def start(self):
+        """啟動背景 worker (重複呼叫不會建立多個 thread)"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止背景 worker，佇列中尚未發送的項目會被捨棄"""
+        self._stop_event.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _put(self, item):
+        """放入一筆項目 (不阻塞)"""
+        self._queue.put(item)
+        self.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            item = self._queue.get()
+            if item is None:
+                continue
+
+            # 收集同一段時間內的其他項目
+            batch = [item]
+            deadline = time.monotonic() + self.coalesce_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    next_item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if next_item is None:
+                    break
+                batch.append(next_item)
+
+            if self._stop_event.is_set():
+                break
+            try:
+                self._send_batch(batch)
+            except Exception as e:
+                print(f"Error sending Discord notification: {e}")
+
+    def _send_batch(self, batch):
+        """發送一批合併後的項目 (子類別實作)"""
+        raise NotImplementedError
+
+    def _split_lines(self, lines):
+        """
+        依行分組，每組合計不超過 description 上限 (過長的單行截斷)
+
+        Returns:
+            list: [[line, ...], ...]
+        """
+        chunks = []
+        current, size = [], 0
+        for line in lines:
+            line = line[:self.EMBED_DESCRIPTION_LIMIT]
+            if current and size + len(line) > self.EMBED_DESCRIPTION_LIMIT:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(line)
+            size += len(line)
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _split_description(self, text):
+        """依行切割成不超過 Discord 上限的段落"""
+        return ["".join(chunk) for chunk in self._split_lines(text.splitlines(keepends=True))]
+
+    def _group_embeds(self, embeds):
+        """把 embed 分成多則訊息，每則不超過 embed 數與總字數上限"""
+        messages = []
+        current, total = [], 0
+        for embed in embeds:
+            size = len(embed.get('title', '')) + len(embed.get('description', ''))
+            if current and (len(current) >= self.MESSAGE_EMBED_LIMIT or total + size > self.MESSAGE_TOTAL_LIMIT):
+                messages.append(current)
+                current, total = [], 0
+            current.append(embed)
+            total += size
+        if current:
+            messages.append(current)
+        return messages
+
+    def _wait(self, seconds):
+        """等待 seconds 秒，停止時提前結束 (回傳 True)"""
+        return self._stop_event.wait(max(0.0, seconds))
+
+    def _post_with_retry(self, webhook_url, **kwargs):
+        """
+        POST 到 webhook，連線錯誤、5xx 與 429 會重試
+
+        Returns:
+            requests.Response: 最後一次的回應，全部失敗則回傳 None
+        """
+        resp = None
+        for attempt in range(self.max_retries + 1):
+            if self._wait(self._blocked_until - time.monotonic()):
+                return resp
+
+            try:
+                resp = requests.post(webhook_url, timeout=self.request_timeout, **kwargs)
+            except requests.RequestException as e:
+                print(f"Discord request failed ({attempt + 1}/{self.max_retries + 1}): {e}")
+                resp = None
+                wait_seconds = 2 ** attempt
+            else:
+                # 額度用完時，下一個請求先等到 reset
+                if resp.headers.get('X-RateLimit-Remaining') == '0':
+                    try:
+                        reset_after = float(resp.headers.get('X-RateLimit-Reset-After', 1))
+                    except ValueError:
+                        reset_after = 1
+                    self._blocked_until = time.monotonic() + reset_after
+
+                if resp.status_code == 429:
+                    try:
+                        wait_seconds = float(resp.json().get('retry_after', 1))
+                    except ValueError:
+                        wait_seconds = 1
+                    print(f"⚠️ Discord 限流，{wait_seconds} 秒後重試")
+                elif resp.status_code >= 500:
+                    wait_seconds = 2 ** attempt
+                else:
+                    return resp
+
+            if attempt < self.max_retries:
+                if self._wait(wait_seconds):
+                    break
+        return resp
+
+    def _post_embeds(self, webhook_url, embeds):
+        """
+        把 embed 分成多則訊息依序送出，失敗時停止
+
+        Returns:
+            int: 成功送出的 embed 數 (依 embeds 順序)
+        """
+        sent = 0
+        for message_embeds in self._group_embeds(embeds):
+            resp = self._post_with_retry(webhook_url, json={"embeds": message_embeds})
+            if resp is None or resp.status_code >= 300:
+                status = resp.status_code if resp is not None else 'N/A'
+                print(f"Failed to send Discord notification. Status code: {status}")
+                break
+            sent += len(message_embeds)
+        return sent
+
+
+class DiscordNotificationDispatcher(DiscordWebhookDispatcher):
+    """
+    背景發送熱力圖類別通知，dashboard callback 只負責把狀態變化放進佇列
+
+    - 同一段時間內 (coalesce_seconds) 的多筆通知合併成一則訊息，只附上最新的熱力圖
+    - 內容超過 Discord 上限 (每則 10 個 embed、合計 6000 字) 時分成多則訊息依序送出
+    - 熱力圖在記憶體中轉成 PNG，不寫入磁碟
+    """
+
+    thread_name = 'discord-notification'
+
+    def __init__(self, coalesce_seconds=3.0, request_timeout=10, max_retries=3, image_size=(1920, 1080)):
+        """
+        Args:
+            coalesce_seconds (float): 收到第一筆通知後，再等待多久收集後續通知一起發送
+            request_timeout (float): 每個 HTTP 請求的 timeout 秒數
+            max_retries (int): 每個請求最多重試次數
+            image_size (tuple): 熱力圖輸出尺寸 (寬, 高)
+        """
+        super().__init__(coalesce_seconds, request_timeout, max_retries)
+        self.image_size = image_size
+
+    def enqueue(self, webhook_url, text, fig=None):
+        """
+        放入一筆通知 (不阻塞)
+
+        Args:
+            webhook_url (str): Discord webhook URL
+            text (str): 通知內容 (embed description)
+            fig (plotly.graph_objects.Figure): 要附上的熱力圖，None 表示不附圖
+        """
+        if not webhook_url or not text:
+            return
+        # 先轉成 dict，避免 worker 讀取時圖表物件仍被 Dash 使用
+        fig_dict = fig.to_dict() if fig is not None else None
+        self._put({
+            'webhook_url': webhook_url,
+            'text': text,
+            'fig': fig_dict,
+            'time': datetime.now()
+        })
+
+    def _send_batch(self, batch):
+        # 依 webhook 分組發送
+        webhook_batches = {}
+        for item in batch:
+            webhook_batches.setdefault(item['webhook_url'], []).append(item)
+
+        for webhook_url, items in webhook_batches.items():
+            try:
+                self._send(webhook_url, items)
+            except Exception as e:
+                print(f"Error sending Discord notification: {e}")
+
+    def _send(self, webhook_url, items):
+        current_time = items[-1]['time'].strftime("%Y-%m-%d %H:%M:%S")
+        text = "".join(item['text'] for item in items)
+
+        embeds = [{
+            "title": f"📊 台股產業類股漲跌幅 - {current_time}",
+            "color": 0x00ff00,
+            "description": chunk,
+            "type": "rich"
+        } for chunk in self._split_description(text)]
+
+        if self._post_embeds(webhook_url, embeds) < len(embeds):
+            return
+        print("Discord notification sent successfully!")
+
+        # 只附上最新的熱力圖
+        latest_fig = next((item['fig'] for item in reversed(items) if item['fig'] is not None), None)
+        if latest_fig is None:
+            return
+
+        width, height = self.image_size
+        image_bytes = pio.to_image(latest_fig, format="png", width=width, height=height)
+        resp = self._post_with_retry(webhook_url, files={"file": ("heatmap.png", image_bytes, "image/png")})
+        if resp is not None and resp.status_code == 200:
+            print("Discord heatmap image sent successfully!")
+        else:
+            status = resp.status_code if resp is not None else 'N/A'
+            print(f"Failed to send Discord heatmap image. Status code: {status}")
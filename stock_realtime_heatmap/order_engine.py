@@ -0,0 +1,132 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TokenBucket:
+    """
+    Token bucket 限速: 每秒補充 rate 個 token，最多累積 burst 個，每筆下單取用一個
+    """
+
+    def __init__(self, rate, burst):
+        """
+        Args:
+            rate (float): 每秒補充的 token 數 (長時間平均的每秒下單數)
+            burst (int): 最多累積的 token 數 (可連續送出的筆數)
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一個 token，不足時等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+class BasketOrderEngine:
+    """
+    籃子下單引擎: 在背景 thread 以有限的並行數送出多筆委託，所有委託共用同一個 token bucket 限速
+
+    - submit() 立即回傳籃子編號，不會阻塞 Dash callback
+    - 每筆委託完成時記錄結果，progress() 可隨時取得目前進度
+    """
+
+    def __init__(self, send_order, rate_per_second=5.0, burst=5, max_concurrency=4, keep_baskets=20):
+        """
+        Args:
+            send_order (callable): 下單函式 (esun_send_order)，回傳 (success, message)
+            rate_per_second (float): 每秒最多送出的委託數
+            burst (int): 最多可連續送出的委託數
+            max_concurrency (int): 同時等待回應的委託數
+            keep_baskets (int): 保留最近幾個籃子的結果
+        """
+        self.send_order = send_order
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.keep_baskets = keep_baskets
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='basket-order')
+        self._baskets = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, orders):
+        """
+        送出一個籃子 (背景執行)
+
+        Args:
+            orders (list): 每筆委託為 dict:
+                'label' (str): 顯示用的委託描述
+                'group' (str): 分組 (股票代號)，顯示時依此彙整
+                'kwargs' (dict): 傳給 send_order 的參數
+                其他欄位會原樣保留在結果中
+
+        Returns:
+            int: 籃子編號
+        """
+        basket_id = next(self._ids)
+        basket = {
+            'total': len(orders),
+            'results': [None] * len(orders),
+            'submitted_at': time.monotonic(),
+            'finished_at': None
+        }
+        with self._lock:
+            self._baskets[basket_id] = basket
+            for old_id in sorted(self._baskets)[:-self.keep_baskets]:
+                del self._baskets[old_id]
+
+        for i, order in enumerate(orders):
+            self._executor.submit(self._send, basket, i, order)
+        if not orders:
+            basket['finished_at'] = basket['submitted_at']
+        return basket_id
+
+    def _send(self, basket, i, order):
+        self.bucket.acquire()
+        try:
+            success, message = self.send_order(**order['kwargs'])
+        except Exception as e:
+            success, message = False, f"異常: {e}"
+
+        with self._lock:
+            basket['results'][i] = {
+                **{key: value for key, value in order.items() if key != 'kwargs'},
+                'success': success,
+                'message': message
+            }
+            if all(result is not None for result in basket['results']):
+                basket['finished_at'] = time.monotonic()
+                print(f"籃子下單完成: {basket['total']} 筆，耗時 {basket['finished_at'] - basket['submitted_at']:.2f} 秒")
+
+    def progress(self, basket_id):
+        """
+        取得籃子目前的進度
+
+        Returns:
+            dict: {'total', 'done', 'finished', 'elapsed', 'results' (已完成的委託，依送出順序)}，
+                  籃子不存在時回傳 None
+        """
+        with self._lock:
+            basket = self._baskets.get(basket_id)
+            if basket is None:
+                return None
+            results = [result for result in basket['results'] if result is not None]
+            end = basket['finished_at'] or time.monotonic()
+            return {
+                'total': basket['total'],
+                'done': len(results),
+                'finished': basket['finished_at'] is not None,
+                'elapsed': end - basket['submitted_at'],
+                'results': results
+            }
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def quote_from_twstock(realtime_data):
+    """
+    把 twstock 即時資料的五檔轉成玉山行情 API 的格式 ({'bids': [{'price': ...}], 'asks': [...]})
+
+    Returns:
+        dict: 報價，買賣價都無效時回傳 None
+    """
+    def levels(prices):
+        result = []
+        for price in prices or []:
+            try:
+                if price not in ['-', '0.0000'] and float(price) > 0:
+                    result.append({'price': float(price)})
+            except (ValueError, TypeError):
+                pass
+        return result
+
+    bids = levels(realtime_data.get('best_bid_price'))
+    asks = levels(realtime_data.get('best_ask_price'))
+    if not bids and not asks:
+        return None
+    return {'bids': bids, 'asks': asks}
+
+
+def best_quote_price(quote, side):
+    """
+    取出一檔價格
+
+    Args:
+        quote (dict): 玉山行情 API 格式的報價 (可為 None)
+        side (str): 'asks' 賣價 / 'bids' 買價
+
+    Returns:
+        float: 價格，沒有報價時回傳 0
+    """
+    if quote and quote.get(side):
+        return quote[side][0]['price']
+    return 0
+
+
+class QuoteCache:
+    """
+    短時間有效的報價快取，key 為 (股票代號, 盤別 'LOT' / 'ODDLOT')
+
+    - 熱力圖輪詢到的整股五檔也會寫入，下單面板在有效期限內不必再查詢
+    - get_many() 只查詢快取中沒有或已過期的報價，並以 thread pool 同時查詢
+    """
+
+    def __init__(self, ttl_seconds=2.0, max_workers=8):
+        """
+        Args:
+            ttl_seconds (float): 報價有效秒數
+            max_workers (int): 同時查詢的數量
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_workers = max_workers
+        self._quotes = {}
+        self._lock = threading.Lock()
+
+    def get(self, stock_id, board):
+        """
+        Returns:
+            dict: 有效期限內的報價，沒有或已過期時回傳 None
+        """
+        with self._lock:
+            entry = self._quotes.get((stock_id, board))
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            return None
+        return entry[1]
+
+    def put(self, stock_id, board, quote):
+        if quote is None:
+            return
+        with self._lock:
+            self._quotes[(stock_id, board)] = (time.monotonic(), quote)
+
+    def get_many(self, keys, fetch):
+        """
+        取得多筆報價，過期的部分同時查詢
+
+        Args:
+            keys (list): [(股票代號, 盤別), ...]
+            fetch (callable): fetch(盤別, 股票代號) 回傳報價，失敗時回傳 None (不會被快取)
+
+        Returns:
+            dict: {(股票代號, 盤別): 報價或 None}
+        """
+        quotes = {key: self.get(*key) for key in dict.fromkeys(keys)}
+        missing = [key for key, quote in quotes.items() if quote is None]
+        if not missing:
+            return quotes
+
+        def fetch_one(key):
+            stock_id, board = key
+            return key, fetch(board, stock_id)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+            for key, quote in executor.map(fetch_one, missing):
+                self.put(key[0], key[1], quote)
+                quotes[key] = quote
+        return quotes
@@ -0,0 +1,153 @@
+import json
+import math
+import threading
+from collections import deque
+
+import numpy as np
+from flask import Response, request, stream_with_context
+
+
+def _to_json_number(value):
+    """NaN 無法放進 JSON，轉成 None"""
+    return None if value is None or math.isnan(value) else round(float(value), 2)
+
+
+class QuoteDeltaPublisher:
+    """
+    保存最新的即時報價快照，只在報價有變動時產生新版本與差異 (delta)
+
+    - 輪詢報價的背景 thread 呼叫 publish()，與連線中的瀏覽器數量無關
+    - 每個 SSE 連線以 wait_for_events() 等待新版本，只收到有變動的股票
+    - 連線落後太多 (差異已不在 history 內) 時改送完整快照
+    """
+
+    def __init__(self, history=256):
+        """
+        Args:
+            history (int): 保留最近幾個版本的差異
+        """
+        self.version = 0
+        self.stock_ids = []
+        self.price = np.empty(0)
+        self.change = np.empty(0)
+        self._deltas = deque(maxlen=history)
+        self._condition = threading.Condition()
+
+    def publish(self, stock_ids, price, change):
+        """
+        發布一批即時報價
+
+        Args:
+            stock_ids (list): 股票代號
+            price (np.ndarray): 依 stock_ids 順序排列的即時價 (NaN 表示沒有報價)
+            change (np.ndarray): 依 stock_ids 順序排列的漲跌幅 (NaN 表示沒有報價)
+
+        Returns:
+            int: 發布後的版本 (沒有變動時不變)
+        """
+        stock_ids = list(stock_ids)
+        price = np.round(np.asarray(price, dtype=float), 2)
+        change = np.round(np.asarray(change, dtype=float), 2)
+
+        with self._condition:
+            if stock_ids != self.stock_ids:
+                # 股票清單改變，舊的差異已無意義，連線會收到完整快照
+                self.stock_ids = stock_ids
+                self.price = np.full(len(stock_ids), np.nan)
+                self.change = np.full(len(stock_ids), np.nan)
+                self._deltas.clear()
+                self.version += 1  # 讓舊版本的連線無法接續差異
+
+            changed = np.flatnonzero(
+                ((price != self.price) & ~(np.isnan(price) & np.isnan(self.price))) |
+                ((change != self.change) & ~(np.isnan(change) & np.isnan(self.change)))
+            )
+            if changed.size == 0:
+                return self.version
+
+            self.price[changed] = price[changed]
+            self.change[changed] = change[changed]
+            self.version += 1
+            self._deltas.append(self._build_event('delta', changed))
+            self._condition.notify_all()
+            return self.version
+
+    def latest(self):
+        """
+        Returns:
+            tuple: (stock_ids, price, change) 最新快照的複本，尚未發布時 stock_ids 為空
+        """
+        with self._condition:
+            return list(self.stock_ids), self.price.copy(), self.change.copy()
+
+    def wait_for_events(self, since_version, timeout):
+        """
+        等待比 since_version 新的版本
+
+        Args:
+            since_version (int): 連線目前的版本，None 表示尚未收到任何資料
+            timeout (float): 最多等待秒數
+
+        Returns:
+            list: 要送出的事件 (delta 或 snapshot)，逾時沒有新版本時為空 list
+        """
+        with self._condition:
+            # 伺服器重啟後版本重新計算，連線帶來的版本可能比目前還新
+            if since_version is not None and since_version > self.version:
+                since_version = None
+
+            if since_version is not None:
+                self._condition.wait_for(lambda: self.version > since_version, timeout)
+                if self.version <= since_version:
+                    return []
+
+                # 需要的差異都還在 history 內時只送差異
+                if self._deltas and self._deltas[0]['version'] <= since_version + 1:
+                    return [delta for delta in self._deltas if delta['version'] > since_version]
+
+            if self.version == 0:
+                self._condition.wait_for(lambda: self.version > 0, timeout)
+                if self.version == 0:
+                    return []
+            return [self._build_event('snapshot', np.arange(len(self.stock_ids)))]
+
+    def _build_event(self, event_type, positions):
+        return {
+            'type': event_type,
+            'version': self.version,
+            'stock_ids': [self.stock_ids[pos] for pos in positions],
+            'price': [_to_json_number(self.price[pos]) for pos in positions],
+            'change': [_to_json_number(self.change[pos]) for pos in positions]
+        }
+
+
+def register_quote_stream(server, publisher, route='/stream/quotes', heartbeat_seconds=15):
+    """
+    在 Flask server (Dash app.server) 上註冊 Server-Sent Events 路由
+
+    Args:
+        server (flask.Flask): Dash 的 app.server
+        publisher (QuoteDeltaPublisher): 報價發布者
+        route (str): SSE 路徑
+        heartbeat_seconds (float): 沒有新報價時多久送一次 heartbeat (避免 proxy 斷線)
+    """
+    def quote_stream():
+        # 瀏覽器自動重連時會帶 Last-Event-ID，從該版本接續
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+        since_version = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+        def generate():
+            version = since_version
+            while True:
+                events = publisher.wait_for_events(version, heartbeat_seconds)
+                if not events:
+                    yield ": heartbeat\n\n"
+                    continue
+                for event in events:
+                    version = event['version']
+                    yield f"id: {version}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    server.add_url_rule(route, 'quote_stream', quote_stream)
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import tempfile
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# header (int64): [seqlock 計數, 版本, 股票數, 通知開關]，接著 float64 的更新時間
+HEADER_INTS = 4
+HEADER_BYTES = HEADER_INTS * 8 + 8
+SEQ, VERSION, N_STOCKS, NOTIFICATIONS = range(HEADER_INTS)
+
+
+def universe_key(stock_ids):
+    """依股票清單產生識別碼，股票清單不同的程序不會共用同一塊記憶體"""
+    return hashlib.md5(','.join(stock_ids).encode('utf-8')).hexdigest()[:12]
+
+
+def _attach_shared_memory(name, size):
+    """
+    建立或連接到指定名稱的共享記憶體
+
+    Returns:
+        tuple: (SharedMemory, created)
+    """
+    try:
+        shm, created = shared_memory.SharedMemory(name=name, create=True, size=size), True
+    except FileExistsError:
+        shm, created = shared_memory.SharedMemory(name=name, create=False), False
+
+    # Python 3.13 以前 resource_tracker 會在建立 (或連接) 的程序結束時刪除共享記憶體，
+    # leader 重啟時其他 worker 會留在已刪除的那一塊，所以改為不自動刪除 (大小只有數 KB)
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm, created
+
+
+class SharedQuoteSnapshot:
+    """
+    跨程序共用的即時報價快照 (固定格式: header + 即時價陣列 + 漲跌幅陣列)
+
+    - 只有一個程序 (leader) 寫入，其他程序讀取
+    - 以 seqlock 保證讀到完整的快照: 寫入前後各把計數加一，讀取時計數為奇數或前後不同就重讀
+    - 版本在每次寫入時加一，讀取端只在版本改變時才需要處理
+    """
+
+    def __init__(self, stock_ids, prefix='twstock_heatmap'):
+        """
+        Args:
+            stock_ids (list): 股票代號 (所有程序必須相同)
+            prefix (str): 共享記憶體名稱前綴
+        """
+        self.stock_ids = list(stock_ids)
+        self.name = f"{prefix}_{universe_key(self.stock_ids)}"
+        n_stocks = len(self.stock_ids)
+        size = HEADER_BYTES + 2 * n_stocks * 8
+
+        self._shm, created = _attach_shared_memory(self.name, size)
+        buffer = self._shm.buf
+        self._header = np.ndarray((HEADER_INTS,), dtype=np.int64, buffer=buffer)
+        self._timestamp = np.ndarray((1,), dtype=np.float64, buffer=buffer, offset=HEADER_INTS * 8)
+        self._price = np.ndarray((n_stocks,), dtype=np.float64, buffer=buffer, offset=HEADER_BYTES)
+        self._change = np.ndarray((n_stocks,), dtype=np.float64, buffer=buffer, offset=HEADER_BYTES + n_stocks * 8)
+
+        if created:
+            self._header[:] = 0
+            self._header[N_STOCKS] = n_stocks
+            self._timestamp[0] = np.nan
+            self._price[:] = np.nan
+            self._change[:] = np.nan
+
+    @property
+    def version(self):
+        return int(self._header[VERSION])
+
+    def write(self, price, change, timestamp=None):
+        """
+        寫入新的快照 (只能由 leader 呼叫)
+
+        Returns:
+            int: 寫入後的版本
+        """
+        self._header[SEQ] += 1  # 奇數: 寫入中
+        self._price[:] = price
+        self._change[:] = change
+        self._timestamp[0] = time.time() if timestamp is None else timestamp
+        self._header[VERSION] += 1
+        self._header[SEQ] += 1  # 偶數: 寫入完成
+        return int(self._header[VERSION])
+
+    def read(self, max_retries=100):
+        """
+        讀取完整的快照
+
+        Returns:
+            tuple: (version, timestamp, price, change)，price / change 為複本
+        """
+        for _ in range(max_retries):
+            seq_before = int(self._header[SEQ])
+            if seq_before % 2:
+                time.sleep(0)
+                continue
+            version = int(self._header[VERSION])
+            timestamp = float(self._timestamp[0])
+            price = self._price.copy()
+            change = self._change.copy()
+            if int(self._header[SEQ]) == seq_before:
+                return version, timestamp, price, change
+        raise RuntimeError(f"讀取共享報價快照 {self.name} 失敗 (持續寫入中)")
+
+    @property
+    def notifications_enabled(self):
+        """所有程序共用的 Discord 通知開關 (由任一程序的 callback 設定，leader 讀取)"""
+        return bool(self._header[NOTIFICATIONS])
+
+    @notifications_enabled.setter
+    def notifications_enabled(self, enabled):
+        self._header[NOTIFICATIONS] = 1 if enabled else 0
+
+    def close(self):
+        self._shm.close()
+
+
+class LeaderLock:
+    """
+    以檔案鎖選出唯一的 leader 程序 (負責輪詢報價與發送通知)
+
+    leader 結束時作業系統會釋放檔案鎖，其他程序下次 try_acquire() 即可接手
+    """
+
+    def __init__(self, name, lock_dir=None):
+        """
+        Args:
+            name (str): 鎖的名稱 (相同名稱的程序互相競爭)
+            lock_dir (str): 鎖檔資料夾，預設為系統暫存資料夾
+        """
+        self.path = os.path.join(lock_dir or tempfile.gettempdir(), f"{name}.lock")
+        self._file = None
+
+    @property
+    def is_leader(self):
+        return self._file is not None
+
+    def try_acquire(self):
+        """
+        嘗試成為 leader (不阻塞)
+
+        Returns:
+            bool: 是否為 leader
+        """
+        if self._file is not None:
+            return True
+
+        lock_file = open(self.path, 'a+b')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        self._file = lock_file
+        print(f"程序 {os.getpid()} 成為報價 leader ({self.path})")
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
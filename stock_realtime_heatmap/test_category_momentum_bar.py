@@ -261,13 +261,9 @@ def create_dashboard_app():
     
     # 初始參數
     initial_days = 15
-    date_files = get_section_category_momentum_data("../raw_stock_data/daily/tpex", initial_days)
-    stocks_info = get_unique_stocks(category_data)
-    
     twse_path = "../raw_stock_data/daily/twse"
     tpex_path = "../raw_stock_data/daily/tpex"
-    momentum_data = collect_stock_momentum(twse_path, tpex_path, date_files, stocks_info)
-    category_momentum = calculate_category_momentum(category_data, momentum_data)
+    date_files, momentum_data, category_momentum = get_category_momentum(twse_path, tpex_path, category_data, initial_days)
     
     app.layout = html.Div([
         html.H1('股票類別動量分析儀表板', style={'textAlign': 'center', 'marginBottom': 20}),
@@ -405,13 +401,9 @@ def create_dashboard_app():
             with open('my_stock_category.json', 'r', encoding='utf-8') as f:
                 category_data = json.load(f)
             
-            date_files = get_section_category_momentum_data("../raw_stock_data/daily/tpex", days)
-            stocks_info = get_unique_stocks(category_data)
-            
             twse_path = "../raw_stock_data/daily/twse"
             tpex_path = "../raw_stock_data/daily/tpex"
-            new_momentum_data = collect_stock_momentum(twse_path, tpex_path, date_files, stocks_info)
-            new_category_momentum = calculate_category_momentum(category_data, new_momentum_data)
+            date_files, new_momentum_data, new_category_momentum = get_category_momentum(twse_path, tpex_path, category_data, days)
             
             # 更新全域變數 (用於其他回調函數)
             app.server.config['current_category_momentum'] = new_category_momentum
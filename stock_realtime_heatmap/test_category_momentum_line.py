@@ -38,8 +38,8 @@ def plot_momentum_trends(category_momentum, dates, momentum_data):
     category_avg_momentum = []
     for category, data in category_momentum.items():
         avg_momentum = sum(data['avg_momentum']) / len(data['avg_momentum'])
-        # 反轉漲幅列表，使最新的資料在右側
-        data['avg_momentum'] = data['avg_momentum'][::-1]
+        # 建立副本並反轉漲幅列表，使最新的資料在右側 (原資料為快取共用物件)
+        data = {**data, 'avg_momentum': data['avg_momentum'][::-1]}
         category_avg_momentum.append((category, avg_momentum, data))
     
     # 依照平均漲幅從高到低排序
@@ -144,18 +144,10 @@ if __name__ == '__main__':
     with open('my_stock_category.json', 'r', encoding='utf-8') as f:
         category_data = json.load(f)
 
-    # 取得日期檔案列表
-    date_files = get_section_category_momentum_data("../raw_stock_data/daily/tpex" , 10)  # 取得最近10天的資料
-    
-    stocks_info = get_unique_stocks(category_data)
-
-    # 收集漲幅資訊
+    # 收集最近10天的漲幅資訊並計算類別平均漲幅 (與儀表板共用同一套計算)
     twse_path = "../raw_stock_data/daily/twse"
     tpex_path = "../raw_stock_data/daily/tpex"
-    momentum_data = collect_stock_momentum(twse_path, tpex_path, date_files, stocks_info)
-
-    # 計算類別平均漲幅
-    category_momentum = calculate_category_momentum(category_data, momentum_data)
+    date_files, momentum_data, category_momentum = get_category_momentum(twse_path, tpex_path, category_data, 10)
     # 印出結果
     # for category, data in category_momentum.items():
     #     print(f"\n類別: {category} (共 {data['stock_count']} 支股票)")
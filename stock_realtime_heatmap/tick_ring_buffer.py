@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+# 每個時間點儲存的欄位與型別 (依此順序寫入 log)
+TICK_FIELDS = (
+    ('price', np.float32),        # 成交價 (無成交時為 get_current_price_from_realtime 的替代價)
+    ('acc_volume', np.float64),   # 累積成交量
+    ('best_bid', np.float32),     # 買價一檔
+    ('best_ask', np.float32),     # 賣價一檔
+)
+
+
+class IntradayTickBuffer:
+    """
+    盤中即時報價的環狀緩衝區 (時間點 × 股票)
+
+    - 記憶體固定: capacity 個時間點，每個欄位一個 numpy 陣列，超過容量時覆寫最舊的資料
+    - 每筆快照先放在記憶體，每 flush_interval 秒以 append-only 方式寫入當天的 log 檔
+    - 重新啟動時從 log 讀回當天資料 (股票清單相同時)
+
+    log 檔格式: 第一行為 JSON header (股票清單、欄位)，之後每筆快照為固定長度的 binary record
+    (timestamp float64 + 各欄位 n_stocks 個數值)
+    """
+
+    def __init__(self, stock_ids, capacity=4096, log_dir='./cache/ticks', flush_interval=30, date=None):
+        """
+        Args:
+            stock_ids (list): 股票代號清單 (欄位順序)
+            capacity (int): 最多保留的時間點數 (5 秒更新一次時 4096 點可涵蓋整個交易日)
+            log_dir (str): log 檔資料夾，None 表示不寫入磁碟
+            flush_interval (float): 寫入 log 的間隔秒數
+            date (str): 交易日 'YYYYMMDD'，None 表示今天
+        """
+        self.stock_ids = list(stock_ids)
+        self.stock_pos = {stock_id: i for i, stock_id in enumerate(self.stock_ids)}
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.date = date or datetime.now().strftime('%Y%m%d')
+
+        n_stocks = len(self.stock_ids)
+        self.timestamps = np.full(capacity, np.nan)
+        self.fields = {name: np.full((capacity, n_stocks), np.nan, dtype=dtype) for name, dtype in TICK_FIELDS}
+        self.count = 0  # 累計寫入的快照數 (含已被覆寫的)
+
+        self._record_dtype = np.dtype(
+            [('timestamp', np.float64)] + [(name, dtype, (n_stocks,)) for name, dtype in TICK_FIELDS]
+        )
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+        self.log_path = None
+        if log_dir is not None:
+            # 股票清單改變時使用不同的 log 檔，避免欄位錯位
+            universe_hash = hashlib.md5(','.join(self.stock_ids).encode('utf-8')).hexdigest()[:8]
+            self.log_path = os.path.join(log_dir, f"ticks_{self.date}_{universe_hash}.bin")
+            self._load_log()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, timestamp, **values):
+        """
+        加入一筆快照
+
+        Args:
+            timestamp (float): 快照時間 (time.time())
+            **values: 各欄位的陣列 (依 stock_ids 順序)，未提供的欄位為 NaN
+        """
+        slot = self.count % self.capacity
+        self.timestamps[slot] = timestamp
+        for name, _ in TICK_FIELDS:
+            if name in values:
+                self.fields[name][slot] = values[name]
+            else:
+                self.fields[name][slot] = np.nan
+        self.count += 1
+
+        if self.log_path is not None:
+            self._pending.append(slot)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        """把尚未寫入的快照 append 到 log 檔"""
+        if self.log_path is None or not self._pending:
+            return
+
+        # 等待寫入期間被覆寫的 slot 已無法取得，只寫入仍在緩衝區內的部分
+        pending = self._pending[-self.capacity:]
+        records = np.empty(len(pending), dtype=self._record_dtype)
+        records['timestamp'] = self.timestamps[pending]
+        for name, _ in TICK_FIELDS:
+            records[name] = self.fields[name][pending]
+
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+            is_new = not os.path.exists(self.log_path)
+            with open(self.log_path, 'ab') as f:
+                if is_new:
+                    f.write(self._header_bytes())
+                f.write(records.tobytes())
+            self._pending = []
+        except OSError as e:
+            print(f"寫入即時報價 log {self.log_path} 失敗：{e}")
+        self._last_flush = time.monotonic()
+
+    def window(self, last_n=None):
+        """
+        依時間順序取得緩衝區內的快照 (複製)
+
+        Args:
+            last_n (int): 只取最後 n 筆，None 表示全部
+
+        Returns:
+            tuple: (timestamps, fields)，fields 為 {欄位: (時間點, 股票) 陣列}
+        """
+        n = len(self)
+        if last_n is not None:
+            n = min(n, last_n)
+        order = (np.arange(self.count - n, self.count) % self.capacity) if n else np.empty(0, dtype=np.intp)
+        return self.timestamps[order], {name: array[order] for name, array in self.fields.items()}
+
+    def series(self, stock_id, field='price', last_n=None):
+        """
+        取得單一股票某欄位的時間序列
+
+        Returns:
+            tuple: (timestamps, values)，股票不在清單中時回傳兩個空陣列
+        """
+        pos = self.stock_pos.get(stock_id)
+        if pos is None:
+            return np.empty(0), np.empty(0)
+        timestamps, fields = self.window(last_n)
+        return timestamps, fields[field][:, pos]
+
+    def latest(self):
+        """
+        取得最新一筆快照
+
+        Returns:
+            tuple: (timestamp, {欄位: 依 stock_ids 順序的陣列})，沒有資料時回傳 (None, {})
+        """
+        if self.count == 0:
+            return None, {}
+        slot = (self.count - 1) % self.capacity
+        return self.timestamps[slot], {name: array[slot].copy() for name, array in self.fields.items()}
+
+    def _header_bytes(self):
+        header = {
+            'date': self.date,
+            'stock_ids': self.stock_ids,
+            'fields': [[name, np.dtype(dtype).str] for name, dtype in TICK_FIELDS]
+        }
+        return (json.dumps(header, ensure_ascii=False) + '\n').encode('utf-8')
+
+    def _load_log(self):
+        """從當天 log 檔讀回最後 capacity 筆快照"""
+        if not os.path.exists(self.log_path):
+            return
+
+        try:
+            with open(self.log_path, 'rb') as f:
+                header_line = f.readline()
+                header = json.loads(header_line.decode('utf-8'))
+                if header.get('stock_ids') != self.stock_ids:
+                    print(f"即時報價 log {self.log_path} 股票清單不符，略過")
+                    return
+                raw = f.read()
+
+            # 最後一筆可能因中途結束而不完整，截掉以免之後 append 的資料錯位
+            n_records = len(raw) // self._record_dtype.itemsize
+            valid_size = len(header_line) + n_records * self._record_dtype.itemsize
+            if valid_size != len(header_line) + len(raw):
+                os.truncate(self.log_path, valid_size)
+        except (OSError, ValueError) as e:
+            print(f"讀取即時報價 log {self.log_path} 失敗：{e}")
+            return
+
+        records = np.frombuffer(raw, dtype=self._record_dtype, count=n_records)[-self.capacity:]
+
+        n = len(records)
+        self.timestamps[:n] = records['timestamp']
+        for name, _ in TICK_FIELDS:
+            self.fields[name][:n] = records[name]
+        self.count = n
+        print(f"從 {self.log_path} 載入 {n} 筆即時報價快照")
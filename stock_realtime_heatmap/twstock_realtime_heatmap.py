@@ -1,16 +1,14 @@
 import dash
-from dash import dcc, html
+from dash import dcc, html, callback
 from dash.dependencies import Input, Output, State, ALL
 from dash.exceptions import PreventUpdate
 import plotly.express as px
 import pandas as pd
 import json
-import twstock
 from datetime import datetime
 import requests
 import os
 import time
-import plotly.io as pio
 import dash_daq as daq
 from test_esun_api import *  # 導入所有 API 函數
 from pprint import pprint
@@ -18,21 +16,69 @@ from utility_function import *  # 導入 utility 函數
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 import math
+import numpy as np
+from notification_dispatcher import DiscordNotificationDispatcher
+from category_alert_engine import CategoryAlertEngine
+from tick_ring_buffer import IntradayTickBuffer
+from category_index_engine import CategoryIndexEngine
+from quote_push import QuoteDeltaPublisher, register_quote_stream
+from shared_quote_snapshot import SharedQuoteSnapshot, LeaderLock
+from quote_cache import QuoteCache, quote_from_twstock, best_quote_price
+from order_engine import BasketOrderEngine
+import threading
+import atexit
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from quote_source import create_quote_source
 
 # Global variables
 g_const_debug_print = True
 
-g_notified_status = {}
-g_last_notification_time = {}
 g_stock_category = []
 g_category_json = {}
-g_past_json_data_twse = {}
-g_past_json_data_tpex = {}
-g_company_json_data_twse = {}
-g_company_json_data_tpex = {}
+g_stock_meta_index = {} # 股票代號 -> 基本資料索引 (load_stock_meta_index)
 g_track_stock_realtime_data = {}
+g_category_index = {} # 類別 -> 股票展開索引 (build_category_index)
+g_initial_stocks_df = pd.DataFrame()
+g_suspension_checked = False # 啟動時暫停交易檢查是否成功
 g_login_success = False # 登入狀態 flag
 g_first_open_momentum_chart = True
+g_notification_dispatcher = DiscordNotificationDispatcher() # 背景發送 Discord 通知
+g_category_alert_engine = CategoryAlertEngine() # 類別漲跌幅通知狀態機
+g_tick_buffer = None # 盤中即時報價環狀緩衝區 (IntradayTickBuffer)
+g_tick_lock = threading.RLock() # 多個 callback 同時寫入緩衝區時的保護
+g_last_tick_time = None # 最後一筆寫入緩衝區的報價時間，同一次報價更新只記錄一次
+g_category_index_engine = CategoryIndexEngine() # 盤中類別指數 (市值加權 / 等權重)
+g_push_mode = False # True: 背景 thread 輪詢報價並以 SSE 推送差異，停用 dcc.Interval 輪詢
+g_push_state = {'thread': None, 'notifications_enabled': False}
+g_quote_publisher = QuoteDeltaPublisher() # 最新報價快照與差異
+g_shared_mode = False # True: 多程序部署，報價快照放在共享記憶體，只有 leader 程序輪詢報價
+g_shared_snapshot = None # SharedQuoteSnapshot
+g_leader_lock = None # LeaderLock
+g_alert_state_path = None # 共享快照模式下 leader 讀寫的類別通知狀態檔 (leader 換手時由新的 leader 讀回)
+g_quote_source = None # 即時報價來源 (get_quote_source)
+g_quote_source_retry_at = None # 尚未登入玉山行情 API 時暫用 twstock，到此時間 (time.monotonic()) 再檢查是否已登入
+ESUN_LOGIN_RETRY_SECONDS = 60
+g_basket_order_engine = BasketOrderEngine(esun_send_order) # 背景限速送出下單面板的委託
+g_quote_cache = QuoteCache(max_workers=40) # 下單面板的短時間報價快取 (股票, 整股/零股)，20 檔群組的整股+零股可一次查完
+
+# 啟動資料來源檔案 (任一檔案 mtime 改變時啟動快照失效)
+STARTUP_SOURCE_PATHS = {
+    'category': './my_stock_category.json',
+    'twse_t1': '../raw_stock_data/daily/twse/T1_Day.json',
+    'tpex_t1': '../raw_stock_data/daily/tpex/T1_Day.json',
+    'twse_t2': '../raw_stock_data/daily/twse/T2_Day.json', #注意變更
+    'tpex_t2': '../raw_stock_data/daily/tpex/T2_Day.json', #注意變更
+    'twse_company': './comp_data/t187ap03_L.json',
+    'tpex_company': './comp_data/mopsfin_t187ap03_O.json',
+    'suspend_trading': '../raw_stock_data/suspend_trading.json' # genSuspendtrading 產生的暫停交易事件檔
+}
+STARTUP_SNAPSHOT_PATH = './cache/startup_snapshot.pkl'
+STOCK_META_INDEX_PATH = './cache/stock_meta_index.json'
+QUOTE_STREAM_ROUTE = '/stream/quotes' # push 模式的 SSE 路徑
+QUOTE_PUSH_INTERVAL_SECONDS = 5 # push 模式輪詢報價的間隔
+SHARED_SNAPSHOT_SYNC_SECONDS = 0.5 # 非 leader 程序檢查共享快照版本的間隔
+TICK_LOG_DIR = './cache/ticks' # 盤中即時報價 log (重啟時讀回當天資料)
 
 # 從即時資料中取得當前價格
 def get_current_price_from_realtime(realtime_data):
@@ -87,14 +133,9 @@ def get_current_price_from_realtime(realtime_data):
 
 # 函數來獲取股票名稱
 def get_stock_name(stock_no):
-    # 先找 TWSE
-    global g_past_json_data_twse, g_past_json_data_tpex
-
-    if g_past_json_data_twse.get('data', {}).get(stock_no):
-        return g_past_json_data_twse['data'][stock_no][1]
-    # 再找 TPEX
-    elif g_past_json_data_tpex.get('data', {}).get(stock_no):
-        return g_past_json_data_tpex['data'][stock_no][1]
+    stock_meta = g_stock_meta_index.get(stock_no)
+    if stock_meta:
+        return stock_meta['stock_name']
     else:
         return stock_no  # 如果找不到名稱，就顯示股票代號
             
@@ -353,14 +394,10 @@ def create_momentum_dashboard(days=15, grid_size="2x2", page=1):
         page (int): 頁數
     """
     try:
-        # 獲取數據
-        date_files = get_section_category_momentum_data("../raw_stock_data/daily/tpex", days)
-        stocks_info = get_unique_stocks(g_category_json)
-        
+        # 獲取數據 (快取，只有日期檔案或類別變動時才重新計算)
         twse_path = "../raw_stock_data/daily/twse"
         tpex_path = "../raw_stock_data/daily/tpex"
-        momentum_data = collect_stock_momentum(twse_path, tpex_path, date_files, stocks_info)
-        category_momentum = calculate_category_momentum(g_category_json, momentum_data)
+        date_files, momentum_data, category_momentum = get_category_momentum(twse_path, tpex_path, g_category_json, days)
         
         # 根據網格大小決定右側佈局
         grid_configs = {
@@ -587,12 +624,14 @@ def create_momentum_dashboard(days=15, grid_size="2x2", page=1):
         )
         return fig, f"更新失敗: {str(e)}"
 
-def send_discord_category_notification(display_df, fig):
-    """發送股票群組漲跌幅資訊到 Discord"""
-    global g_notified_status, g_last_notification_time, g_const_debug_print
-    
-    COOLDOWN_SECONDS = 60  # 1分鐘冷卻
-    BUFFER_THRESHOLD = 0.8  # 緩衝區 0.8%
+def send_discord_category_notification(realtime_change, fig):
+    """
+    發送股票群組漲跌幅資訊到 Discord
+
+    Args:
+        realtime_change (np.ndarray): 依 g_category_index['stock_ids'] 順序排列的即時漲跌幅
+        fig (plotly.graph_objects.Figure): 要附上的熱力圖，也可以是只在需要通知時才呼叫的建圖函式
+    """
     print(f"[DEBUG] Current time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
@@ -601,240 +640,33 @@ def send_discord_category_notification(display_df, fig):
         if not webhook_url:
             print("Discord webhook URL not found. Skipping notification.")
             return
-    
-        # 計算各類別平均漲跌幅與數量
-        category_stats = display_df.groupby('category')['realtime_change'].agg(['mean', 'count']).round(2)
-        category_stats = category_stats.sort_values('mean', ascending=False)
-        # print("Category stats calculated:", category_stats)
-        
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        current_timestamp = time.time()
-        
-        embed = {
-            "title": f"📊 台股產業類股漲跌幅 - {current_time}",
-            "color": 0x00ff00,
-            "description": "",  # 使用 description 而不是 fields
-            "type": "rich"
-        }
-        text = ""
-
-        # 在 send_discord_category_notification 中加入顏色控制
-        for cat, row in category_stats.iterrows():
-            mean = row['mean']
-            cnt = int(row['count'])
-
-            # 設定顏色
-            if cat in ['上市大盤', '上櫃大盤']:
-                color_code = '\033[37m'  # 白色
-            elif mean > 0:
-                color_code = '\033[31m'  # 紅色
-            else:
-                color_code = '\033[32m'  # 綠色
-
-            # 檢查冷卻時間
-            if cat in g_last_notification_time:
-                cooling_time = current_timestamp - g_last_notification_time[cat]
-                if cooling_time < COOLDOWN_SECONDS:
-                    previous_data = g_notified_status.get(cat, {"status": "neutral", "last_mean": 0})
-                    previous_mean = previous_data["last_mean"]
-                    print(f"{color_code}[DEBUG] Cooldown {round(cooling_time , 0)} sec {cat}: mean={mean} , last_mean={previous_mean}\033[0m")
-                    continue
-            
-            # 獲取前次數據
-            previous_data = g_notified_status.get(cat, {"status": "neutral", "last_mean": 0})
-            previous_status = previous_data["status"]
-            previous_mean = previous_data["last_mean"]
-            
-            # 緩衝區檢查
-            if abs(mean - previous_mean) < BUFFER_THRESHOLD:
-                if g_const_debug_print:
-                    print(f"{color_code}[DEBUG] Not significant change {cat}: mean={mean} , last_mean={previous_mean}\033[0m")
-                continue
-
-            # 判斷是否需要通知
-            if -3.5 < mean < 3.5:
-                if g_const_debug_print:
-                    print(f"{color_code}[DEBUG] Neutral category {cat}: mean={mean} , last_mean={previous_mean}\033[0m")
-                # g_notified_status[cat] = {"status": "neutral", "last_mean": mean} -> 不要加，會導致緩衝區無法在界線即時通報
-                continue
 
-            # 判斷狀態變化
-            if mean >= 6.5:
-                current_status = "high_positive"
-                emoji = "🚀🚀"
-            elif mean >= 3.5:
-                current_status = "positive"
-                emoji = "🚀"
-            elif mean <= -6.5:
-                current_status = "high_negative"
-                emoji = "💥💥"
-            elif mean <= -3.5:
-                current_status = "negative"
-                emoji = "💥"
-            else:
-                current_status = "neutral"
-
-            if g_const_debug_print:
-                print(f"{color_code}[DEBUG] Notification check {cat}: mean={mean} , {previous_mean} , status={current_status}\033[0m")
-
-            # 僅在狀態變化時通知
-            if current_status != previous_status:
-                # 收集族群內的股票及漲幅資訊
-                stock_details = display_df[display_df['category'] == cat][['stock_name', 'stock_type', 'stock_id', 'realtime_change']]
-                stock_info = []
-                
-                for _, row in stock_details.iterrows():
-                    # 根據股票類型產生相對應的 TradingView 連結
-                    market_prefix = 'TWSE' if row['stock_type'] == 'TWSE' else 'TPEX'
-                    tv_link = f"https://tw.tradingview.com/chart/?symbol={market_prefix}%3A{row['stock_id']}"
-                    # 使用 Discord 的 Markdown 格式創建超連結，將股票名稱直接作為連結
-                    stock_line = f"[{row['stock_name']} ({row['stock_id']})]({tv_link}) ({row['realtime_change']:+.2f}%)"
-                    stock_info.append(stock_line)
-
-                stock_info_text = "\n".join(stock_info)
-                text += f"{emoji} **{cat}** ({cnt}檔): {mean:+.2f}%\n{stock_info_text}\n"
-
-                # 更新記錄
-                g_notified_status[cat] = {"status": current_status, "last_mean": mean}
-                g_last_notification_time[cat] = current_timestamp
-            # else:
-                # 更新漲幅記錄但不通知
-                # g_notified_status[cat]["last_mean"] = mean -> 不要加，會導致緩衝區無法在界線即時通報
+        # 一次判斷所有類別的狀態變化 (冷卻時間、緩衝區、門檻)
+        alerts = g_category_alert_engine.evaluate(realtime_change)
+        if alerts and g_alert_state_path is not None:
+            g_category_alert_engine.save_state(g_alert_state_path)
+        if g_const_debug_print:
+            for alert in alerts:
+                print(f"[DEBUG] Notification {alert['category']}: mean={alert['mean']} , status={alert['status']}")
 
+        text = g_category_alert_engine.format_alerts(alerts, realtime_change)
         if text:
-            embed['description'] = text  # 直接將內容放入 description
-            payload = {"embeds": [embed]}
-            resp = requests.post(webhook_url, json=payload)
-            
-            if resp.status_code == 204:
-                print("Discord notification sent successfully!")
-
-                # 發送圖片和文字
-                heatmap_image_path = "heatmap.png"
-                pio.write_image(fig, heatmap_image_path, format="png", width=1920, height=1080)
-
-                with open(heatmap_image_path, "rb") as f:
-                    files = {"file": f}
-                    resp = requests.post(webhook_url, files=files)
-                if resp.status_code == 200:
-                    print("Discord heatmap image sent successfully!")
-                else:
-                    print(f"Failed to send Discord heatmap image. Status code: {resp.status_code}, Response: {resp.text}")
-            else:
-                print(f"Failed to send Discord notification. Status code: {resp.status_code}, Response: {resp.text}")
+            if callable(fig):
+                fig = fig()
+            # 交給背景 dispatcher 發送 (合併短時間內的通知、於記憶體中產生熱力圖)
+            g_notification_dispatcher.enqueue(webhook_url, text, fig)
                 
     except Exception as e:
         print(f"Error sending Discord notification: {e}")
 
-def get_stock_info(past_json_data_twse, past_json_data_tpex, company_json_data_twse, company_json_data_tpex, target_code):
-    
-    if True:
-        if past_json_data_twse['data'].get(target_code) != None:
-            issue_shares = 0
-            for company_record in company_json_data_twse:
-                if target_code == '0050':
-                    issue_shares = 13234500000
-                    break
-                elif target_code == '0051':
-                    issue_shares = 26000000
-                    break
-                if company_record['公司代號'] == target_code:
-                    issue_shares = company_record['已發行普通股數或TDR原股發行股數']
-                    break  # 找到後立即跳出迴圈
-
-            last_close_price = float(past_json_data_twse['data'][target_code][2])
-            if  last_close_price == 0:
-                try:
-                    t2_day_path = '../raw_stock_data/daily/twse/T2_Day.json' #注意變更
-                    with open(t2_day_path, 'r', encoding='utf-8') as f:
-                        t2_day_json = json.load(f)
-                    if t2_day_json['data'].get(target_code) is not None:
-                        last_close_price = float(t2_day_json['data'][target_code][2])
-                        print(f"已從 T2_Day.json 重新取得 {target_code} 收盤價：{t2_day_json['data'][target_code][2]}")
-                except Exception as e:
-                    print(f"讀取 T2_Day.json 失敗：{e}")
-            
-            return {
-                'last_close_price': last_close_price, #上市股票收盤價
-                'stock_name': past_json_data_twse['data'][target_code][1], #上市股票顯示名稱
-                'stock_type': 'TWSE',
-                'issue_shares': float(issue_shares)
-            }
-        
-        elif past_json_data_tpex['data'].get(target_code) != None:
-            issue_shares = 0
-            for company_record in company_json_data_tpex:
-                if target_code == '006201':
-                    issue_shares = 18946000000 # 18946000 -> 18946000000 不然顯示不出來
-                    break
-                if company_record['SecuritiesCompanyCode'] == target_code:
-                    issue_shares = company_record['IssueShares']
-                    break
-                
-            last_close_price = float(past_json_data_tpex['data'][target_code][2])
-            if  last_close_price == 0:
-                try:
-                    t2_day_path = '../raw_stock_data/daily/tpex/T2_Day.json' #注意變更
-                    with open(t2_day_path, 'r', encoding='utf-8') as f:
-                        t2_day_json = json.load(f)
-                    if t2_day_json['data'].get(target_code) is not None:
-                        last_close_price = float(t2_day_json['data'][target_code][2])
-                        print(f"已從 T2_Day.json 重新取得 {target_code} 收盤價：{t2_day_json['data'][target_code][2]}")
-                except Exception as e:
-                    print(f"讀取 T2_Day.json 失敗：{e}")
-            return {
-                'last_close_price': last_close_price,  #上櫃股票收盤價
-                'stock_name': past_json_data_tpex['data'][target_code][1], #上櫃股票顯示名稱
-                'stock_type': 'TPEx',
-                'issue_shares': float(issue_shares)
-                }
-        
+def get_stock_info(stock_meta_index, target_code):
+    """根據股票代號從基本資料索引取得收盤價、名稱、市場別與發行股數"""
+    stock_meta = stock_meta_index.get(target_code)
+    if stock_meta is None:
         print(f"找不到股票代號：{target_code}")
         return None  # 如果找不到，回傳 None
 
-    else:
-        """根據 Code 找到 ClosingPrice 和 Name"""
-        # 先搜尋證交所資料
-        for record in past_json_data_twse:
-            if record['Code'] == target_code:
-                issue_shares = 0
-                for company_record in company_json_data_twse:
-                    if target_code == '0050':
-                        issue_shares = 13234500000
-                        break
-                    elif target_code == '0051':
-                        issue_shares = 26000000
-                        break
-                    if company_record['公司代號'] == target_code:
-                        issue_shares = company_record['已發行普通股數或TDR原股發行股數']
-                        break  # 找到後立即跳出迴圈
-                return {
-                    'last_close_price': record['ClosingPrice'],
-                    'stock_name': record['Name'], 
-                    'stock_type': 'TWSE',
-                    'issue_shares': float(issue_shares)
-                }
-
-        # 如果在證交所找不到，再搜尋上櫃資料
-        for record in past_json_data_tpex:
-            if record['SecuritiesCompanyCode'] == target_code:
-                issue_shares = 0
-                for company_record in company_json_data_tpex:
-                    if target_code == '006201':
-                        issue_shares = 18946000000 # 18946000 -> 18946000000 不然顯示不出來
-                        break
-                    if company_record['SecuritiesCompanyCode'] == target_code:
-                        issue_shares = company_record['IssueShares']
-                        break
-                return {
-                    'last_close_price': record['Close'],
-                    'stock_name': record['CompanyName'], #上櫃股票顯示名稱
-                    'stock_type': 'TPEx',
-                    'issue_shares': float(issue_shares)
-                }
-            
-        print(f"找不到股票代號：{target_code}")
-        return None  # 如果找不到，回傳 None
+    return dict(stock_meta)
 
 def downlod_stock_company_data():
     
@@ -908,43 +740,35 @@ def downlod_stock_data():
 
 def remove_suspended_stocks(g_category_json):
     """
-    讀取所有股票即時資料，若無 best_bid_price 與 best_ask_price 則判定暫停交易並移除
+    移除今日暫停交易的股票 (優先使用 suspend_trading.json 事件檔，事件檔不是當天產生時才以即時報價判斷)
+
+    Returns:
+        bool: 暫停交易判斷是否可靠 (事件檔有效或即時資料全部取得成功)
     """
-    # 收集所有 stock_id
-    all_stock_ids = []
-    for category, stocks_info in g_category_json['台股'].items():
-        for stock_id in stocks_info.keys():
-            all_stock_ids.append(stock_id)
-
-    # 分成兩批取得即時資料
-    realtime_data = {}
-    mid = len(all_stock_ids) // 2
-    batch_ids_1 = all_stock_ids[:mid]
-    batch_ids_2 = all_stock_ids[mid:]
-    try:
-        batch_data_1 = twstock.realtime.get(batch_ids_1)
-        batch_data_2 = twstock.realtime.get(batch_ids_2)
-        realtime_data.update(batch_data_1)
-        realtime_data.update(batch_data_2)
-    except Exception as e:
-        print(f"取得即時資料失敗: {e}")
+    # 收集所有 stock_id (重複出現在多個類別的股票只判斷一次)
+    all_stock_ids = {
+        stock_id
+        for stocks_info in g_category_json['台股'].values()
+        for stock_id in stocks_info.keys()
+    }
 
-    # 檢查並移除暫停交易的股票
+    today = datetime.now().strftime('%Y-%m-%d')
+    suspended, checked = resolve_suspended_stocks(all_stock_ids, STARTUP_SOURCE_PATHS['suspend_trading'], today,
+                                                  get_quotes=get_quote_source().get)
+
+    # 移除暫停交易的股票
     removed_stocks = []
     for category in list(g_category_json['台股'].keys()):
         for stock_id in list(g_category_json['台股'][category].keys()):
-            data = realtime_data.get(stock_id, {})
-            rt = data.get('realtime', {})
-            best_bid = rt.get('best_bid_price')
-            best_ask = rt.get('best_ask_price')
-
-            if (not best_bid or best_bid == ['-']) and (not best_ask or best_ask == ['-']):
+            if stock_id in suspended:
                 stock_name = g_category_json['台股'][category][stock_id].get('股票', '')
                 removed_stocks.append(f"{category}  {stock_id}({stock_name})")
                 del g_category_json['台股'][category][stock_id]
     if removed_stocks:
         print(f"⚠️ 以下股票今日暫停交易，已移除: {removed_stocks}")
 
+    return checked
+
 # 載入初始資料
 def load_initial_data():
     
@@ -952,43 +776,33 @@ def load_initial_data():
     # time.sleep(1)
     # downlod_stock_company_data()
     
-    analysis_json_path = './my_stock_category.json'
     # past_day_json_path_twse = './STOCK_DAY_ALL.json'
     # past_day_json_path_tpex = './tpex_mainboard_daily_close_quotes.json'
-    past_day_json_path_twse = '../raw_stock_data/daily/twse/T1_Day.json'
-    past_day_json_path_tpex = '../raw_stock_data/daily/tpex/T1_Day.json'
-    company_data_json_path_twse = './comp_data/t187ap03_L.json'
-    company_data_json_path_tpex = './comp_data/mopsfin_t187ap03_O.json'
     
-    global g_category_json, g_past_json_data_twse, g_past_json_data_tpex, g_company_json_data_twse, g_company_json_data_tpex
+    global g_category_json, g_stock_meta_index
 
-    with open(analysis_json_path, 'r', encoding='utf-8') as f:
+    with open(STARTUP_SOURCE_PATHS['category'], 'r', encoding='utf-8') as f:
         g_category_json = json.load(f)
-    with open(past_day_json_path_twse, 'r', encoding='utf-8') as f:
-        g_past_json_data_twse = json.load(f)
-    with open(past_day_json_path_tpex, 'r', encoding='utf-8') as f:
-        g_past_json_data_tpex = json.load(f)
-    with open(company_data_json_path_twse, 'r', encoding='utf-8') as f:
-        g_company_json_data_twse = json.load(f)
-    with open(company_data_json_path_tpex, 'r', encoding='utf-8') as f:
-        g_company_json_data_tpex = json.load(f)
+
+    # 股票基本資料索引 (來源檔案未更新時直接讀取已儲存的索引)
+    meta_source_paths = {key: path for key, path in STARTUP_SOURCE_PATHS.items() if key not in ('category', 'suspend_trading')}
+    g_stock_meta_index = load_stock_meta_index(STOCK_META_INDEX_PATH, meta_source_paths)
 
     global g_stock_category
     g_stock_category = list(g_category_json['台股'].keys())  # 提取所有類別名稱
 
-    remove_suspended_stocks(g_category_json)
+    global g_suspension_checked
+    g_suspension_checked = remove_suspended_stocks(g_category_json)
 
     stocks_info_list = {}
     for category, stocks_info in g_category_json['台股'].items():
         for stock_id, stock_info in stocks_info.items():
             
-            last_stock_info = get_stock_info(g_past_json_data_twse, g_past_json_data_tpex, g_company_json_data_twse, g_company_json_data_tpex, stock_id)
+            last_stock_info = get_stock_info(g_stock_meta_index, stock_id)
 
             if last_stock_info != None:
-                if last_stock_info['last_close_price'] == "":
-                    last_stock_price = float('nan')
-                else:
-                    last_stock_price = float(last_stock_info['last_close_price'])
+                # 沒有收盤價時為 NaN (build_stock_meta_index 已轉成 float)
+                last_stock_price = last_stock_info['last_close_price']
                 
                 # 如果股票已存在，則將新的 category 加入到現有的 category 中
                 if stock_id in stocks_info_list:
@@ -1012,27 +826,53 @@ def load_initial_data():
     
     return pd.DataFrame(stocks_info_list)
 
+def get_quote_source():
+    """
+    取得即時報價來源 (環境變數 QUOTE_SOURCE=twstock / esun / sim，預設 twstock)
+
+    esun 需要先登入玉山行情 API，尚未登入時暫時使用 twstock，每 ESUN_LOGIN_RETRY_SECONDS 秒再檢查一次
+    """
+    global g_quote_source, g_quote_source_retry_at
+    if g_quote_source is not None and (g_quote_source_retry_at is None or time.monotonic() < g_quote_source_retry_at):
+        return g_quote_source
+
+    source_name = os.getenv('QUOTE_SOURCE', 'twstock')
+    if source_name == 'esun':
+        import test_esun_api
+        market_sdk = getattr(test_esun_api, 'market_sdk', None)
+        if market_sdk is None:
+            if g_quote_source is None:
+                print("⚠️ 尚未登入玉山行情 API，暫時使用 twstock 報價")
+                g_quote_source = create_quote_source('twstock')
+            g_quote_source_retry_at = time.monotonic() + ESUN_LOGIN_RETRY_SECONDS
+            return g_quote_source
+        g_quote_source_retry_at = None
+        g_quote_source = create_quote_source('esun', rest_stock=market_sdk.rest_client.stock)
+    else:
+        g_quote_source = create_quote_source(source_name)
+    print(f"即時報價來源: {g_quote_source.name}")
+    return g_quote_source
+
 # 更新即時股價資料
 def update_realtime_data(stocks_df):
     
+    global g_track_stock_realtime_data
     try:
-        # 分次讀取即時資料 好像會有上限
-        track_stock_realtime_data_1 = twstock.realtime.get(list(stocks_df.columns[:len(stocks_df.columns)//2]))
-        track_stock_realtime_data_2 = twstock.realtime.get(list(stocks_df.columns[len(stocks_df.columns)//2:]))
-
-        # 合併資料
-        global g_track_stock_realtime_data
-        g_track_stock_realtime_data = {**track_stock_realtime_data_1, **track_stock_realtime_data_2}
+        # 報價來源會自行分批查詢 (twstock 一次查詢的股票數有上限)
+        quotes = get_quote_source().get(list(stocks_df.columns))
     except (KeyError, ValueError):
         print("部分即時資料缺少 timestamp，略過")
-        g_track_stock_realtime_data = {}
+        quotes = {}
+    # 多個瀏覽器的 callback 可能同時執行，之後都使用這次取得的 quotes，不再讀全域變數
+    g_track_stock_realtime_data = quotes
 
     for stock_id in stocks_df.columns:
-        if stock_id in g_track_stock_realtime_data and 'realtime' in g_track_stock_realtime_data[stock_id]:
-            if g_track_stock_realtime_data[stock_id]['success']:
+        if stock_id in quotes and 'realtime' in quotes[stock_id]:
+            if quotes[stock_id]['success']:
                 
-                realtime_data = g_track_stock_realtime_data[stock_id]['realtime']
+                realtime_data = quotes[stock_id]['realtime']
                 current_price = get_current_price_from_realtime(realtime_data)
+                g_quote_cache.put(stock_id, 'LOT', quote_from_twstock(realtime_data))
                 
                 # 只在有有效價格時更新
                 if current_price > 0:
@@ -1047,357 +887,635 @@ def update_realtime_data(stocks_df):
                 print(f"⚠️ stock_id={stock_id} 的 success 為 False")
         else:
             print(f"⚠️ stock_id={stock_id} realtime 資料不存在")
+
+    record_tick_snapshot(stocks_df, quotes)
     
     return stocks_df
 
-# 載入初始股票資料
-global g_initial_stocks_df  # 明確宣告為全域變數
-g_initial_stocks_df = load_initial_data()
-
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
-
-app.layout = html.Div([
-    # 1. Taiwan Stock Realtime Heatmap 大標題 ----------------------------
-    html.H1("Taiwan Stock Realtime Heatmap", 
-            style={'textAlign': 'center', 'marginBottom': 30}),
-
-    # 2. Display Mode ----------------------------
-    html.Div([
-        html.Label('Display Mode：', style={'marginRight': '5px', 'display': 'inline-block'}),
-        dcc.RadioItems(
-            options=[
-                {'label': 'Normal Display', 'value': 'equal'},
-                {'label': 'Market Cap Display', 'value': 'market'},
-                {'label': 'Bubble Chart', 'value': 'bubble'},
-                {'label': 'Category Momentum', 'value': 'momentum'}
-            ],
-            id='display-mode',
-            value='equal',
-            labelStyle={'display': 'inline-block', 'marginRight': '10px'},
-            style={'display': 'inline-block'}
-        )
-    ], style={'textAlign': 'center', 'marginBottom': 20}),
-    
-    # 3. Enable Notifications ----------------------------
-    html.Div([
-        html.Label('Enable Notifications：', style={'marginRight': '5px', 'display': 'inline-block'}),
-        daq.ToggleSwitch(
-            id='enable-notifications', 
-            value=False, 
-            label=['Disable', 'Enable'], 
-            style={'display': 'inline-block'}
+def _first_quote_price(prices):
+    """取出買/賣價一檔，無效時回傳 NaN"""
+    try:
+        if prices and prices[0] not in ['-', '0.0000']:
+            return float(prices[0])
+    except (ValueError, TypeError):
+        pass
+    return float('nan')
+
+def ensure_tick_buffer(stock_ids):
+    """股票清單或交易日改變時重建即時報價緩衝區 (會讀回當天同股票清單的 log)"""
+    global g_tick_buffer, g_last_tick_time
+
+    stock_ids = list(stock_ids)
+    today = datetime.now().strftime('%Y%m%d')
+    with g_tick_lock:
+        if g_tick_buffer is not None and g_tick_buffer.stock_ids == stock_ids and g_tick_buffer.date == today:
+            return g_tick_buffer
+
+        if g_tick_buffer is not None:
+            g_tick_buffer.flush()
+        g_tick_buffer = IntradayTickBuffer(stock_ids, log_dir=TICK_LOG_DIR, date=today)
+        g_last_tick_time = None
+        return g_tick_buffer
+
+def record_tick_snapshot(stocks_df, quotes):
+    """
+    把這次取得的即時報價寫入盤中緩衝區
+
+    非推送模式下每個瀏覽器的 callback 都會查詢報價，以報價時間 (各股 timestamp 的最大值) 判斷是否為新的報價，
+    同一次報價更新只記錄一次
+
+    Args:
+        stocks_df (pd.DataFrame): update_realtime_data 更新後的股票資料
+        quotes (dict): 這次取得的報價 (twstock.realtime.get 格式)
+    """
+    global g_last_tick_time
+
+    acc_volume = np.full(len(stocks_df.columns), np.nan)
+    best_bid = np.full(len(stocks_df.columns), np.nan)
+    best_ask = np.full(len(stocks_df.columns), np.nan)
+    quote_time = None
+    for pos, stock_id in enumerate(stocks_df.columns):
+        stock_data = quotes.get(stock_id)
+        if not stock_data or not stock_data.get('success') or 'realtime' not in stock_data:
+            continue
+        timestamp = stock_data.get('timestamp')
+        if timestamp is not None and (quote_time is None or timestamp > quote_time):
+            quote_time = timestamp
+        realtime_data = stock_data['realtime']
+        try:
+            acc_volume[pos] = float(realtime_data.get('accumulate_trade_volume'))
+        except (ValueError, TypeError):
+            pass
+        best_bid[pos] = _first_quote_price(realtime_data.get('best_bid_price'))
+        best_ask[pos] = _first_quote_price(realtime_data.get('best_ask_price'))
+
+    # 沒有取得任何報價時不記錄
+    if quote_time is None:
+        return
+
+    with g_tick_lock:
+        tick_buffer = ensure_tick_buffer(stocks_df.columns)
+        # 已記錄過相同 (或更新) 的報價
+        if g_last_tick_time is not None and quote_time <= g_last_tick_time:
+            return
+        g_last_tick_time = quote_time
+        tick_buffer.append(
+            time.time(),
+            price=stocks_df.loc['realtime_price'].to_numpy(dtype=float),
+            acc_volume=acc_volume,
+            best_bid=best_bid,
+            best_ask=best_ask
         )
-    ], style={'textAlign': 'center', 'marginBottom': '20px'}),
-    
-    # 4. Last Update Time ----------------------------
-    html.Div([
-        html.Span("Last Update Time: ", style={'fontWeight': 'bold'}),
-        html.Span(id='last-update-time', style={'color': 'blue'})
-    ], style={'textAlign': 'center', 'marginBottom': 5}),
-
-    # Category Momentum 控制面板 ----------------------------
-    html.Div(id='momentum-controls', children=[
+
+def build_startup_snapshot():
+    """載入所有初始資料並整理成可快取的啟動快照"""
+    initial_stocks_df = load_initial_data()
+    return {
+        'category_json': g_category_json,
+        'stock_category': g_stock_category,
+        'stock_meta_index': g_stock_meta_index,
+        'initial_stocks_df': initial_stocks_df,
+        'suspension_checked': g_suspension_checked
+    }
+
+def load_startup_state(use_cache=True):
+    """
+    載入啟動資料到全域變數，輸入檔案未變動且同一天內重啟時直接使用快照
+
+    Args:
+        use_cache (bool): 是否使用 (並更新) 啟動快照
+    """
+    global g_category_json, g_stock_category, g_stock_meta_index, g_initial_stocks_df
+
+    if use_cache:
+        # 暫停交易判斷以日為單位，快照只在當天有效
+        # 暫停交易檢查失敗時不儲存快照，避免整天使用錯誤的股票清單
+        snapshot = load_cached_snapshot(STARTUP_SNAPSHOT_PATH, STARTUP_SOURCE_PATHS, build_startup_snapshot,
+                                        extra_key=datetime.now().strftime('%Y%m%d'),
+                                        is_cacheable=lambda data: data['suspension_checked'])
+    else:
+        snapshot = build_startup_snapshot()
+
+    g_category_json = snapshot['category_json']
+    g_stock_category = snapshot['stock_category']
+    g_stock_meta_index = snapshot['stock_meta_index']
+    g_initial_stocks_df = snapshot['initial_stocks_df']
+    rebuild_category_index()
+
+def rebuild_category_index():
+    """股票或類別變動後，重建類別展開索引並同步通知狀態機、類別指數的類別清單"""
+    global g_category_index
+
+    g_category_index = build_category_index(g_initial_stocks_df)
+    stock_rows = g_initial_stocks_df.reindex(['stock_name', 'stock_type', 'issue_shares', 'last_day_price'])
+    g_category_alert_engine.set_universe(g_category_index, stock_rows.loc['stock_name'], stock_rows.loc['stock_type'])
+    g_category_index_engine.set_universe(g_category_index, stock_rows.loc['issue_shares'], stock_rows.loc['last_day_price'])
+    ensure_tick_buffer(g_initial_stocks_df.columns)
+
+@atexit.register
+def flush_tick_buffer():
+    """結束程式前把尚未寫入的即時報價寫入 log"""
+    with g_tick_lock:
+        if g_tick_buffer is not None:
+            g_tick_buffer.flush()
+
+def create_app(use_cache=True, push_mode=False, shared_snapshot=False):
+    """
+    建立 Dash 應用程式 (載入啟動資料、設定版面)，callback 已在模組層級以 dash.callback 註冊
+
+    Args:
+        use_cache (bool): 是否使用啟動快照
+        push_mode (bool): 由伺服器推送報價差異 (SSE)，取代每個瀏覽器各自以 dcc.Interval 輪詢
+        shared_snapshot (bool): 多程序部署 (例如 gunicorn 多個 worker)，只有 leader 程序輪詢報價與發送通知，
+                                其他程序從共享記憶體讀取報價快照
+
+    Returns:
+        dash.Dash: 應用程式物件
+    """
+    global g_push_mode, g_shared_mode
+
+    load_startup_state(use_cache)
+
+    app = dash.Dash(__name__, suppress_callback_exceptions=True)
+    g_push_mode = push_mode
+    g_shared_mode = shared_snapshot
+    if push_mode:
+        register_quote_stream(app.server, g_quote_publisher, QUOTE_STREAM_ROUTE)
+    if push_mode or shared_snapshot:
+        start_quote_push()
+    app.layout = create_layout()
+    return app
+
+def create_server():
+    """
+    gunicorn 使用的 WSGI 入口，例如:
+        gunicorn -w 4 --threads 8 "twstock_realtime_heatmap:create_server()"
+    預設啟用共享報價快照 (HEATMAP_SHARED_SNAPSHOT=0 可關閉)，HEATMAP_PUSH_MODE=1 啟用 SSE 推送。
+    不要使用 --preload，背景 thread 需要在每個 worker 中各自啟動。
+    """
+    app = create_app(push_mode=os.getenv('HEATMAP_PUSH_MODE') == '1',
+                     shared_snapshot=os.getenv('HEATMAP_SHARED_SNAPSHOT', '1') == '1')
+    return app.server
+
+def uses_background_quotes():
+    """報價是否由背景 thread 取得 (push 或共享快照模式)，callback 只讀取最新快照"""
+    return g_push_mode or g_shared_mode
+
+def get_published_stocks_df():
+    """以背景 thread 最新發布的報價建立 update_realtime_data 格式的 DataFrame"""
+    stocks_df = g_initial_stocks_df.copy()
+    stock_ids, price, change = g_quote_publisher.latest()
+    if stock_ids == list(stocks_df.columns):
+        stocks_df.loc['realtime_price'] = price
+        stocks_df.loc['realtime_change'] = change
+    return stocks_df
+
+def set_notifications_enabled(enabled):
+    """設定背景 thread 的通知開關 (共享快照模式下寫入共享記憶體，讓 leader 程序讀取)"""
+    g_push_state['notifications_enabled'] = enabled
+    if g_shared_snapshot is not None:
+        g_shared_snapshot.notifications_enabled = enabled
+
+def notifications_enabled():
+    if g_shared_snapshot is not None:
+        return g_shared_snapshot.notifications_enabled
+    return g_push_state['notifications_enabled']
+
+def ensure_shared_snapshot():
+    """共享快照模式: 依目前股票清單建立 (或連接) 共享記憶體與 leader 鎖"""
+    global g_shared_snapshot, g_leader_lock
+
+    stock_ids = list(g_initial_stocks_df.columns)
+    if g_shared_snapshot is not None and g_shared_snapshot.stock_ids == stock_ids:
+        return
+
+    # 股票清單改變 (例如加入庫存類別) 時改用另一塊共享記憶體與另一把鎖
+    if g_leader_lock is not None:
+        g_leader_lock.release()
+    if g_shared_snapshot is not None:
+        g_shared_snapshot.close()
+    g_shared_snapshot = SharedQuoteSnapshot(stock_ids)
+    g_shared_snapshot.notifications_enabled = g_push_state['notifications_enabled']
+    g_leader_lock = LeaderLock(g_shared_snapshot.name)
+
+def load_leader_alert_state():
+    """成為 leader 後讀回前一個 leader 的類別通知狀態 (每塊共享記憶體只讀一次)"""
+    global g_alert_state_path
+
+    path = os.path.join(os.path.dirname(g_leader_lock.path), f"{g_shared_snapshot.name}_alert_state.json")
+    if g_alert_state_path == path:
+        return
+    g_category_alert_engine.load_state(path)
+    g_alert_state_path = path
+
+def push_realtime_snapshot():
+    """輪詢一次報價，更新類別指數、發布差異並檢查通知 (共享快照模式下只有 leader 執行)"""
+    updated_stocks_df = update_realtime_data(g_initial_stocks_df.copy())
+    realtime_price = updated_stocks_df.loc['realtime_price'].to_numpy(dtype=float)
+    realtime_change = updated_stocks_df.loc['realtime_change'].to_numpy(dtype=float)
+
+    if g_shared_snapshot is not None and g_shared_snapshot.stock_ids == list(updated_stocks_df.columns):
+        g_shared_snapshot.write(realtime_price, realtime_change)
+    g_category_index_engine.update(realtime_price)
+    g_quote_publisher.publish(list(updated_stocks_df.columns), realtime_price, realtime_change)
+
+    if notifications_enabled():
+        # 只有真的要通知時才建立熱力圖
+        send_discord_category_notification(
+            realtime_change, lambda: build_treemap_figure(build_display_df(updated_stocks_df)[0], 'equal'))
+
+def sync_from_shared_snapshot(last_version):
+    """
+    非 leader 程序: 共享快照版本改變時，更新本程序的類別指數與 SSE 發布者
+
+    Returns:
+        int: 目前處理到的版本
+    """
+    version, timestamp, realtime_price, realtime_change = g_shared_snapshot.read()
+    if version == last_version or version == 0:
+        return last_version
+
+    g_category_index_engine.update(realtime_price, timestamp)
+    g_quote_publisher.publish(g_shared_snapshot.stock_ids, realtime_price, realtime_change)
+    return version
+
+def run_quote_push_loop(interval_seconds):
+    last_version = None
+    while True:
+        start_time = time.monotonic()
+        wait_seconds = interval_seconds
+        try:
+            if g_shared_mode:
+                ensure_shared_snapshot()
+            if g_shared_snapshot is None or g_leader_lock.try_acquire():
+                if g_shared_snapshot is not None:
+                    load_leader_alert_state()
+                push_realtime_snapshot()
+            else:
+                last_version = sync_from_shared_snapshot(last_version)
+                wait_seconds = SHARED_SNAPSHOT_SYNC_SECONDS
+        except Exception as e:
+            print(f"推送即時報價失敗: {e}")
+        time.sleep(max(0.0, wait_seconds - (time.monotonic() - start_time)))
+
+def start_quote_push(interval_seconds=QUOTE_PUSH_INTERVAL_SECONDS):
+    """啟動背景報價 thread (只會啟動一個)"""
+    if g_push_state['thread'] is not None and g_push_state['thread'].is_alive():
+        return
+    g_push_state['thread'] = threading.Thread(target=run_quote_push_loop, args=(interval_seconds,),
+                                              name='quote-push', daemon=True)
+    g_push_state['thread'].start()
+
+def create_layout():
+    """建立 Dash 版面 (類別下拉選單需要已載入的 g_stock_category)"""
+    return html.Div([
+        # 1. Taiwan Stock Realtime Heatmap 大標題 ----------------------------
+        html.H1("Taiwan Stock Realtime Heatmap", 
+                style={'textAlign': 'center', 'marginBottom': 30}),
+
+        # 2. Display Mode ----------------------------
         html.Div([
-            html.Label('天數選擇:', style={
-                'display': 'inline-block', 
-                'marginRight': 10,
-                'verticalAlign': 'middle'
-            }),
-            dcc.Input(
-                id='momentum-days-input',
-                type='number',
-                value=5,
-                min=1,
-                max=30,
-                step=1,
-                style={
-                    'width': 50,
-                    'display': 'inline-block',
-                    'verticalAlign': 'middle',
-                    'marginRight': 20
-                }
-            ),
-            html.Label('網格大小:', style={
-                'display': 'inline-block', 
-                'marginRight': 10,
-                'verticalAlign': 'middle'
-            }),
-            dcc.Dropdown(
-                id='momentum-grid-size',
+            html.Label('Display Mode：', style={'marginRight': '5px', 'display': 'inline-block'}),
+            dcc.RadioItems(
                 options=[
-                    {'label': '1x1', 'value': '1x1'},
-                    {'label': '2x2', 'value': '2x2'},
-                    {'label': '3x3', 'value': '3x3'},
-                    {'label': '4x4', 'value': '4x4'}
+                    {'label': 'Normal Display', 'value': 'equal'},
+                    {'label': 'Market Cap Display', 'value': 'market'},
+                    {'label': 'Bubble Chart', 'value': 'bubble'},
+                    {'label': 'Category Momentum', 'value': 'momentum'}
                 ],
-                value='3x3',
-                style={
-                    'width': 100,
-                    'display': 'inline-block',
-                    'verticalAlign': 'middle',
-                    'marginRight': 20
-                }
-            ),
-            html.Label('頁數:', style={
+                id='display-mode',
+                value='equal',
+                labelStyle={'display': 'inline-block', 'marginRight': '10px'},
+                style={'display': 'inline-block'}
+            )
+        ], style={'textAlign': 'center', 'marginBottom': 20}),
+    
+        # 3. Enable Notifications ----------------------------
+        html.Div([
+            html.Label('Enable Notifications：', style={'marginRight': '5px', 'display': 'inline-block'}),
+            daq.ToggleSwitch(
+                id='enable-notifications', 
+                value=False, 
+                label=['Disable', 'Enable'], 
+                style={'display': 'inline-block'}
+            )
+        ], style={'textAlign': 'center', 'marginBottom': '20px'}),
+    
+        # 4. Last Update Time ----------------------------
+        html.Div([
+            html.Span("Last Update Time: ", style={'fontWeight': 'bold'}),
+            html.Span(id='last-update-time', style={'color': 'blue'})
+        ], style={'textAlign': 'center', 'marginBottom': 5}),
+
+        # Category Momentum 控制面板 ----------------------------
+        html.Div(id='momentum-controls', children=[
+            html.Div([
+                html.Label('天數選擇:', style={
                     'display': 'inline-block', 
                     'marginRight': 10,
                     'verticalAlign': 'middle'
-            }),
-            dcc.Dropdown(
-                id='momentum-page-dropdown',
-                options=[{'label': '第 1 頁', 'value': 1}],
-                value=1,
-                style={
-                    'width': 200,
-                    'display': 'inline-block',
-                    'verticalAlign': 'middle',
-                    'marginRight': 20
-                }
-            ),
-            html.Button(
-                '更新資料',
-                id='momentum-update-button',
-                n_clicks=0,
-                style={
+                }),
+                dcc.Input(
+                    id='momentum-days-input',
+                    type='number',
+                    value=5,
+                    min=1,
+                    max=30,
+                    step=1,
+                    style={
+                        'width': 50,
+                        'display': 'inline-block',
+                        'verticalAlign': 'middle',
+                        'marginRight': 20
+                    }
+                ),
+                html.Label('網格大小:', style={
+                    'display': 'inline-block', 
+                    'marginRight': 10,
+                    'verticalAlign': 'middle'
+                }),
+                dcc.Dropdown(
+                    id='momentum-grid-size',
+                    options=[
+                        {'label': '1x1', 'value': '1x1'},
+                        {'label': '2x2', 'value': '2x2'},
+                        {'label': '3x3', 'value': '3x3'},
+                        {'label': '4x4', 'value': '4x4'}
+                    ],
+                    value='3x3',
+                    style={
+                        'width': 100,
+                        'display': 'inline-block',
+                        'verticalAlign': 'middle',
+                        'marginRight': 20
+                    }
+                ),
+                html.Label('頁數:', style={
+                        'display': 'inline-block', 
+                        'marginRight': 10,
+                        'verticalAlign': 'middle'
+                }),
+                dcc.Dropdown(
+                    id='momentum-page-dropdown',
+                    options=[{'label': '第 1 頁', 'value': 1}],
+                    value=1,
+                    style={
+                        'width': 200,
+                        'display': 'inline-block',
+                        'verticalAlign': 'middle',
+                        'marginRight': 20
+                    }
+                ),
+                html.Button(
+                    '更新資料',
+                    id='momentum-update-button',
+                    n_clicks=0,
+                    style={
+                        'display': 'inline-block',
+                        'verticalAlign': 'middle',
+                        'backgroundColor': '#007bff',
+                        'color': 'white',
+                        'border': 'none',
+                        'padding': '5px 15px',
+                        'borderRadius': '3px',
+                        'cursor': 'pointer',
+                        'marginRight': 10
+                    }
+                ),
+                html.Div(id='momentum-status-message', style={
+                    'textAlign': 'center',
+                    'color': 'green',
                     'display': 'inline-block',
-                    'verticalAlign': 'middle',
-                    'backgroundColor': '#007bff',
-                    'color': 'white',
-                    'border': 'none',
-                    'padding': '5px 15px',
-                    'borderRadius': '3px',
-                    'cursor': 'pointer',
-                    'marginRight': 10
-                }
-            ),
-            html.Div(id='momentum-status-message', style={
-                'textAlign': 'center',
-                'color': 'green',
-                'display': 'inline-block',
-            })
-        ], style={'textAlign': 'center', 'marginTop': 20}),
+                })
+            ], style={'textAlign': 'center', 'marginTop': 20}),
 
-    ], style={'display': 'none', 'marginBottom': 20}),
+        ], style={'display': 'none', 'marginBottom': 20}),
 
-    # 5. Heatmap or Bubble Chart ----------------------------
-    dcc.Graph(id='live-chart'),
-    dcc.Interval(id='interval-update', interval=5000, n_intervals=0),
+        # 5. Heatmap or Bubble Chart ----------------------------
+        dcc.Graph(id='live-chart'),
+        # push 模式停用輪詢，改由 assets/quote_push.js 接收 SSE 差異更新圖表
+        dcc.Interval(id='interval-update', interval=5000, n_intervals=0, disabled=g_push_mode),
+        html.Div(id='quote-push-config', hidden=True,
+                 **({'data-stream-url': QUOTE_STREAM_ROUTE} if g_push_mode else {})),
     
-    # 6. Stock Link Container ----------------------------
-    html.Div(id='stock-link-container', style={'textAlign': 'center', 'marginTop': 20}),
+        # 6. Stock Link Container ----------------------------
+        html.Div(id='stock-link-container', style={'textAlign': 'center', 'marginTop': 20}),
 
-    # 7. Stock Trading Interface ----------------------------
-    html.Div([
-        html.H1("Stock Trading Interface", style={'textAlign': 'center', 'marginTop': 30}),
-        
-        # 7-0. Authentication Section ----------------------------
+        # 7. Stock Trading Interface ----------------------------
         html.Div([
+            html.H1("Stock Trading Interface", style={'textAlign': 'center', 'marginTop': 30}),
+        
+            # 7-0. Authentication Section ----------------------------
             html.Div([
                 html.Div([
-                    html.Label("Cert. Password", style={'marginRight': '10px', 'fontWeight': 'bold'}),
-                    dcc.Input(
-                        id='auth-code-input',
-                        type='text',
-                        placeholder='請輸入您的憑證密碼',
-                        style={'width': '200px', 'padding': '5px'}
-                    )
-                ], style={'display': 'inline-block', 'marginRight': '30px'}),
+                    html.Div([
+                        html.Label("Cert. Password", style={'marginRight': '10px', 'fontWeight': 'bold'}),
+                        dcc.Input(
+                            id='auth-code-input',
+                            type='text',
+                            placeholder='請輸入您的憑證密碼',
+                            style={'width': '200px', 'padding': '5px'}
+                        )
+                    ], style={'display': 'inline-block', 'marginRight': '30px'}),
                 
-                html.Div([
-                    html.Label("Account Password：", style={'marginRight': '10px', 'fontWeight': 'bold'}),
-                    dcc.Input(
-                        id='password-input',
-                        type='password',
-                        placeholder='請輸入您玉山證券的登入密碼',
-                        style={'width': '200px', 'padding': '5px'}
-                    )
-                ], style={'display': 'inline-block', 'marginRight': '30px'}),
+                    html.Div([
+                        html.Label("Account Password：", style={'marginRight': '10px', 'fontWeight': 'bold'}),
+                        dcc.Input(
+                            id='password-input',
+                            type='password',
+                            placeholder='請輸入您玉山證券的登入密碼',
+                            style={'width': '200px', 'padding': '5px'}
+                        )
+                    ], style={'display': 'inline-block', 'marginRight': '30px'}),
                 
-                html.Button(
-                    "Login",
-                    id='login-button',
-                    n_clicks=0,
-                    style={
-                        'backgroundColor': '#007bff',
-                        'color': 'white',
-                        'border': 'none',
-                        'padding': '8px 20px',
-                        'borderRadius': '5px',
-                        'cursor': 'pointer',
-                        'fontSize': '14px'
-                    }
-                )
-            ], style={'textAlign': 'center', 'marginBottom': '15px'}),
+                    html.Button(
+                        "Login",
+                        id='login-button',
+                        n_clicks=0,
+                        style={
+                            'backgroundColor': '#007bff',
+                            'color': 'white',
+                            'border': 'none',
+                            'padding': '8px 20px',
+                            'borderRadius': '5px',
+                            'cursor': 'pointer',
+                            'fontSize': '14px'
+                        }
+                    )
+                ], style={'textAlign': 'center', 'marginBottom': '15px'}),
             
-            # 登入狀態顯示
-            html.Div(id='login-status', style={
-                'textAlign': 'center', 
-                'marginBottom': '20px',
-                'fontWeight': 'bold'
-            })
-        ], style={
-            'backgroundColor': '#f8f9fa',
-            'border': '1px solid #dee2e6',
-            'borderRadius': '8px',
-            'padding': '20px',
-            'marginBottom': '30px'
-        }),
-        
-        # 7-1. Order Type toggle ----------------------------
-        html.Div([
-            html.Label("Order Type：", style={'marginRight': '5px', 'display': 'inline-block', 'verticalAlign': 'middle'}),
-            daq.ToggleSwitch(id='buy-sell-toggle', value=True, label=['Sell', 'Buy'], 
-                           style={'display': 'inline-block', 'marginRight': '20px', 'verticalAlign': 'middle'}),
-            html.Label("Trade Type：", style={'marginRight': '5px', 'display': 'inline-block', 'verticalAlign': 'middle'}),
-            dcc.Dropdown(
-                id='trade_type',
-                options=[
-                    {'label': '現股', 'value': '現股'},
-                    {'label': '融資', 'value': '融資'},
-                    {'label': '融券', 'value': '融券'},
-                    {'label': '現股當沖賣', 'value': '現股當沖賣'}
-                ],
-                value='現股',
-                style={'display': 'inline-block', 'width': '120px', 'marginRight': '20px', 'verticalAlign': 'middle'}
-            ),
-            html.Label("Order Type：", style={'marginRight': '5px', 'display': 'inline-block', 'verticalAlign': 'middle'}),
-            dcc.Dropdown(
-                id='order_type',
-                options=[
-                    {'label': 'Speed Order', 'value': 'SPEED'},
-                    {'label': 'Market Order', 'value': 'MARKET'},
-                    {'label': 'Limit Order', 'value': 'LIMIT'}
-                ],
-                value='SPEED',
-                style={'display': 'inline-block', 'width': '120px', 'marginRight': '20px', 'verticalAlign': 'middle'}
-            ),
-            daq.ToggleSwitch(id='Funding_strategy', value=True, label=['Manual', 'Average'], 
-                           style={'display': 'inline-block', 'marginRight': '10px', 'verticalAlign': 'middle'}),
-            html.Div(id='average-amount-input', style={'display': 'inline-block', 'verticalAlign': 'middle'})
-        ], style={'textAlign': 'center', 'marginBottom': '20px'}),
+                # 登入狀態顯示
+                html.Div(id='login-status', style={
+                    'textAlign': 'center', 
+                    'marginBottom': '20px',
+                    'fontWeight': 'bold'
+                })
+            ], style={
+                'backgroundColor': '#f8f9fa',
+                'border': '1px solid #dee2e6',
+                'borderRadius': '8px',
+                'padding': '20px',
+                'marginBottom': '30px'
+            }),
         
-        # 7-2. Category Dropdown ----------------------------
-        html.Div([
-            html.Label("Select Category："),
-            dcc.Dropdown(
-                id='group-dropdown',
-                options=[{'label': cat, 'value': cat} for cat in g_stock_category],
-                placeholder="選擇族群",
-                style={'width': '50%', 'margin': '0 auto'}
-            )
-        ], style={'textAlign': 'center', 'marginBottom': '20px'}),
+            # 7-1. Order Type toggle ----------------------------
+            html.Div([
+                html.Label("Order Type：", style={'marginRight': '5px', 'display': 'inline-block', 'verticalAlign': 'middle'}),
+                daq.ToggleSwitch(id='buy-sell-toggle', value=True, label=['Sell', 'Buy'], 
+                               style={'display': 'inline-block', 'marginRight': '20px', 'verticalAlign': 'middle'}),
+                html.Label("Trade Type：", style={'marginRight': '5px', 'display': 'inline-block', 'verticalAlign': 'middle'}),
+                dcc.Dropdown(
+                    id='trade_type',
+                    options=[
+                        {'label': '現股', 'value': '現股'},
+                        {'label': '融資', 'value': '融資'},
+                        {'label': '融券', 'value': '融券'},
+                        {'label': '現股當沖賣', 'value': '現股當沖賣'}
+                    ],
+                    value='現股',
+                    style={'display': 'inline-block', 'width': '120px', 'marginRight': '20px', 'verticalAlign': 'middle'}
+                ),
+                html.Label("Order Type：", style={'marginRight': '5px', 'display': 'inline-block', 'verticalAlign': 'middle'}),
+                dcc.Dropdown(
+                    id='order_type',
+                    options=[
+                        {'label': 'Speed Order', 'value': 'SPEED'},
+                        {'label': 'Market Order', 'value': 'MARKET'},
+                        {'label': 'Limit Order', 'value': 'LIMIT'}
+                    ],
+                    value='SPEED',
+                    style={'display': 'inline-block', 'width': '120px', 'marginRight': '20px', 'verticalAlign': 'middle'}
+                ),
+                daq.ToggleSwitch(id='Funding_strategy', value=True, label=['Manual', 'Average'], 
+                               style={'display': 'inline-block', 'marginRight': '10px', 'verticalAlign': 'middle'}),
+                html.Div(id='average-amount-input', style={'display': 'inline-block', 'verticalAlign': 'middle'})
+            ], style={'textAlign': 'center', 'marginBottom': '20px'}),
         
-        # 股票輸入區和按鈕
-        html.Div(id='stock-input-container', style={'textAlign': 'center', 'marginBottom': '20px'}),
-        html.Div([
-            html.Button("Refresh", id='refersh-button', n_clicks=0, 
-                       style={ 'backgroundColor': "#2863a7", 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer', 'marginRight': '10px' }),
-            html.Button("Send Order", id='confirm-order-button', n_clicks=0, 
-                       style={ 'backgroundColor': '#dc3545', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer' })
-        ], style={'textAlign': 'center', 'marginBottom': '20px'}),
-        html.Div(id='order-status', style={
-            'textAlign': 'center', 
-            'marginTop': '20px', 
-            'padding': '10px',
-            'whiteSpace': 'pre-line',  # 允許換行
-            'wordBreak': 'break-word',  # 確保長文字會換行
-            'maxWidth': '800px',        # 限制最大寬度
-            'margin': '20px auto',       # 水平置中
-        }),
-        
-        # 確認對話框
-        html.Div(id='order-confirmation-modal',
-            children=[html.Div([
-                html.Div([
-                    html.H3("確認下單資訊", style={'textAlign': 'center', 'marginBottom': '20px'}),
-                    html.Div(id='confirmation-details', 
-                            style={'marginBottom': '20px', 'padding': '15px', 
-                                  'backgroundColor': '#f9f9f9', 'border': '1px solid #ddd'}),
+            # 7-2. Category Dropdown ----------------------------
+            html.Div([
+                html.Label("Select Category："),
+                dcc.Dropdown(
+                    id='group-dropdown',
+                    options=[{'label': cat, 'value': cat} for cat in g_stock_category],
+                    placeholder="選擇族群",
+                    style={'width': '50%', 'margin': '0 auto'}
+                )
+            ], style={'textAlign': 'center', 'marginBottom': '20px'}),
+        
+            # 股票輸入區和按鈕
+            html.Div(id='stock-input-container', style={'textAlign': 'center', 'marginBottom': '20px'}),
+            html.Div([
+                html.Button("Refresh", id='refersh-button', n_clicks=0, 
+                           style={ 'backgroundColor': "#2863a7", 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer', 'marginRight': '10px' }),
+                html.Button("Send Order", id='confirm-order-button', n_clicks=0, 
+                           style={ 'backgroundColor': '#dc3545', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer' })
+            ], style={'textAlign': 'center', 'marginBottom': '20px'}),
+            html.Div(id='order-status', style={
+                'textAlign': 'center', 
+                'marginTop': '20px', 
+                'padding': '10px',
+                'whiteSpace': 'pre-line',  # 允許換行
+                'wordBreak': 'break-word',  # 確保長文字會換行
+                'maxWidth': '800px',        # 限制最大寬度
+                'margin': '20px auto',       # 水平置中
+            }),
+            # 背景下單進度 (籃子編號與輪詢)
+            dcc.Store(id='order-basket-store'),
+            dcc.Interval(id='order-progress-interval', interval=500, n_intervals=0, disabled=True),
+        
+            # 確認對話框
+            html.Div(id='order-confirmation-modal',
+                children=[html.Div([
                     html.Div([
-                        html.Button("確認下單", id='confirm-final-order', n_clicks=0,
-                                  style={'marginRight': '10px', 'backgroundColor': '#28a745',
-                                        'color': 'white', 'border': 'none', 
-                                        'padding': '10px 20px', 'borderRadius': '5px'}),
-                        html.Button("取消", id='cancel-order', n_clicks=0,
-                                  style={'backgroundColor': '#dc3545', 'color': 'white',
-                                        'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px'})
-                    ], style={'textAlign': 'center'})
-                ], style={'backgroundColor': 'white', 'margin': '50px auto', 'padding': '30px',
-                         'width': '60%', 'borderRadius': '10px', 
-                         'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)'})
-            ], style={'position': 'fixed', 'top': '0', 'left': '0', 'width': '100%',
-                     'height': '100%', 'backgroundColor': 'rgba(0, 0, 0, 0.5)', 'zIndex': '1000'})],
-            style={'display': 'none'}
-        )
-    ]),
+                        html.H3("確認下單資訊", style={'textAlign': 'center', 'marginBottom': '20px'}),
+                        html.Div(id='confirmation-details', 
+                                style={'marginBottom': '20px', 'padding': '15px', 
+                                      'backgroundColor': '#f9f9f9', 'border': '1px solid #ddd'}),
+                        html.Div([
+                            html.Button("確認下單", id='confirm-final-order', n_clicks=0,
+                                      style={'marginRight': '10px', 'backgroundColor': '#28a745',
+                                            'color': 'white', 'border': 'none', 
+                                            'padding': '10px 20px', 'borderRadius': '5px'}),
+                            html.Button("取消", id='cancel-order', n_clicks=0,
+                                      style={'backgroundColor': '#dc3545', 'color': 'white',
+                                            'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px'})
+                        ], style={'textAlign': 'center'})
+                    ], style={'backgroundColor': 'white', 'margin': '50px auto', 'padding': '30px',
+                             'width': '60%', 'borderRadius': '10px', 
+                             'boxShadow': '0 4px 6px rgba(0, 0, 0, 0.1)'})
+                ], style={'position': 'fixed', 'top': '0', 'left': '0', 'width': '100%',
+                         'height': '100%', 'backgroundColor': 'rgba(0, 0, 0, 0.5)', 'zIndex': '1000'})],
+                style={'display': 'none'}
+            )
+        ]),
 
-    # 8. Stock Transaction List ----------------------------
-    html.Div([
-        html.H1("Stock Transaction List", style={'textAlign': 'center', 'marginTop': 30}),
-        html.Div([
-            html.Div("Order Time", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Stock", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Action", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Trade Type", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Order Price", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Order Quantity(股)", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Cancelled Quantity", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Filled Quantity", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Average Fill Price", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Order No.", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Cancel", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'})
-        ], style={'backgroundColor': '#f0f0f0', 'padding': '10px', 'marginBottom': '5px'}),
-        html.Div(id='transaction-list-container', style={'maxHeight': '300px', 'overflowY': 'auto', 'border': '1px solid #ddd'}),
-        # Transaction List Buttons
+        # 8. Stock Transaction List ----------------------------
         html.Div([
-            html.Button("Refresh", id='transaction-refresh-button', n_clicks=0,
-                       style={ 'backgroundColor': '#2863a7', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer', 'marginRight': '10px' }),
-            html.Button("Cancel All", id='transaction-cancel-all-button', n_clicks=0,
-                       style={ 'backgroundColor': '#dc3545', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer' })
-        ], style={'marginTop': '10px', 'textAlign': 'center'})
-    ], style={'marginTop': '20px', 'marginBottom': '30px', 'textAlign': 'center'}),
-
-    # 9. Stock Inventory List ----------------------------
-    html.Div([
-        html.H1("Stock Inventory List", style={'textAlign': 'center', 'marginTop': 30}),
-        html.Div([
-            html.Div("Trade Type", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Symbol", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Remaining Shares", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Current Price", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Average Price", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Balance Price", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Market Value", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Value Ratio", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Unrealized P&L", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
-            html.Div("Profit Rate", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'})
-
-        ], style={'backgroundColor': '#f0f0f0', 'padding': '10px', 'marginBottom': '5px'}),
-        html.Div(id='inventory-list-container', style={'maxHeight': '300px', 'overflowY': 'auto', 'border': '1px solid #ddd'}),
-        # Inventory List Button
+            html.H1("Stock Transaction List", style={'textAlign': 'center', 'marginTop': 30}),
+            html.Div([
+                html.Div("Order Time", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Stock", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Action", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Trade Type", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Order Price", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Order Quantity(股)", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Cancelled Quantity", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Filled Quantity", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Average Fill Price", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Order No.", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Cancel", style={'width': '9.09%', 'display': 'inline-block', 'fontWeight': 'bold'})
+            ], style={'backgroundColor': '#f0f0f0', 'padding': '10px', 'marginBottom': '5px'}),
+            html.Div(id='transaction-list-container', style={'maxHeight': '300px', 'overflowY': 'auto', 'border': '1px solid #ddd'}),
+            # Transaction List Buttons
+            html.Div([
+                html.Button("Refresh", id='transaction-refresh-button', n_clicks=0,
+                           style={ 'backgroundColor': '#2863a7', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer', 'marginRight': '10px' }),
+                html.Button("Cancel All", id='transaction-cancel-all-button', n_clicks=0,
+                           style={ 'backgroundColor': '#dc3545', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer' })
+            ], style={'marginTop': '10px', 'textAlign': 'center'})
+        ], style={'marginTop': '20px', 'marginBottom': '30px', 'textAlign': 'center'}),
+
+        # 9. Stock Inventory List ----------------------------
         html.Div([
-            html.Button("Refresh", id='inventory-refresh-button', n_clicks=0,
-                       style={'backgroundColor': '#2863a7', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer', 'marginRight': '10px'}),
-            html.Button("Add Category", id='add-category-button', n_clicks=0,
-                       style={'backgroundColor': '#28a745', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer', 'marginRight': '10px'}),
-            html.Button("Key In", id='key-in-button', n_clicks=0,
-                       style={'backgroundColor': '#ffc107', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer'})
-        ], style={'marginTop': '10px', 'textAlign': 'center'}),
-        html.Div(id='add-category-status', style={
-            'textAlign': 'center',
-            'marginTop': '20px',
-            'padding': '10px',
-            'whiteSpace': 'pre-line',  # 允許換行
-            'wordBreak': 'break-word',  # 確保長文字會換行
-            'maxWidth': '800px',        # 限制最大寬度
-            'margin': '20px auto',       # 水平置中
-        })
-    ], style={'marginTop': '20px', 'marginBottom': '30px', 'textAlign': 'center'})
+            html.H1("Stock Inventory List", style={'textAlign': 'center', 'marginTop': 30}),
+            html.Div([
+                html.Div("Trade Type", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Symbol", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Remaining Shares", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Current Price", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Average Price", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Balance Price", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Market Value", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Value Ratio", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Unrealized P&L", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'}),
+                html.Div("Profit Rate", style={'width': '10.0%', 'display': 'inline-block', 'fontWeight': 'bold'})
+
+            ], style={'backgroundColor': '#f0f0f0', 'padding': '10px', 'marginBottom': '5px'}),
+            html.Div(id='inventory-list-container', style={'maxHeight': '300px', 'overflowY': 'auto', 'border': '1px solid #ddd'}),
+            # Inventory List Button
+            html.Div([
+                html.Button("Refresh", id='inventory-refresh-button', n_clicks=0,
+                           style={'backgroundColor': '#2863a7', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer', 'marginRight': '10px'}),
+                html.Button("Add Category", id='add-category-button', n_clicks=0,
+                           style={'backgroundColor': '#28a745', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer', 'marginRight': '10px'}),
+                html.Button("Key In", id='key-in-button', n_clicks=0,
+                           style={'backgroundColor': '#ffc107', 'color': 'white', 'border': 'none', 'padding': '10px 20px', 'borderRadius': '5px', 'cursor': 'pointer'})
+            ], style={'marginTop': '10px', 'textAlign': 'center'}),
+            html.Div(id='add-category-status', style={
+                'textAlign': 'center',
+                'marginTop': '20px',
+                'padding': '10px',
+                'whiteSpace': 'pre-line',  # 允許換行
+                'wordBreak': 'break-word',  # 確保長文字會換行
+                'maxWidth': '800px',        # 限制最大寬度
+                'margin': '20px auto',       # 水平置中
+            })
+        ], style={'marginTop': '20px', 'marginBottom': '30px', 'textAlign': 'center'})
 
-])
+    ])
 
 # 控制 momentum 控制面板的顯示/隱藏
-@app.callback(
+@callback(
     Output('momentum-controls', 'style'),
     Input('display-mode', 'value')
 )
@@ -1409,7 +1527,7 @@ def toggle_momentum_controls(display_mode):
         return {'display': 'none', 'marginBottom': 20}
 
 # 動態更新 momentum 頁數選項
-@app.callback(
+@callback(
     [Output('momentum-page-dropdown', 'options'),
      Output('momentum-page-dropdown', 'value')],
     [Input('momentum-grid-size', 'value'),
@@ -1440,13 +1558,9 @@ def update_momentum_page_options(grid_size, n_clicks, days):
             try:
                 # 使用與圖表顯示相同的天數
                 actual_days = days if days and days > 0 else 15
-                date_files = get_section_category_momentum_data("../raw_stock_data/daily/tpex", actual_days)
-                stocks_info = get_unique_stocks(category_data)
-                
                 twse_path = "../raw_stock_data/daily/twse"
                 tpex_path = "../raw_stock_data/daily/tpex"
-                momentum_data = collect_stock_momentum(twse_path, tpex_path, date_files, stocks_info)
-                category_momentum = calculate_category_momentum(category_data, momentum_data)
+                _, _, category_momentum = get_category_momentum(twse_path, tpex_path, category_data, actual_days)
                 
                 # 使用共用的排序函數
                 category_avg_momentum = get_sorted_categories(category_momentum)
@@ -1470,7 +1584,7 @@ def update_momentum_page_options(grid_size, n_clicks, days):
         return [{'label': '第 1 頁', 'value': 1}], 1
 
 # 動態更新 momentum 頁數下拉選單的樣式
-@app.callback(
+@callback(
     Output('momentum-page-dropdown', 'style'),
     Input('momentum-grid-size', 'value'),
     prevent_initial_call=True
@@ -1494,7 +1608,7 @@ def update_momentum_page_dropdown_style(grid_size):
     return base_style
 
 # 專門處理 momentum 模式的更新
-@app.callback(
+@callback(
     [Output('live-chart', 'figure', allow_duplicate=True),
      Output('momentum-status-message', 'children')],
     [Input('momentum-update-button', 'n_clicks'),
@@ -1515,7 +1629,7 @@ def update_momentum_chart(n_clicks, grid_size, page, days):
         return create_momentum_dashboard()[0], f"更新失敗: {str(e)}"
 
 # 處理登入功能
-@app.callback(
+@callback(
     Output('login-status', 'children'),
     Input('login-button', 'n_clicks'),
     [State('auth-code-input', 'value'),
@@ -1555,7 +1669,95 @@ def handle_login(n_clicks, auth_code, password):
         return html.Div("❌ 登入失敗：" + f"{result_str}" , style={'color': 'red'})
 
 
-@app.callback(
+def build_display_df(updated_stocks_df):
+    """
+    將每檔股票依所屬類別展開成 treemap 使用的資料
+
+    Returns:
+        tuple: (display_df, realtime_price, realtime_change, market_value)，後三者依 stock_ids 順序排列
+    """
+    # 準備 treemap 資料 (使用預先建立的類別展開索引，不逐列迭代)
+    stock_pos = g_category_index['member_stock']
+    stock_ids = updated_stocks_df.columns.to_numpy()
+    realtime_price = updated_stocks_df.loc['realtime_price'].to_numpy(dtype=float)
+    realtime_change = updated_stocks_df.loc['realtime_change'].to_numpy(dtype=float)
+
+    # 計算市值
+    market_value = np.where(np.isnan(realtime_price), 0.0, updated_stocks_df.loc['issue_shares'].to_numpy(dtype=float) * realtime_price)
+    # 格式化市值顯示
+    market_value_display = np.where(
+        market_value >= 1e8,
+        pd.Series(market_value // 1e8).astype('int64').astype(str) + 'e',
+        pd.Series(market_value // 1e4).astype('int64').astype(str) + 'w'
+    )
+
+    # 為每個股票的每個類別建立一筆資料
+    display_df = pd.DataFrame({
+        'stock_meta': 'Taiwan Stock',
+        'stock_id': stock_ids[stock_pos],
+        'stock_name': updated_stocks_df.loc['stock_name'].to_numpy()[stock_pos],
+        'category': np.asarray(g_category_index['categories'], dtype=object)[g_category_index['member_cat']],
+        'realtime_change': realtime_change[stock_pos],
+        'realtime_price': realtime_price[stock_pos],
+        'last_day_price': updated_stocks_df.loc['last_day_price'].to_numpy(dtype=float)[stock_pos],
+        'stock_type': updated_stocks_df.loc['stock_type'].to_numpy()[stock_pos],
+        'market_cap': market_value_display[stock_pos],  # Display 使用
+        'market_value': market_value[stock_pos]  # 保留原始數字值
+    })
+
+    return display_df, realtime_price, realtime_change, market_value
+
+def build_treemap_figure(display_df, display_mode):
+    """
+    建立 treemap 熱力圖 ('equal' 平均大小 / 'market' 市值大小)
+
+    Returns:
+        plotly.graph_objects.Figure: treemap 圖表
+    """
+    # 根據顯示模式決定區塊大小
+    if display_mode == 'equal': # 平均大小模式，所有區塊大小相同
+        values = [1] * len(display_df)
+    elif display_mode == 'market': # 市值大小模式，分 5 區間
+        mv = display_df['market_value'].to_numpy()
+        values = np.select(
+            [mv > 6e11,   # 6000e 以上
+             mv > 1e11,   # 1000e 以上
+             mv > 5e10,   # 500e 以上
+             mv > 1e10],  # 100e 以上
+            [5, 4, 3, 2],
+            default=1     # 100e 以下
+        ).tolist()
+        
+    # 建立 treemap
+    fig = px.treemap(
+        display_df,
+        path=['stock_meta', 'category', 'stock_name'],
+        values=values,
+        color='realtime_change',
+        color_continuous_scale='RdYlGn_r',
+        title='',
+        range_color=[-10, 10],
+        color_continuous_midpoint=0,
+        hover_data=['stock_id', 'realtime_price', 'last_day_price', 'stock_type', 'market_cap'],
+        custom_data=['stock_name', 'stock_id', 'realtime_price', 'realtime_change', 'stock_type']
+    )
+
+    fig.update_traces(
+        marker=dict(cornerradius=5),
+        textposition='middle center',
+        texttemplate="%{label} %{customdata[1]}<br>%{customdata[2]}<br>%{customdata[3]:.2f}%"
+    )
+    
+    fig.update_layout(
+        margin=dict(t=20, l=10, r=10, b=10),
+        paper_bgcolor='white',  # 白色背景
+        height=900,
+        coloraxis_colorbar_tickformat='.2f'
+    )
+
+    return fig
+
+@callback(
     [Output('live-chart', 'figure'),
      Output('last-update-time', 'children')],
     [Input('interval-update', 'n_intervals'),
@@ -1567,100 +1769,32 @@ def handle_login(n_clicks, auth_code, password):
 )
 def update_treemap(n, display_mode, enable_notifications, momentum_days, momentum_grid_size, momentum_page):
     
-    updated_stocks_df = update_realtime_data(g_initial_stocks_df.copy()) # 更新即時股價
+    if uses_background_quotes():
+        # 由背景 thread 輪詢報價 (或從共享快照同步)，這裡直接使用最新快照，不再另外抓取
+        updated_stocks_df = get_published_stocks_df()
+        set_notifications_enabled(bool(enable_notifications))
+    else:
+        updated_stocks_df = update_realtime_data(g_initial_stocks_df.copy()) # 更新即時股價
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S") # 取得當前時間
 
-    # 準備 treemap 資料
-    display_data = []
-    df_transposed = updated_stocks_df.T
+    display_df, realtime_price, realtime_change, market_value = build_display_df(updated_stocks_df)
 
-    # # 設定 pandas 顯示選項，確保完整顯示
-    # with pd.option_context('display.max_rows', None, 
-    #                       'display.max_columns', None,
-    #                       'display.width', None,
-    #                       'display.max_colwidth', None):
-    #     print(df_transposed.to_string())
-    
-    for stock_id, row in df_transposed.iterrows():
-        # 計算市值
-        market_value = row['issue_shares'] * row['realtime_price'] if not pd.isna(row['realtime_price']) else 0
-        # 格式化市值顯示
-        if market_value >= 1e8:
-            market_value_display = f"{int(market_value / 1e8)}e"
-        else:
-            market_value_display = f"{int(market_value / 1e4)}w"
-        
-        # 為每個股票的每個類別建立一筆資料
-        for category in row['category']:
-            display_data.append({
-                'stock_meta': 'Taiwan Stock',
-                'stock_id': stock_id,
-                'stock_name': row['stock_name'],
-                'category': category,
-                'realtime_change': row['realtime_change'],
-                'realtime_price': row['realtime_price'],
-                'last_day_price': row['last_day_price'],
-                'stock_type': row['stock_type'],
-                'market_cap': market_value_display,  # Display 使用
-                'market_value': market_value  # 保留原始數字值
-            })
-
-    # 轉換成 DataFrame
-    display_df = pd.DataFrame(display_data)
+    if not uses_background_quotes():
+        # 更新盤中類別指數 (只處理價格有變動的成分股)
+        g_category_index_engine.update(realtime_price)
 
-    # 根據顯示模式決定區塊大小
+    # 根據顯示模式建立圖表
     if display_mode == 'equal' or display_mode == 'market':
-
-        if display_mode == 'equal': # 平均大小模式，所有區塊大小相同
-            values = [1] * len(display_df)
-        elif display_mode == 'market': # 市值大小模式，分 5 區間
-            def map_size(mv):
-                # 區間對應大小
-                if mv > 6e11:      # 6000e 以上
-                    return 5
-                elif mv > 1e11:    # 1000e 以上
-                    return 4
-                elif mv > 5e10:    # 500e 以上
-                    return 3
-                elif mv > 1e10:    # 100e 以上
-                    return 2
-                else:              # 100e 以下
-                    return 1
-            values = display_df['market_value'].apply(map_size).tolist()
-            
-        # 建立 treemap
-        fig = px.treemap(
-            display_df,
-            path=['stock_meta', 'category', 'stock_name'],
-            values=values,
-            color='realtime_change',
-            color_continuous_scale='RdYlGn_r',
-            title='',
-            range_color=[-10, 10],
-            color_continuous_midpoint=0,
-            hover_data=['stock_id', 'realtime_price', 'last_day_price', 'stock_type', 'market_cap'],
-            custom_data=['stock_name', 'stock_id', 'realtime_price', 'realtime_change', 'stock_type']
-        )
-
-        fig.update_traces(
-            marker=dict(cornerradius=5),
-            textposition='middle center',
-            texttemplate="%{label} %{customdata[1]}<br>%{customdata[2]}<br>%{customdata[3]:.2f}%"
-        )
-        
-        fig.update_layout(
-            margin=dict(t=20, l=10, r=10, b=10),
-            paper_bgcolor='white',  # 白色背景
-            height=900,
-            coloraxis_colorbar_tickformat='.2f'
-        )
+        fig = build_treemap_figure(display_df, display_mode)
 
     elif display_mode == 'bubble':
         # Bubble Chart 模式，氣泡大小根據市值加總
-        bubble_data = display_df.groupby('category').agg(
-            mean_change=('realtime_change', 'mean'),
-            total_market_value=('market_value', 'sum')
-        ).reset_index()
+        bubble_data = pd.DataFrame({
+            'category': g_category_index['categories'],
+            'mean_change': category_segment_mean(g_category_index, realtime_change),
+            'cap_weighted_change': g_category_index_engine.cap_weighted_change().round(2),
+            'total_market_value': category_segment_sum(g_category_index, market_value)
+        })
 
         # 修改 Bubble Chart 的 X 軸和 Y 軸設置
         bubble_data = bubble_data.sort_values('mean_change')  # 按漲幅排序
@@ -1674,8 +1808,9 @@ def update_treemap(n, display_mode, enable_notifications, momentum_days, momentu
             color_continuous_midpoint=0,
             color_continuous_scale='RdYlGn_r',
             title='',
-            labels={'mean_change': 'Mean Change (%)', 'total_market_value': 'Total Market Value'},
+            labels={'mean_change': 'Mean Change (%)', 'total_market_value': 'Total Market Value', 'cap_weighted_change': 'Cap Weighted Change (%)'},
             hover_name='category',
+            hover_data={'cap_weighted_change': ':.2f'},
             size_max=60,
             text='mean_change'  # 改為顯示漲跌幅
         )
@@ -1714,14 +1849,14 @@ def update_treemap(n, display_mode, enable_notifications, momentum_days, momentu
         # 創建 Category Momentum 儀表板（使用當前狀態）
         fig, _ = create_momentum_dashboard(days=days, grid_size=grid_size, page=page)
 
-    #發送 Discord 群組漲跌幅通知
-    if enable_notifications:  # 只有在通知開關打開時才發送通知
-        send_discord_category_notification(display_df, fig)
+    #發送 Discord 群組漲跌幅通知 (push / 共享快照模式由背景 thread 發送)
+    if enable_notifications and not uses_background_quotes():  # 只有在通知開關打開時才發送通知
+        send_discord_category_notification(realtime_change, fig)
 
     return fig, current_time
 
 # 點擊 treemap 顯示外部連結並更新下拉選單
-@app.callback(
+@callback(
     [Output('stock-link-container', 'children'),
      Output('group-dropdown', 'value')],
     [Input('live-chart', 'clickData'),
@@ -1812,7 +1947,7 @@ def display_stock_link(clickData, display_mode):
     return '', None
 
 
-@app.callback(
+@callback(
     Output('average-amount-input', 'children'),
     Input('Funding_strategy', 'value')
 )
@@ -1832,7 +1967,7 @@ def toggle_average_input(funding_strategy_value):
         return ''
 
 
-@app.callback(
+@callback(
     Output('stock-input-container', 'children'),
     Input('group-dropdown', 'value')
 )
@@ -1934,7 +2069,7 @@ def populate_stock_inputs(selected_group):
         ], style={'maxHeight': '400px', 'overflowY': 'auto', 'border': '1px solid #ddd', 'padding': '10px'})
 
 # 整合 refresh 按鈕回調邏輯，依據 Funding_strategy 與 average_amount 狀態分配價格、張數、零股
-@app.callback(
+@callback(
     [Output({'type': 'price-input', 'index': ALL}, 'value'),
      Output({'type': 'quantity-input', 'index': ALL}, 'value'),
      Output({'type': 'odd-lots-input', 'index': ALL}, 'value'),
@@ -1968,37 +2103,18 @@ def refresh_stock_data_all(n_clicks, buy_sell, funding_strategy, average_amount,
     global g_login_success
     
     if g_login_success:
+        # 整股與零股報價一次同時查詢 (熱力圖剛輪詢過的整股報價直接使用快取)
+        toggled_ids = [stock_id for i, stock_id in enumerate(stock_ids) if trade_toggles[i]]
+        quotes = g_quote_cache.get_many(
+            [(stock_id, board) for stock_id in toggled_ids for board in ('LOT', 'ODDLOT')],
+            esun_get_stock_price
+        )
+        side = 'asks' if buy_sell else 'bids' # Buy mode - 使用賣價一檔 / Sell mode - 使用買價一檔
+
         for i, stock_id in enumerate(stock_ids):
             if trade_toggles[i]:
-                # 取得整股價格
-                lot_price_data = esun_get_stock_price("LOT", stock_id)
-                if buy_sell:  
-                    if lot_price_data and 'asks' in lot_price_data and len(lot_price_data['asks']) > 0:
-                        lot_price = lot_price_data['asks'][0]['price'] # Buy mode - 使用賣價一檔 (ask_price)
-                    else:
-                        lot_price = 0
-                else:        
-                    if lot_price_data and 'bids' in lot_price_data and len(lot_price_data['bids']) > 0:
-                        lot_price = lot_price_data['bids'][0]['price'] # Sell mode - 使用買價一檔 (bid_price)
-                    else:
-                        lot_price = 0
-
-                # 取得零股價格
-                oddlot_price_data = esun_get_stock_price("ODDLOT", stock_id)
-                if buy_sell:
-                    if oddlot_price_data and 'asks' in oddlot_price_data and len(oddlot_price_data['asks']) > 0:
-                        oddlot_price = oddlot_price_data['asks'][0]['price']
-                    else:
-                        oddlot_price = 0
-
-                else:
-                    if lot_price_data and 'bids' in oddlot_price_data and len(oddlot_price_data['bids']) > 0:
-                        oddlot_price = oddlot_price_data['bids'][0]['price']
-                    else:
-                        oddlot_price = 0
-
-                prices.append(lot_price)
-                oddlot_prices.append(oddlot_price)
+                prices.append(best_quote_price(quotes[(stock_id, 'LOT')], side))
+                oddlot_prices.append(best_quote_price(quotes[(stock_id, 'ODDLOT')], side))
             else:
                 prices.append(None)
                 oddlot_prices.append(None)
@@ -2072,7 +2188,7 @@ def refresh_stock_data_all(n_clicks, buy_sell, funding_strategy, average_amount,
     return prices, quantities, odd_lots, oddlot_prices
 
 # 添加實時更新成本顯示的回調
-@app.callback(
+@callback(
     [Output({'type': 'cost-display', 'index': ALL}, 'children'),
      Output({'type': 'percentage-display', 'index': ALL}, 'children'),
      Output('total-cost-display', 'children')],
@@ -2120,7 +2236,7 @@ def update_cost_display(prices, quantities, odd_prices, odd_lots, funding_strate
     return costs, percentages, f"${total_cost:,.0f}"
 
 # 顯示確認對話框
-@app.callback(
+@callback(
     [Output('order-confirmation-modal', 'style'),
      Output('confirmation-details', 'children')],
     Input('confirm-order-button', 'n_clicks'),
@@ -2199,11 +2315,13 @@ def show_confirmation_modal(n_clicks, buy_sell, trade_type, funding_strategy, av
     return {'display': 'block'}, order_details
 
 # 處理確認/取消按鈕
-@app.callback(
+@callback(
     [Output('order-confirmation-modal', 'style', allow_duplicate=True),
      Output('order-status', 'children'),
      Output({'type': 'status-display', 'index': ALL}, 'children'),
-     Output({'type': 'status-display', 'index': ALL}, 'style')],
+     Output({'type': 'status-display', 'index': ALL}, 'style'),
+     Output('order-basket-store', 'data'),
+     Output('order-progress-interval', 'disabled')],
     [Input('confirm-final-order', 'n_clicks'),
      Input('cancel-order', 'n_clicks')],
     [State('buy-sell-toggle', 'value'),
@@ -2221,135 +2339,144 @@ def show_confirmation_modal(n_clicks, buy_sell, trade_type, funding_strategy, av
     prevent_initial_call=True
 )
 def handle_confirmation(confirm_clicks, cancel_clicks, buy_sell, trade_type, funding_strategy, average_amount, selected_group, trade_toggles, prices, quantities, odd_price, odd_lots, ids, order_type):
-    """處理確認或取消訂單（含零股）"""
+    """處理確認或取消訂單（含零股），委託交給 g_basket_order_engine 在背景送出，進度由 update_order_progress 顯示"""
     from dash import callback_context
 
-    if not callback_context.triggered:
-        return {'display': 'none'}, ''
-
-    button_id = callback_context.triggered[0]['prop_id'].split('.')[0]
-
     # 初始化狀態消息和樣式（用於取消和確認）
     status_messages = ["Not ordered"] * len(ids)
     status_styles = [{'width': '20%', 'display': 'inline-block'}] * len(ids)
 
+    if not callback_context.triggered:
+        return {'display': 'none'}, '', status_messages, status_styles, dash.no_update, dash.no_update
+
+    button_id = callback_context.triggered[0]['prop_id'].split('.')[0]
+
     if button_id == 'cancel-order':
-        return {'display': 'none'}, '訂單已取消', status_messages, status_styles
+        return {'display': 'none'}, '訂單已取消', status_messages, status_styles, dash.no_update, dash.no_update
 
     elif button_id == 'confirm-final-order':
         # 執行實際下單邏輯
         if not selected_group or not prices or not quantities or not odd_lots:
-            return {'display': 'none'}, "請填寫完整的下單資訊！", status_messages, status_styles
+            return {'display': 'none'}, "請填寫完整的下單資訊！", status_messages, status_styles, dash.no_update, dash.no_update
 
         global g_login_success
         if not g_login_success:
-            return {'display': 'none'}, "請先登入系統！", status_messages, status_styles
+            return {'display': 'none'}, "請先登入系統！", status_messages, status_styles, dash.no_update, dash.no_update
 
         action = "買進" if buy_sell else "賣出"
-        orders = []
+        header = []
 
         # 檢查是否使用平均投資策略
         if funding_strategy:
             if average_amount:
-                orders.append(f"使用平均投資策略，總投資金額：${average_amount:,.0f}")
+                header.append(f"使用平均投資策略，總投資金額：${average_amount:,.0f}")
             else:
-                orders.append(f"使用平均投資策略")
-
-        # 追蹤每支股票的狀態
-        stock_status_map = {}
+                header.append(f"使用平均投資策略")
 
         # 只處理 Trade Toggle 為 True 的股票
+        basket = []
         for i, (price, quantity, odd_lot_price, odd_lot, stock_id) in enumerate(zip(prices, quantities, odd_price, odd_lots, ids)):
             if (i < len(trade_toggles) and trade_toggles[i]):
                 stock_no = stock_id['index']
                 order_direction = "BUY" if buy_sell else "SELL"
-                stock_messages = []
-                has_errors = False
 
-                # 處理整股下單
+                # 整股下單
                 if quantity is not None and quantity > 0:
-                    try:
-                        # 根據 order_type 切換下單方式
-                        success, message = esun_send_order(
-                            stock_id=stock_no,
-                            order_dir=order_direction,
-                            price_type=order_type,
-                            price=price,
-                            volume=quantity,
-                            is_oddlot="LOT",
-                            trade_type_str=trade_type
-                        )
-                        order_str = f"{action}整股 {stock_no}，價格：${price:,.2f}，張數：{quantity}"
-                        if success:
-                            stock_messages.append(f"✅ 整股下單成功")
-                            orders.append(f"✅ {order_str}")
-                        else:
-                            stock_messages.append(f"❌ 整股下單失敗: {message}")
-                            orders.append(f"❌ {order_str} - {message}")
-                            has_errors = True
-                        time.sleep(0.5)  # 避免頻繁下單
-                    except Exception as e:
-                        stock_messages.append(f"❌ 整股下單異常: {str(e)}")
-                        orders.append(f"❌ {order_str} - {str(e)}")
-                        has_errors = True
-
-                # 處理零股下單
+                    basket.append({
+                        'group': stock_no,
+                        'board_name': '整股',
+                        'label': f"{action}整股 {stock_no}，價格：${price:,.2f}，張數：{quantity}",
+                        'kwargs': dict(stock_id=stock_no, order_dir=order_direction, price_type=order_type,
+                                       price=price, volume=quantity, is_oddlot="LOT", trade_type_str=trade_type)
+                    })
+
+                # 零股下單
                 if odd_lot is not None and odd_lot > 0:
-                    try:
-                        # 如果沒有零股價格，使用整股價格
-                        odd_price_to_use = odd_lot_price if odd_lot_price and odd_lot_price > 0 else price
-                        success, message = esun_send_order(
-                            stock_id=stock_no,
-                            order_dir=order_direction,
-                            price_type=order_type,
-                            price=odd_price_to_use,
-                            volume=odd_lot,
-                            is_oddlot="ODDLOT",
-                            trade_type_str=trade_type
-                        )
-                        order_str = f"{action}零股 {stock_no}，價格：${odd_price_to_use:,.2f}，股數：{odd_lot}"
-                        if success:
-                            stock_messages.append(f"✅ 零股下單成功")
-                            orders.append(f"✅ {order_str}")
-                        else:
-                            stock_messages.append(f"❌ 零股下單失敗: {message}")
-                            orders.append(f"❌ {order_str} - {message}")
-                            has_errors = True
-                        time.sleep(0.5)  # 避免頻繁下單
-                    except Exception as e:
-                        stock_messages.append(f"❌ 零股下單異常: {str(e)}")
-                        orders.append(f"❌ {order_str} - {str(e)}")
-                        has_errors = True
-
-                # 更新這支股票的狀態
-                if len(stock_messages) > 0:
-                    combined_message = "\n".join(stock_messages)
-                    style = {'color': 'red' if has_errors else 'green', 'width': '20%', 'display': 'inline-block'}
-                    stock_status_map[stock_no] = (combined_message, style)
-
-        if not orders:
-            return {'display': 'none'}, "請填寫完整的下單資訊！", status_messages, status_styles
-        
-        # 設置每支股票的狀態顯示
+                    # 如果沒有零股價格，使用整股價格
+                    odd_price_to_use = odd_lot_price if odd_lot_price and odd_lot_price > 0 else price
+                    basket.append({
+                        'group': stock_no,
+                        'board_name': '零股',
+                        'label': f"{action}零股 {stock_no}，價格：${odd_price_to_use:,.2f}，股數：{odd_lot}",
+                        'kwargs': dict(stock_id=stock_no, order_dir=order_direction, price_type=order_type,
+                                       price=odd_price_to_use, volume=odd_lot, is_oddlot="ODDLOT", trade_type_str=trade_type)
+                    })
+
+        if not basket:
+            return {'display': 'none'}, "請填寫完整的下單資訊！", status_messages, status_styles, dash.no_update, dash.no_update
+
+        basket_id = g_basket_order_engine.submit(basket)
+
+        pending_stocks = {order['group'] for order in basket}
         for i, stock_id in enumerate(ids):
-            current_stock = stock_id['index']
-            if current_stock in stock_status_map:
-                status_messages[i] = stock_status_map[current_stock][0]
-                status_styles[i] = stock_status_map[current_stock][1]
+            if stock_id['index'] in pending_stocks:
+                status_messages[i] = "⏳ 送出中"
+                status_styles[i] = {'color': 'gray', 'width': '20%', 'display': 'inline-block'}
+
+        status = f"⏳ 下單中 (0/{len(basket)})"
+        return ({'display': 'none'}, "\n".join([status] + header), status_messages, status_styles,
+                {'basket_id': basket_id, 'header': header}, False)
+
+    return {'display': 'none'}, '', status_messages, status_styles, dash.no_update, dash.no_update
+
+# 顯示背景下單進度
+@callback(
+    [Output('order-status', 'children', allow_duplicate=True),
+     Output({'type': 'status-display', 'index': ALL}, 'children', allow_duplicate=True),
+     Output({'type': 'status-display', 'index': ALL}, 'style', allow_duplicate=True),
+     Output('order-progress-interval', 'disabled', allow_duplicate=True)],
+    Input('order-progress-interval', 'n_intervals'),
+    [State('order-basket-store', 'data'),
+     State({'type': 'status-display', 'index': ALL}, 'id')],
+    prevent_initial_call=True
+)
+def update_order_progress(n_intervals, basket_data, ids):
+    """每筆委託完成時更新該股票的狀態，全部完成後停止輪詢"""
+    if not basket_data:
+        raise PreventUpdate
+
+    progress = g_basket_order_engine.progress(basket_data['basket_id'])
+    if progress is None:
+        return "⚠️ 找不到下單進度", dash.no_update, dash.no_update, True
+
+    # 依股票彙整已完成的委託
+    orders = list(basket_data['header'])
+    stock_messages = {}
+    stock_errors = {}
+    for result in progress['results']:
+        stock_no = result['group']
+        if result['success']:
+            stock_messages.setdefault(stock_no, []).append(f"✅ {result['board_name']}下單成功")
+            orders.append(f"✅ {result['label']}")
+        else:
+            stock_messages.setdefault(stock_no, []).append(f"❌ {result['board_name']}下單失敗: {result['message']}")
+            orders.append(f"❌ {result['label']} - {result['message']}")
+            stock_errors[stock_no] = True
+
+    status_messages = []
+    status_styles = []
+    for stock_id in ids:
+        stock_no = stock_id['index']
+        if stock_no in stock_messages:
+            status_messages.append("\n".join(stock_messages[stock_no]))
+            status_styles.append({'color': 'red' if stock_errors.get(stock_no) else 'green', 'width': '20%', 'display': 'inline-block'})
+        else:
+            status_messages.append(dash.no_update)
+            status_styles.append(dash.no_update)
 
+    if progress['finished']:
         # 檢查是否所有訂單都成功
-        has_any_error = any("❌" in order for order in orders)
+        has_any_error = any(stock_errors.values())
         status = "⚠️ 部分下單失敗" if has_any_error else "✅ 所有訂單下單成功！"
-        
-        # 組合最終訊息
-        final_message = f"{status}" + "\n".join(orders)
-        return {'display': 'none'}, final_message, status_messages, status_styles
+        status += f" ({progress['total']} 筆，{progress['elapsed']:.1f} 秒)"
+    else:
+        status = f"⏳ 下單中 ({progress['done']}/{progress['total']})"
 
-    return {'display': 'none'}, '', status_messages, status_styles
+    return "\n".join([status] + orders), status_messages, status_styles, progress['finished']
 
 
 # 處理交易明細列表重新整理按鈕
-@app.callback(
+@callback(
     Output('transaction-list-container', 'children'),
     Input('transaction-refresh-button', 'n_clicks'),
     prevent_initial_call=True
@@ -2416,7 +2543,7 @@ def refresh_transaction_list(n_clicks):
         return html.Div(f"更新失敗: {str(e)}", style={'color': 'red', 'textAlign': 'center'})
 
 # 處理取消所有訂單按鈕
-@app.callback(
+@callback(
     Output('transaction-list-container', 'children', allow_duplicate=True),
     Input('transaction-cancel-all-button', 'n_clicks'),
     prevent_initial_call=True
@@ -2506,7 +2633,7 @@ def cancel_all_transactions(n_clicks):
         return html.Div(f"取消失敗: {str(e)}", style={'color': 'red', 'textAlign': 'center'})
 
 # 處理個別訂單取消按鈕
-@app.callback(
+@callback(
     Output('transaction-list-container', 'children', allow_duplicate=True),
     Input({'type': 'cancel-order-button', 'index': ALL}, 'n_clicks'),
     prevent_initial_call=True
@@ -2598,7 +2725,7 @@ def cancel_specific_order(n_clicks_list):
     except Exception as e:
         return html.Div(f"取消失敗: {str(e)}", style={'color': 'red', 'textAlign': 'center'})
 
-@app.callback(
+@callback(
     [Output('add-category-status', 'children'),
      Output('group-dropdown', 'options')],
     Input('add-category-button', 'n_clicks'),
@@ -2610,7 +2737,6 @@ def add_inventory_category(n_clicks):
     """2. 要新增我的"庫存類別"到熱力圖中 """
 
     global g_category_json, g_stock_category, g_initial_stocks_df
-    global g_past_json_data_twse, g_past_json_data_tpex, g_company_json_data_twse, g_company_json_data_tpex
 
     dropdown_options = [{'label': category, 'value': category} for category in g_stock_category]
 
@@ -2653,14 +2779,11 @@ def add_inventory_category(n_clicks):
                 continue
             
             # 獲取股票資訊
-            stock_info = get_stock_info(g_past_json_data_twse, g_past_json_data_tpex, 
-                                        g_company_json_data_twse, g_company_json_data_tpex, stock_id)
+            stock_info = get_stock_info(g_stock_meta_index, stock_id)
 
             if stock_info != None:
-                if stock_info['last_close_price'] == "":
-                    last_stock_price = float('nan')
-                else:
-                    last_stock_price = float(stock_info['last_close_price'])
+                # 沒有收盤價時為 NaN (build_stock_meta_index 已轉成 float)
+                last_stock_price = stock_info['last_close_price']
 
             g_initial_stocks_df[stock_id] = {
                 'category': ["我的庫存"],
@@ -2671,6 +2794,9 @@ def add_inventory_category(n_clicks):
                 'realtime_price': float('nan'),
                 'realtime_change': float('nan')
             }
+        # 股票或類別已變動，重建類別展開索引
+        rebuild_category_index()
+
         # 構建下拉選單選項
         dropdown_options = [{'label': category, 'value': category} for category in g_stock_category]
         
@@ -2679,7 +2805,7 @@ def add_inventory_category(n_clicks):
     except Exception as e:
         return f"新增分類時發生錯誤: {str(e)}", dropdown_options
 
-@app.callback(
+@callback(
     Output('inventory-list-container', 'children'),
     Input('inventory-refresh-button', 'n_clicks'),
     prevent_initial_call=True
@@ -2766,4 +2892,8 @@ def update_inventory_list(n_clicks):
                        style={'color': 'red', 'textAlign': 'center'})
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # HEATMAP_PUSH_MODE=1 時改由伺服器推送報價差異
+    push_mode = os.getenv('HEATMAP_PUSH_MODE') == '1'
+    app = create_app(push_mode=push_mode)
+    # reloader 會多啟動一個監看行程，push 模式下會重複輪詢報價
+    app.run(debug=True, use_reloader=not push_mode)
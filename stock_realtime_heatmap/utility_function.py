@@ -1,3 +1,10 @@
+import numpy as np
+
+# 類別動能快取 (key: 日期檔案組合 + 檔案修改時間 + 類別內容)
+g_momentum_cache = {}
+MOMENTUM_CACHE_MAX_ENTRIES = 8
+# 每日檔案漲幅欄位快取 (key: 檔案路徑, value: (mtime, {stock_id: 漲幅}))
+g_daily_momentum_cache = {}
 
 def get_unique_stocks(my_category_data):
     """
@@ -73,6 +80,98 @@ def get_section_category_momentum_data(search_path, num=10):
 
     return file_paths
 
+def _load_daily_momentum(file_path):
+    """
+    讀取單一日期檔案的漲幅欄位 (最後一個元素)，依檔案 mtime 快取解析結果
+
+    Returns:
+        dict: {'stock_id': 漲幅}，檔案不存在時回傳空字典
+    """
+    import json
+    import os
+
+    try:
+        mtime = os.stat(file_path).st_mtime_ns
+    except OSError:
+        return {}
+
+    cached = g_daily_momentum_cache.get(file_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        day_json = json.load(f)
+
+    day_momentum = {}
+    for stock_id, stock_data in day_json.get('data', {}).items():
+        if len(stock_data) > 0:
+            try:
+                day_momentum[stock_id] = float(stock_data[-1])  # 取"最後一個元素(注意變更)"作為漲幅
+            except (TypeError, ValueError):
+                continue
+
+    g_daily_momentum_cache[file_path] = (mtime, day_momentum)
+    return day_momentum
+
+def build_momentum_matrix(my_twse_path, my_tpex_path, date_files, stock_ids):
+    """
+    建立 股票 x 日期 的漲幅矩陣
+
+    Args:
+        date_files (list): 日期檔案名稱列表 (例如: ['1140807.json', '1140806.json'])
+        stock_ids (list): 股票代號列表，決定矩陣列的順序
+
+    Returns:
+        np.ndarray: shape (股票數, 日期數) 的漲幅，缺值為 0.0 (類別平均時以 0.0 計入)
+    """
+    import os
+
+    stock_pos = {stock_id: idx for idx, stock_id in enumerate(stock_ids)}
+    values = np.zeros((len(stock_ids), len(date_files)), dtype=float)
+
+    for date_idx, date_file in enumerate(date_files):
+        # 先填 TPEX 再填 TWSE，兩邊都有時以 TWSE 為準
+        for market_path in (my_tpex_path, my_twse_path):
+            day_momentum = _load_daily_momentum(os.path.join(market_path, date_file))
+            common_ids = stock_pos.keys() & day_momentum.keys()
+            if not common_ids:
+                continue
+            rows = np.fromiter((stock_pos[stock_id] for stock_id in common_ids), dtype=np.intp, count=len(common_ids))
+            values[rows, date_idx] = np.fromiter((day_momentum[stock_id] for stock_id in common_ids), dtype=float, count=len(common_ids))
+
+    return values
+
+def build_category_membership(my_category_data, stock_ids):
+    """
+    建立 類別 x 股票 的成員矩陣 (1.0 表示該股票屬於該類別)
+
+    Returns:
+        tuple: (categories, membership)
+    """
+    stock_pos = {stock_id: idx for idx, stock_id in enumerate(stock_ids)}
+    categories = list(my_category_data.get('台股', {}).keys())
+    membership = np.zeros((len(categories), len(stock_ids)), dtype=float)
+
+    for cat_idx, category_name in enumerate(categories):
+        cols = [stock_pos[stock_id] for stock_id in my_category_data['台股'][category_name] if stock_id in stock_pos]
+        membership[cat_idx, cols] = 1.0
+
+    return categories, membership
+
+def category_momentum_from_matrix(membership, values):
+    """
+    以一次矩陣乘法計算各類別每天的平均漲幅
+
+    與原本逐檔加總相同，找不到資料的股票以 0.0 計入平均 (values 中缺資料的格子須為 0.0)
+
+    Returns:
+        np.ndarray: shape (類別數, 日期數)，類別沒有任何股票時為 0.0
+    """
+    sums = membership @ values
+    counts = membership.sum(axis=1, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, 0.0)
+
 def collect_stock_momentum(my_twse_path, my_tpex_path, date_files, unique_stocks_dict):
     """
     收集每個股票在特定日期的漲幅資訊
@@ -89,61 +188,30 @@ def collect_stock_momentum(my_twse_path, my_tpex_path, date_files, unique_stocks
                 'categories': ['分類1', '分類2'],
                 'momentum_list': [1.2, -0.5, ...]  # 依照日期順序的漲幅列表
             },
-            'dates': ['1140807.json', ...]  # 日期檔案列表
+            'dates': ['1140807.json', ...],  # 日期檔案列表
+            'matrix': {                       # 漲幅矩陣 (build_momentum_matrix)
+                'stock_ids': [...], 'values': np.ndarray
+            }
         }
     """
-    import json
-    import os
-    
+    stock_ids = list(unique_stocks_dict.keys())
+    values = build_momentum_matrix(my_twse_path, my_tpex_path, date_files, stock_ids)
+
     result_dict = {}
-    
-    # 初始化結果字典，保留原有資訊並添加漲幅列表
-    for stock_id, stock_info in unique_stocks_dict.items():
+    for row_idx, stock_id in enumerate(stock_ids):
+        stock_info = unique_stocks_dict[stock_id]
         result_dict[stock_id] = {
             'name': stock_info['name'],
             'categories': stock_info['categories'],
-            'momentum_list': []  # 用來存放歷史漲幅
+            'momentum_list': values[row_idx].tolist()  # 找不到的日期為 0.0
         }
-    
-    # 加入日期檔案列表
+
+    # 加入日期檔案列表與矩陣
     result_dict['dates'] = date_files
-    
-    # 處理每個日期檔案
-    for date_file in date_files:
-        # 先嘗試從 TWSE 讀取
-        twse_path = os.path.join(my_twse_path, date_file)
-        tpex_path = os.path.join(my_tpex_path, date_file)
-        
-        # 讀取 TWSE 資料
-        twse_data = {}
-        if os.path.exists(twse_path):
-            with open(twse_path, 'r', encoding='utf-8') as f:
-                twse_data = json.load(f)
-        
-        # 讀取 TPEX 資料
-        tpex_data = {}
-        if os.path.exists(tpex_path):
-            with open(tpex_path, 'r', encoding='utf-8') as f:
-                tpex_data = json.load(f)
-        
-        # 對每個股票找尋當日漲幅
-        for stock_id in unique_stocks_dict.keys():
-            momentum = None
-            
-            # 先找 TWSE
-            if 'data' in twse_data and stock_id in twse_data['data']:
-                stock_data = twse_data['data'][stock_id]
-                if len(stock_data) > 0:
-                    momentum = float(stock_data[-1])  # 取"最後一個元素(注意變更)"作為漲幅
-            
-            # 如果在 TWSE 找不到，找 TPEX
-            if momentum is None and 'data' in tpex_data and stock_id in tpex_data['data']:
-                stock_data = tpex_data['data'][stock_id]
-                if len(stock_data) > 0:
-                    momentum = float(stock_data[-1])  # 取"最後一個元素(注意變更)"作為漲幅
-            
-            # 將漲幅加入結果，如果都找不到就用 0.0
-            result_dict[stock_id]['momentum_list'].append(momentum if momentum is not None else 0.0)
+    result_dict['matrix'] = {
+        'stock_ids': stock_ids,
+        'values': values
+    }
     
     return result_dict
 
@@ -166,40 +234,490 @@ def calculate_category_momentum(my_category_data, momentum_data):
         }
     """
     result = {}
-    dates = momentum_data.get('dates', [])
-    date_count = len(dates)
     
     # 檢查台股分類
     if '台股' not in my_category_data:
         return result
-        
-    # 處理每個類別
-    for category_name, stocks in my_category_data['台股'].items():
-        # 初始化該類別的資料
+
+    matrix = momentum_data.get('matrix')
+    if matrix is None:
+        # 相容舊格式：由 momentum_list 組回矩陣
+        stock_ids = [key for key in momentum_data if key not in ('dates', 'matrix')]
+        values = np.array([momentum_data[stock_id]['momentum_list'] for stock_id in stock_ids], dtype=float).reshape(len(stock_ids), len(momentum_data.get('dates', [])))
+        matrix = {'stock_ids': stock_ids, 'values': np.nan_to_num(values)}
+
+    categories, membership = build_category_membership(my_category_data, matrix['stock_ids'])
+    avg_momentum = category_momentum_from_matrix(membership, matrix['values'])
+
+    for cat_idx, category_name in enumerate(categories):
+        stocks = my_category_data['台股'][category_name]
         result[category_name] = {
             'stocks': list(stocks.keys()),
-            'avg_momentum': [0.0] * date_count,  # 初始化為0
+            'avg_momentum': avg_momentum[cat_idx].tolist(),
             'stock_count': len(stocks)
         }
-        
-        # 計算每天的平均漲幅
-        for date_idx in range(date_count):
-            momentum_sum = 0.0
-            valid_stock_count = 0
-            
-            # 加總該類別所有股票的漲幅
-            for stock_id in stocks.keys():
-                if stock_id in momentum_data:
-                    momentum = momentum_data[stock_id]['momentum_list'][date_idx]
-                    if momentum is not None:  # 如果有有效的漲幅數據
-                        momentum_sum += momentum
-                        valid_stock_count += 1
-            
-            # 計算平均值
-            if valid_stock_count > 0:
-                result[category_name]['avg_momentum'][date_idx] = momentum_sum / valid_stock_count
-            else:
-                result[category_name]['avg_momentum'][date_idx] = 0.0
                 
     return result
 
+def _momentum_cache_key(my_twse_path, my_tpex_path, date_files, my_category_data):
+    """
+    產生類別動能快取的 key，任一日期檔被更新 (mtime 改變) 或類別內容變動時 key 就會不同
+    """
+    import os
+
+    file_stamps = []
+    for date_file in date_files:
+        for path in (os.path.join(my_twse_path, date_file), os.path.join(my_tpex_path, date_file)):
+            try:
+                file_stamps.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                file_stamps.append(None)
+
+    category_signature = tuple(
+        (category_name, tuple(stocks.keys()))
+        for category_name, stocks in my_category_data.get('台股', {}).items()
+    )
+    return (my_twse_path, my_tpex_path, tuple(date_files), tuple(file_stamps), category_signature)
+
+def get_category_momentum(my_twse_path, my_tpex_path, my_category_data, days):
+    """
+    取得最近 n 天的類別動能資料，盤中資料不會變動，因此結果快取在記憶體中
+
+    Args:
+        my_twse_path (str): TWSE 每日資料目錄
+        my_tpex_path (str): TPEX 每日資料目錄
+        my_category_data (dict): my_stock_category.json 的內容
+        days (int): 要收集的天數
+
+    Returns:
+        tuple: (date_files, momentum_data, category_momentum)
+            date_files: get_section_category_momentum_data 的輸出
+            momentum_data: collect_stock_momentum 的輸出
+            category_momentum: calculate_category_momentum 的輸出
+        回傳的資料為快取共用物件，呼叫端請勿直接修改
+    """
+    date_files = get_section_category_momentum_data(my_tpex_path, days)
+    cache_key = _momentum_cache_key(my_twse_path, my_tpex_path, date_files, my_category_data)
+
+    cached = g_momentum_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    stocks_info = get_unique_stocks(my_category_data)
+    momentum_data = collect_stock_momentum(my_twse_path, my_tpex_path, date_files, stocks_info)
+    category_momentum = calculate_category_momentum(my_category_data, momentum_data)
+
+    # 控制快取數量，移除最舊的項目
+    while len(g_momentum_cache) >= MOMENTUM_CACHE_MAX_ENTRIES:
+        g_momentum_cache.pop(next(iter(g_momentum_cache)))
+
+    g_momentum_cache[cache_key] = (date_files, momentum_data, category_momentum)
+    return g_momentum_cache[cache_key]
+
+def build_category_index(stocks_df):
+    """
+    建立 類別 -> 股票 的展開索引，於載入時建立一次，每次更新只需陣列運算
+
+    Args:
+        stocks_df (DataFrame): load_initial_data 的輸出 (columns 為股票代號, 'category' 列為類別列表)
+
+    Returns:
+        dict: 展開索引，格式為 {
+            'stock_ids': ['2330', ...],             # 與 stocks_df.columns 相同順序
+            'categories': ['半導體', ...],          # 類別名稱 (依首次出現順序)
+            'member_stock': np.array([...]),        # 展開後每一列對應的股票位置
+            'member_cat': np.array([...]),          # 展開後每一列對應的類別位置
+            'category_stock_pos': {'半導體': np.array([...])}  # 每個類別的股票位置
+        }
+    """
+    stock_ids = list(stocks_df.columns)
+    categories = []
+    category_pos = {}
+    member_stock = []
+    member_cat = []
+
+    # 展開順序與原本 (股票, 類別) 迴圈相同，treemap 排列不變
+    for stock_pos, stock_id in enumerate(stock_ids):
+        for category in stocks_df.at['category', stock_id]:
+            if category not in category_pos:
+                category_pos[category] = len(categories)
+                categories.append(category)
+            member_stock.append(stock_pos)
+            member_cat.append(category_pos[category])
+
+    member_stock = np.asarray(member_stock, dtype=np.intp)
+    member_cat = np.asarray(member_cat, dtype=np.intp)
+
+    category_stock_pos = {
+        category: member_stock[member_cat == cat_idx]
+        for cat_idx, category in enumerate(categories)
+    }
+
+    return {
+        'stock_ids': stock_ids,
+        'categories': categories,
+        'member_stock': member_stock,
+        'member_cat': member_cat,
+        'category_stock_pos': category_stock_pos
+    }
+
+def category_segment_mean(category_index, values):
+    """
+    以分段加總計算每個類別的平均值 (忽略 NaN，行為同 groupby().mean())
+
+    Args:
+        category_index (dict): build_category_index 的輸出
+        values (np.ndarray): 依 stock_ids 順序排列的股票數值
+
+    Returns:
+        np.ndarray: 依 categories 順序排列的類別平均值，無有效值的類別為 NaN
+    """
+    member_values = np.asarray(values, dtype=float)[category_index['member_stock']]
+    valid = ~np.isnan(member_values)
+    n_categories = len(category_index['categories'])
+
+    sums = np.bincount(category_index['member_cat'], weights=np.where(valid, member_values, 0.0), minlength=n_categories)
+    counts = np.bincount(category_index['member_cat'], weights=valid, minlength=n_categories)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+def category_segment_sum(category_index, values):
+    """
+    以分段加總計算每個類別的總和
+
+    Args:
+        category_index (dict): build_category_index 的輸出
+        values (np.ndarray): 依 stock_ids 順序排列的股票數值
+
+    Returns:
+        np.ndarray: 依 categories 順序排列的類別總和
+    """
+    member_values = np.asarray(values, dtype=float)[category_index['member_stock']]
+    return np.bincount(category_index['member_cat'], weights=member_values, minlength=len(category_index['categories']))
+
+# 發行股數特例 (公司資料中找不到或單位不同的 ETF)
+ISSUE_SHARES_OVERRIDE = {
+    '0050': 13234500000,
+    '0051': 26000000,
+    '006201': 18946000000  # 18946000 -> 18946000000 不然顯示不出來
+}
+
+def _to_close_price(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+def build_stock_meta_index(source_paths):
+    """
+    建立 股票代號 -> 基本資料 的索引 (一次讀取所有來源檔案，之後查詢為 O(1))
+
+    Args:
+        source_paths (dict): 來源檔案路徑，格式為 {
+            'twse_t1': 上市前一交易日資料, 'tpex_t1': 上櫃前一交易日資料,
+            'twse_t2': 上市前二交易日資料, 'tpex_t2': 上櫃前二交易日資料,
+            'twse_company': 上市公司資料, 'tpex_company': 上櫃公司資料
+        }
+
+    Returns:
+        dict: {
+            'stock_id': {
+                'last_close_price': 12.3,   # 前一交易日收盤價，為 0 時改用前二交易日
+                'stock_name': '股票名稱',
+                'stock_type': 'TWSE' 或 'TPEx',
+                'issue_shares': 1000000.0
+            }
+        }
+    """
+    import json
+
+    def load_json(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"讀取 {path} 失敗：{e}")
+            return {}
+
+    markets = [
+        # (市場, 前一日, 前二日, 公司資料, 公司代號欄位, 發行股數欄位)
+        ('TWSE', 'twse_t1', 'twse_t2', 'twse_company', '公司代號', '已發行普通股數或TDR原股發行股數'),
+        ('TPEx', 'tpex_t1', 'tpex_t2', 'tpex_company', 'SecuritiesCompanyCode', 'IssueShares'),
+    ]
+
+    stock_meta_index = {}
+    for stock_type, t1_key, t2_key, company_key, code_field, shares_field in markets:
+        t1_data = load_json(source_paths[t1_key]).get('data', {})
+        company_shares = {
+            record[code_field]: record[shares_field]
+            for record in load_json(source_paths[company_key])
+            if code_field in record
+        }
+        t2_data = None  # 只有遇到收盤價為 0 時才讀取
+
+        for stock_id, day_record in t1_data.items():
+            if stock_id in stock_meta_index:  # 上市優先
+                continue
+
+            last_close_price = _to_close_price(day_record[2])
+            if last_close_price == 0:
+                if t2_data is None:
+                    t2_data = load_json(source_paths[t2_key]).get('data', {})
+                if t2_data.get(stock_id) is not None:
+                    last_close_price = _to_close_price(t2_data[stock_id][2])
+
+            issue_shares = ISSUE_SHARES_OVERRIDE.get(stock_id, company_shares.get(stock_id, 0))
+            try:
+                issue_shares = float(issue_shares)
+            except (TypeError, ValueError):
+                issue_shares = 0.0
+
+            stock_meta_index[stock_id] = {
+                'last_close_price': last_close_price,
+                'stock_name': day_record[1],
+                'stock_type': stock_type,
+                'issue_shares': issue_shares
+            }
+
+    return stock_meta_index
+
+def load_stock_meta_index(index_path, source_paths):
+    """
+    讀取已儲存的股票基本資料索引，若來源檔案有更新 (mtime 不同) 則重新建立並儲存
+
+    Args:
+        index_path (str): 索引儲存路徑
+        source_paths (dict): 同 build_stock_meta_index
+
+    Returns:
+        dict: build_stock_meta_index 的輸出
+    """
+    import json
+    import os
+
+    source_mtimes = {}
+    for key, path in source_paths.items():
+        try:
+            source_mtimes[key] = os.stat(path).st_mtime_ns
+        except OSError:
+            source_mtimes[key] = None
+
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('source_paths') == source_paths and saved.get('source_mtimes') == source_mtimes:
+                return saved['data']
+        except Exception as e:
+            print(f"讀取股票索引 {index_path} 失敗，重新建立：{e}")
+
+    stock_meta_index = build_stock_meta_index(source_paths)
+
+    try:
+        os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'source_paths': source_paths,
+                'source_mtimes': source_mtimes,
+                'data': stock_meta_index
+            }, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"儲存股票索引 {index_path} 失敗：{e}")
+
+    return stock_meta_index
+
+def load_cached_snapshot(cache_path, source_paths, build_func, extra_key=None, is_cacheable=None):
+    """
+    讀取 pickle 快照，若來源檔案 mtime 或 extra_key 改變則呼叫 build_func 重建並儲存
+
+    Args:
+        cache_path (str): 快照儲存路徑
+        source_paths (dict): 決定快照是否有效的來源檔案 {名稱: 路徑}
+        build_func (callable): 無參數函式，回傳要快取的資料
+        extra_key: 其他影響快照內容的條件 (例如日期)
+        is_cacheable (callable): 判斷新建立的資料是否可以儲存，預設一律儲存
+
+    Returns:
+        build_func 的回傳值 (或快照中的資料)
+    """
+    import os
+    import pickle
+
+    source_mtimes = {}
+    for key, path in source_paths.items():
+        try:
+            source_mtimes[key] = os.stat(path).st_mtime_ns
+        except OSError:
+            source_mtimes[key] = None
+    cache_key = (sorted(source_paths.items()), sorted(source_mtimes.items()), extra_key)
+
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                saved = pickle.load(f)
+            if saved.get('key') == cache_key:
+                print(f"使用啟動快照 {cache_path}")
+                return saved['data']
+        except Exception as e:
+            print(f"讀取快照 {cache_path} 失敗，重新建立：{e}")
+
+    data = build_func()
+    if is_cacheable is not None and not is_cacheable(data):
+        return data
+
+    try:
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'key': cache_key, 'data': data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"儲存快照 {cache_path} 失敗：{e}")
+
+    return data
+
+def load_suspended_from_event_file(event_path, date):
+    """
+    從 genSuspendtrading 產生的事件檔讀取指定日期暫停交易的股票
+
+    Args:
+        event_path (str): suspend_trading.json 路徑
+        date (str): 西元日期 'YYYY-MM-DD'
+
+    Returns:
+        set: 暫停交易的股票代號 (已去除 .TW / .TWO)，事件檔不存在或不是該日期查詢產生時回傳 None
+    """
+    import json
+
+    try:
+        with open(event_path, 'r', encoding='utf-8') as f:
+            events = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"讀取暫停交易事件檔 {event_path} 失敗：{e}")
+        return None
+
+    # 事件檔有 sdate (查詢日期，暫停交易事件) 與 edate (下一個交易日，只有除權息事件) 兩個 key，
+    # 前一天產生的事件檔也會有今天的 key (edate)，只有 query_date 是今天才表示事件檔是今天產生的
+    if events.get('query_date') != date or date not in events:
+        return None
+
+    return {
+        symbol.split('.')[0]
+        for symbol, event in events[date].items()
+        if event.get('eventTypeName') == '暫停交易'
+    }
+
+def load_ex_rights_from_event_file(event_path, date):
+    """
+    從 genSuspendtrading 產生的事件檔讀取指定日期除權息的股票
+
+    Args:
+        event_path (str): suspend_trading.json 路徑
+        date (str): 西元日期 'YYYY-MM-DD' (除權息交易日)
+
+    Returns:
+        dict: 股票代號 (已去除 .TW / .TWO) -> (每股現金股利, 每股股票股利)，單位為元，沒有配發為 0.0；
+              事件檔不存在或沒有該日期的除權息資料時回傳 None
+    """
+    import json
+
+    try:
+        with open(event_path, 'r', encoding='utf-8') as f:
+            events = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"讀取除權息事件檔 {event_path} 失敗：{e}")
+        return None
+
+    # 除權息事件放在 edate (查詢日期的下一個交易日)，當天產生的事件檔沒有當天的除權息資料
+    if events.get('query_date') == date or date not in events:
+        return None
+
+    def to_float(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0.0
+
+    return {
+        symbol.split('.')[0]: (to_float(event.get('detail', {}).get('cash')), to_float(event.get('detail', {}).get('stock')))
+        for symbol, event in events[date].items()
+        if event.get('eventTypeName') == '除權息'
+    }
+
+def probe_suspended_stocks(stock_ids, chunk_size=50, max_workers=4, get_quotes=None):
+    """
+    以即時報價判斷暫停交易股票 (無 best_bid_price 與 best_ask_price)，分批並行查詢
+
+    Args:
+        stock_ids (iterable): 要檢查的股票代號 (重複代號只查詢一次)
+        chunk_size (int): 每次 twstock.realtime.get 查詢的股票數
+        max_workers (int): 同時查詢的批次數
+        get_quotes (callable): 查詢即時報價的函式 (回傳 twstock.realtime.get 格式)，None 表示使用 twstock
+
+    Returns:
+        tuple: (suspended, fetch_success)
+            suspended (set): 判定暫停交易的股票代號
+            fetch_success (bool): 所有批次是否都成功取得資料，失敗批次中的股票不會被判定為暫停交易
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import twstock
+
+    if get_quotes is None:
+        get_quotes = twstock.realtime.get
+
+    unique_ids = list(dict.fromkeys(stock_ids))
+    chunks = [unique_ids[i:i + chunk_size] for i in range(0, len(unique_ids), chunk_size)]
+
+    def fetch(chunk):
+        try:
+            data = get_quotes(chunk)
+        except Exception as e:
+            print(f"取得即時資料失敗: {e}")
+            return chunk, None
+        if not data.get('success'):
+            print(f"取得即時資料失敗: {data.get('rtmessage', '')}")
+            return chunk, None
+        return chunk, data
+
+    suspended = set()
+    fetch_success = True
+    if not chunks:
+        return suspended, fetch_success
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        for chunk, data in executor.map(fetch, chunks):
+            if data is None:
+                fetch_success = False
+                continue
+            for stock_id in chunk:
+                rt = data.get(stock_id, {}).get('realtime', {})
+                best_bid = rt.get('best_bid_price')
+                best_ask = rt.get('best_ask_price')
+                if (not best_bid or best_bid == ['-']) and (not best_ask or best_ask == ['-']):
+                    suspended.add(stock_id)
+
+    return suspended, fetch_success
+
+def resolve_suspended_stocks(stock_ids, event_path, date, get_quotes=None):
+    """
+    判斷暫停交易股票: 優先使用當天的事件檔，事件檔不是當天產生時才以即時報價查詢
+
+    Args:
+        stock_ids (iterable): 要檢查的股票代號
+        event_path (str): suspend_trading.json 路徑
+        date (str): 西元日期 'YYYY-MM-DD'
+        get_quotes (callable): 查詢即時報價的函式，None 表示使用 twstock
+
+    Returns:
+        tuple: (suspended, checked)
+            suspended (set): 暫停交易的股票代號
+            checked (bool): 判斷結果是否可靠 (事件檔有效或所有即時查詢都成功)
+    """
+    suspended = load_suspended_from_event_file(event_path, date)
+    if suspended is not None:
+        print(f"使用暫停交易事件檔 {event_path} ({date})")
+        return suspended & set(stock_ids), True
+
+    print(f"暫停交易事件檔不是 {date} 產生的，改用即時報價判斷")
+    return probe_suspended_stocks(stock_ids, get_quotes=get_quotes)